@@ -3,3 +3,12 @@ from django.apps import AppConfig
 
 class DataConfig(AppConfig):
     name = 'data'
+
+    def ready(self):
+        from data import signals # pylint: disable=import-outside-toplevel
+
+        signals.connect_version_signals()
+        signals.connect_counter_signals()
+        signals.connect_name_cache_signals()
+        signals.connect_codec_cache_signals()
+        signals.connect_schema_snapshot_signals()
@@ -0,0 +1,156 @@
+'''
+Single-flight coalescing of identical concurrent expensive reads for the `data` Django app
+
+When many identical requests arrive at once, only the first (the leader) computes the result
+and the others wait for it and share it:
+ * within a process, waiters block on the leader's in-flight computation
+ * across local worker processes, the leader holds a lock in the `settings.SINGLE_FLIGHT_CACHE`
+   cache and publishes its result there for waiters in other processes
+'''
+
+
+import hashlib
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+# Marks a missing cache value, as `None` can be a valid result
+_MISSING = object()
+
+
+class _Flight:
+    '''
+    An in-flight computation in this process that other threads can wait on
+    '''
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    '''
+    Coalesces concurrent calls with the same key into a single computation
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, func):
+        '''
+        Return the result of calling `func`, sharing it with any concurrent calls with the same
+        input `key`. If the leader raises an error, waiters in this process raise it too
+        '''
+
+        with self._lock:
+            flight = self._flights.get(key, None)
+            is_leader = flight is None
+
+            if is_leader:
+                flight = self._flights[key] = _Flight()
+
+        if not is_leader:
+            flight.event.wait()
+
+            if flight.error:
+                raise flight.error
+
+            return flight.result
+
+        try:
+            flight.result = self._do_across_processes(key, func)
+
+        except Exception as err:
+            flight.error = err
+            raise
+
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+            flight.event.set()
+
+        return flight.result
+
+    def _do_across_processes(self, key, func):
+        '''
+        Return the result of calling `func`, or the result published by a leader in another
+        process holding the lock for the input `key`
+
+        If no result arrives within `settings.SINGLE_FLIGHT_TIMEOUT` seconds, `func` is called
+        without coalescing
+        '''
+
+        cache = caches[settings.SINGLE_FLIGHT_CACHE]
+        lock_key = 'single-flight:lock:' + self.digest(key)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + settings.SINGLE_FLIGHT_TIMEOUT
+
+        while time.monotonic() < deadline:
+            # Try to become the leader
+            if cache.add(lock_key, token, settings.SINGLE_FLIGHT_TIMEOUT):
+                try:
+                    result = func()
+
+                    # Publish the result for waiters in other processes
+                    cache.set(
+                        'single-flight:result:' + token, result,
+                        settings.SINGLE_FLIGHT_RESULT_TIMEOUT
+                    )
+
+                finally:
+                    cache.delete(lock_key)
+
+                return result
+
+            leader_token = cache.get(lock_key, None)
+
+            if leader_token is not None:
+                result = self._wait_for_result(cache, lock_key, leader_token, deadline)
+
+                if result is not _MISSING:
+                    return result
+
+            # The leader finished without a result we could see, so try to lead again
+
+        return func()
+
+    @staticmethod
+    def digest(key):
+        '''
+        Return a fixed length digest of the input `key`, for use in cache keys
+        '''
+
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @staticmethod
+    def _wait_for_result(cache, lock_key, leader_token, deadline):
+        '''
+        Poll the cache for the result of the leader with the input `leader_token` until it is
+        published, the leader's lock goes away or the `deadline` passes
+        '''
+
+        result_key = 'single-flight:result:' + leader_token
+
+        while time.monotonic() < deadline:
+            result = cache.get(result_key, _MISSING)
+
+            if result is not _MISSING:
+                return result
+
+            if cache.get(lock_key, None) != leader_token:
+                # Leader has finished, check once more in case it just published
+                return cache.get(result_key, _MISSING)
+
+            time.sleep(settings.SINGLE_FLIGHT_POLL_INTERVAL)
+
+        return _MISSING
+
+
+single_flight = SingleFlight()
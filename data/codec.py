@@ -0,0 +1,372 @@
+'''
+Compiled `AbstractModel` codecs for the `data` Django app
+
+A codec holds everything needed to convert the `attribute` and `measure` json of an `Instance`
+of one `AbstractModel`: the column order, a `DataType` converter per column and the schema
+changes to upgrade json written under older schema versions. Codecs are compiled once and
+cached, so converting rows doesn't need per-row schema lookups
+'''
+
+
+import json
+import math
+import types
+
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+
+from data import models
+
+
+def to_bool(value):
+    '''
+    Return the input value as a bool, accepting bools and the usual true and false strings
+    '''
+
+    if isinstance(value, bool):
+        return value
+
+    text = str(value).strip().lower()
+
+    if text in ['true', 't', 'yes', 'y', '1']:
+        return True
+
+    if text in ['false', 'f', 'no', 'n', '0']:
+        return False
+
+    raise ValueError('"' + str(value) + '" is not a boolean.')
+
+
+def to_int(value):
+    '''
+    Return the input value as an int, rejecting bools and floats with a fractional part
+    '''
+
+    if isinstance(value, bool):
+        raise ValueError('Booleans are not integers.')
+
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(str(value) + ' is not an integer.')
+
+        return int(value)
+
+    return int(str(value).strip())
+
+
+def to_float(value):
+    '''
+    Return the input value as a finite float, rejecting bools
+    '''
+
+    if isinstance(value, bool):
+        raise ValueError('Booleans are not numbers.')
+
+    number = float(value)
+
+    if not math.isfinite(number):
+        raise ValueError(str(value) + ' is not a finite number.')
+
+    return number
+
+
+def keep(value):
+    '''
+    Return the input value as it is, the converter of `DataType`s without one in `CONVERTERS`
+    '''
+
+    return value
+
+
+# `DataType` name to converter, other `DataType`s are kept as they are
+CONVERTERS = {
+    'INT': to_int,
+    'INTEGER': to_int,
+    'BIGINT': to_int,
+    'FLOAT': to_float,
+    'DOUBLE': to_float,
+    'DECIMAL': to_float,
+    'NUMBER': to_float,
+    'BOOL': to_bool,
+    'BOOLEAN': to_bool,
+}
+
+# Encoder producing the same output as `json.dumps()`, built once
+JSON_ENCODER = json.JSONEncoder()
+
+
+class AbstractModelCodec(namedtuple('AbstractModelCodec', [
+        'abm_id', 'master_item', 'columns', 'converters', 'schema_version', 'upgrades'
+])):
+    '''
+    Immutable compiled codec of an `AbstractModel`
+     * `columns` is a mapping of `Instance` json field name ("attribute" or "measure") to a tuple
+       of the `AbstractModel`'s column names in order
+     * `converters` is a mapping of json field name to a mapping of column name to converter
+     * `schema_version` is the current schema version of the `AbstractModel`
+     * `upgrades` is a tuple of (version, operations) pairs of its `AbstractModelSchemaChange`s
+       in version order
+    '''
+
+    __slots__ = ()
+
+    def convert(self, field_name, values):
+        '''
+        Return a dict of the input `values` with the `AbstractModel`'s columns first, in order,
+        and their values converted to their `DataType`. Values that don't convert are kept as
+        they are, and other keys follow in their input order
+        '''
+
+        converters = self.converters[field_name]
+        converted = OrderedDict()
+
+        for column in self.columns[field_name]:
+            if column in values:
+                value = values[column]
+
+                try:
+                    converted[column] = converters[column](value)
+
+                except (TypeError, ValueError, OverflowError):
+                    converted[column] = value
+
+        for key, value in values.items():
+            if key not in converted:
+                converted[key] = value
+
+        return converted
+
+    def encode(self, field_name, values):
+        '''
+        Return the input dict of `values` converted and encoded as a json string
+        '''
+
+        return JSON_ENCODER.encode(self.convert(field_name, values))
+
+    def decode(self, field_name, json_str):
+        '''
+        Return the input json string decoded and converted, or an empty dict if it isn't a json
+        object
+        '''
+
+        try:
+            values = json.loads(json_str)
+
+        except (TypeError, ValueError):
+            return {}
+
+        return self.convert(field_name, values) if isinstance(values, dict) else {}
+
+    def recode(self, field_name, json_str):
+        '''
+        Return the input json string with its values converted, or as it is if it isn't a json
+        object
+        '''
+
+        try:
+            values = json.loads(json_str)
+
+        except (TypeError, ValueError):
+            return json_str
+
+        return self.encode(field_name, values) if isinstance(values, dict) else json_str
+
+    def upgrade(self, field_name, json_str, from_version):
+        '''
+        Return the input json string written under schema version `from_version` with the
+        operations of every later schema change applied, or as it is if none change it or it
+        isn't a json object
+        '''
+
+        # Columns added without a default don't change existing json
+        operations = [
+            operation for version, version_operations in self.upgrades
+            if version > from_version
+            for operation in version_operations
+            if operation['field'] == field_name and (
+                operation['op'] == 'remove' or 'default' in operation
+            )
+        ]
+
+        if not operations:
+            return json_str
+
+        try:
+            values = json.loads(json_str)
+
+        except (TypeError, ValueError):
+            return json_str
+
+        if not isinstance(values, dict):
+            return json_str
+
+        return JSON_ENCODER.encode(models.upgrade_json_values(values, operations))
+
+
+def compile_codecs(abm_ids):
+    '''
+    Return a dict of `AbstractModel` id to compiled codec for the input ids that exist, reading
+    the schema of all of them in four queries
+    '''
+
+    master_items = {}
+    schema_versions = {}
+
+    for abm_id, master_item, schema_version in models.AbstractModel.objects.filter(
+            id__in=abm_ids
+    ).values_list('id', 'master_item__name', 'schema_version'):
+        master_items[abm_id] = master_item
+        schema_versions[abm_id] = schema_version
+
+    columns = {abm_id: {'attribute': [], 'measure': []} for abm_id in master_items}
+    converters = {abm_id: {'attribute': {}, 'measure': {}} for abm_id in master_items}
+    upgrades = {abm_id: [] for abm_id in master_items}
+
+    # Read the columns in the order they were added, the same order they are serialized in
+    for field_name, dtype_column in [('attribute', 'attribute__dtype__name'),
+                                     ('measure', 'measure__value_dtype__name')]:
+        through = models.AbstractModel._meta.get_field(field_name).remote_field.through # pylint: disable=protected-access
+
+        for abm_id, name, dtype in through.objects.filter(
+                abstractmodel_id__in=list(master_items)
+        ).order_by('id').values_list('abstractmodel_id', field_name + '__name', dtype_column):
+            columns[abm_id][field_name] += [name]
+            converters[abm_id][field_name][name] = CONVERTERS.get(dtype.upper(), keep)
+
+    for abm_id, version, operations in models.AbstractModelSchemaChange.objects.filter(
+            abm_id__in=list(master_items)
+    ).order_by('version').values_list('abm_id', 'version', 'operations'):
+        upgrades[abm_id] += [
+            (version, tuple(types.MappingProxyType(operation) for operation in operations))
+        ]
+
+    return {
+        abm_id: AbstractModelCodec(
+            abm_id, master_item,
+            types.MappingProxyType({k: tuple(v) for k, v in columns[abm_id].items()}),
+            types.MappingProxyType({
+                k: types.MappingProxyType(v) for k, v in converters[abm_id].items()
+            }),
+            schema_versions[abm_id], tuple(upgrades[abm_id]),
+        )
+        for abm_id, master_item in master_items.items()
+    }
+
+
+class CodecCache(models.VersionStampedCache):
+    '''
+    Process-local, size bounded cache of compiled `AbstractModel` codecs, cleared when any
+    `AbstractModel`, `Attribute`, `Measure`, `DataType` or `AbstractModelSchemaChange` changes
+    '''
+
+    def __init__(self):
+        super().__init__(
+            models.AbstractModel, models.Attribute, models.Measure, models.DataType,
+            models.AbstractModelSchemaChange
+        )
+        self._codecs = OrderedDict()
+
+    def clear(self):
+        '''
+        Remove every cached codec
+        '''
+
+        with self._lock:
+            self._codecs.clear()
+
+    def get_many(self, abm_ids):
+        '''
+        Return a dict of `AbstractModel` id to codec for the input ids that exist, compiling the
+        ones that aren't cached together
+        '''
+
+        self.check_stamp()
+
+        abm_ids = set(abm_ids)
+        codecs = {}
+
+        with self._lock:
+            for abm_id in abm_ids:
+                if abm_id in self._codecs:
+                    self._codecs.move_to_end(abm_id)
+                    codecs[abm_id] = self._codecs[abm_id]
+
+        missing = abm_ids - set(codecs)
+
+        if missing:
+            compiled = compile_codecs(missing)
+
+            def store():
+                self._codecs.update(compiled)
+
+                while len(self._codecs) > settings.CODEC_CACHE_SIZE:
+                    self._codecs.popitem(last=False)
+
+            self.store_on_commit(store)
+            codecs.update(compiled)
+
+        return codecs
+
+    def get(self, abm_id):
+        '''
+        Return the codec of the input `AbstractModel` id, or `None` if it doesn't exist
+        '''
+
+        return self.get_many([abm_id]).get(abm_id, None)
+
+
+abm_codecs = CodecCache()
+
+
+def upgrade_instances(instances):
+    '''
+    Upgrade the `attribute` and `measure` json of the input `Instance` entries written under an
+    older schema version of their `AbstractModel`, in memory only, and return them. The codecs of
+    all the entries are read together, and fields deferred by `.only()` aren't loaded
+    '''
+
+    instances = list(instances)
+    codecs = abm_codecs.get_many({instance.abm_id for instance in instances})
+
+    for instance in instances:
+        abm_codec = codecs.get(instance.abm_id, None)
+
+        if abm_codec is not None and instance.schema_version < abm_codec.schema_version:
+            deferred = instance.get_deferred_fields()
+
+            for field_name in ['attribute', 'measure']:
+                if field_name in deferred:
+                    continue
+
+                setattr(instance, field_name, abm_codec.upgrade(
+                    field_name, getattr(instance, field_name), instance.schema_version
+                ))
+
+            instance.schema_version = abm_codec.schema_version
+
+    return instances
+
+
+def upgrade_rows(rows):
+    '''
+    Upgrade the `attribute` and `measure` json of the input `Instance` `.values()` row dicts
+    (with "abm" and "schema_version" keys) the same as `upgrade_instances`, and return them
+    '''
+
+    rows = list(rows)
+    codecs = abm_codecs.get_many({row['abm'] for row in rows})
+
+    for row in rows:
+        abm_codec = codecs.get(row['abm'], None)
+
+        if abm_codec is not None and row['schema_version'] < abm_codec.schema_version:
+            for field_name in ['attribute', 'measure']:
+                if field_name in row:
+                    row[field_name] = abm_codec.upgrade(
+                        field_name, row[field_name], row['schema_version']
+                    )
+
+            row['schema_version'] = abm_codec.schema_version
+
+    return rows
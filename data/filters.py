@@ -0,0 +1,81 @@
+'''
+Defines drf filter backends for the `data` Django app
+'''
+
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from data import models, validators
+
+
+class InstanceFilterBackend(BaseFilterBackend):
+    '''
+    Filters `Instance` entries from query parameters:
+     * `item` is the name of the `AbstractModel` master `Item` e.g. `?item=Book`
+     * `abm` is the `AbstractModel` id e.g. `?abm=1`
+     * `attribute.<key>` and `measure.<key>` filter on a json value e.g. `?attribute.title=Emma`,
+       with an optional lookup suffix for ranges or prefixes e.g. `?measure.pages__gte=100` or
+       `?attribute.title__startswith=Em`
+
+    Value filters use the indexed `InstanceValue` table. Range lookups compare numbers if the
+    input value is numeric, otherwise strings
+    '''
+
+    value_lookups = ['eq', 'gt', 'gte', 'lt', 'lte', 'startswith']
+
+    def filter_queryset(self, request, queryset, view):
+        '''
+        Return the input `queryset` filtered by any filter query parameters
+        '''
+
+        if request.query_params.get('item', None):
+            queryset = queryset.filter(abm__master_item__name=request.query_params['item'])
+
+        if request.query_params.get('abm', None):
+            abm_id = validators.to_id(request.query_params['abm'])
+
+            if abm_id is None:
+                raise ValidationError({
+                    'abm': ['"' + request.query_params['abm'] + '" is not a valid id.']
+                })
+
+            queryset = queryset.filter(abm_id=abm_id)
+
+        for param, value in request.query_params.items():
+            field_name, _, key = param.partition('.')
+
+            if field_name in models.InstanceValue.FIELD_NAMES and key:
+                queryset = self.filter_value(queryset, field_name, key, value)
+
+        return queryset
+
+    def filter_value(self, queryset, field_name, key, value):
+        '''
+        Return the input `queryset` filtered by a single `attribute` or `measure` json value
+        '''
+
+        key, _, lookup = key.partition('__')
+        lookup = lookup or 'eq'
+
+        if lookup not in self.value_lookups:
+            raise ValidationError({
+                field_name + '.' + key: ['"' + lookup + '" is not a valid lookup.']
+            })
+
+        if lookup == 'eq':
+            column, lookup_value = 'value', value
+        elif lookup == 'startswith':
+            column, lookup_value = 'value__startswith', value
+        else:
+            # Compare numbers if we can, otherwise fall back to comparing strings
+            number = models.InstanceValue.to_number(value)
+            column = ('number__' if number is not None else 'value__') + lookup
+            lookup_value = number if number is not None else value
+
+        # Each `filter()` call adds its own join so predicates on different keys combine
+        return queryset.filter(**{
+            'values__field': field_name,
+            'values__key': key,
+            'values__' + column: lookup_value,
+        })
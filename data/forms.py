@@ -9,8 +9,9 @@ import os
 
 from django import forms
 from django.conf import settings
+from django.db.models import Prefetch
 
-from data import models
+from data import codec, inference, models, schema, validators
 
 
 class RetrieveDataForm(forms.Form):
@@ -22,9 +23,12 @@ class RetrieveDataForm(forms.Form):
 
     data_request = forms.CharField(required=True, widget=forms.Textarea)
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, item_ids=None, **kwargs):
         '''
         Override superclass init to initialise class atttributes required later
+
+        `item_ids` is an optional dict of `Item` name to id (or `None` if it doesn't exist)
+        already looked up, so forms validated together can share one `Item` query
         '''
 
         # Default init
@@ -32,6 +36,7 @@ class RetrieveDataForm(forms.Form):
 
         self.data_request = None
         self.uoa = None
+        self.item_ids = item_ids
 
     def clean_data_request(self):
         '''
@@ -39,7 +44,9 @@ class RetrieveDataForm(forms.Form):
          * is actually json
          * contains the key "UOA" required to map to `RankingCluster` `master_item` field
          * Value in the "UOA" key is a valid `Item`
-         * Other key value pairs are dicts with "ATTR", "MEAS" and "LINK"
+         * Other key value pairs are dicts with "ATTR", "MEAS" and "LINK" lists of strings
+
+        Every error in the request is reported together
         '''
 
         data_request_json = self.cleaned_data['data_request']
@@ -53,46 +60,109 @@ class RetrieveDataForm(forms.Form):
             self.add_error('data_request', [err])
 
         # Now check if the json data is valid
-        if self.data_request: # pylint: disable=too-many-nested-blocks
-            # Check the uoa and pop
-            if self.data_request.get('UOA', None):
-                # Check that UOA value is a valid `Item`
+        if self.data_request:
+            if isinstance(self.data_request, dict) and self.data_request.get('UOA', None):
                 # Pop out "UOA" as we don't need it anymore
                 uoa = self.data_request.pop('UOA')
 
-                if models.Item.objects.filter(name=uoa).exists():
-                    # Update uoa with the `Item` entry
-                    self.uoa = models.Item.objects.get(name=uoa)
+                # Check that UOA value is a valid `Item`, in the schema snapshot unless it was
+                # already looked up
+                if not isinstance(uoa, str):
+                    uoa_id = None
+                    self.add_error('data_request', '"UOA" value is not a string.')
+
+                elif self.item_ids is not None and uoa in self.item_ids:
+                    uoa_id = self.item_ids[uoa]
 
                 else:
+                    uoa_id = schema.schema_snapshot.get_containing(
+                        'item_ids', [uoa]
+                    ).item_ids.get(uoa, None)
+
+                if uoa_id is not None:
+                    # Update uoa with the `Item` entry
+                    self.uoa = models.Item(id=uoa_id, name=uoa)
+
+                elif isinstance(uoa, str):
                     # If `Item doesn't exist, raise error
                     self.add_error('data_request', '"' + uoa + '" Item does not exist.')
 
+                # Check the other key value pairs
+                structure_errors = self.get_structure_errors(self.data_request)
+
+                if structure_errors:
+                    self.add_error('data_request', structure_errors)
+
             else:
                 # If data doesn't contain uoa key raise error
                 self.add_error('data_request', 'Input json doesn''t contain a "UOA" key.')
 
+        return data_request_json
+
+    @staticmethod
+    def get_structure_errors(data_request):
+        '''
+        Return a list of errors for the input `data_request` values that aren't dicts with only
+        "ATTR", "MEAS" and "LINK" keys, each a list of strings
+        '''
 
-            # Check the other key value pairs if the uoa is valid
-            if self.uoa:
-                for key, value in self.data_request.items():
-                    # Check if the value is a dict
-                    if isinstance(value, dict):
-                        for k in value.keys():
-                            if k not in ['ATTR', 'MEAS', 'LINK']:
-                                self.add_error(
-                                    'data_request',
-                                    '"' + key + '" value dictionary doesn''t contain "ATTR", ' +
-                                    '"MEAS" or "LINK" key(s).'
-                                )
+        errors = []
 
-                                # Break, we don't need to raise this error more than once
-                                break
+        for key, value in data_request.items():
+            if not isinstance(value, dict):
+                errors += ['"' + key + '" value is not a dictionary.']
 
-                    else:
-                        self.add_error('data_request', '"' + key + '" value is not a dictionary.')
+            elif set(value) - {'ATTR', 'MEAS', 'LINK'}:
+                errors += [
+                    '"' + key + '" value dictionary doesn''t contain "ATTR", "MEAS" or "LINK" ' +
+                    'key(s).'
+                ]
 
-        return data_request_json
+            else:
+                errors += [
+                    '"' + key + '" value "' + field + '" key is not a list of strings.'
+                    for field in ['ATTR', 'MEAS', 'LINK']
+                    if field in value and not validators.is_string_list(value[field])
+                ]
+
+        return errors
+
+    @property
+    def link_path(self):
+        '''
+        Return the "LINK" relationship strings requested for the UOA `Item` as a tuple, or `None`
+        if no "LINK" key was given (return all links)
+        '''
+
+        links = self.data_request.get(self.uoa.name, {}).get('LINK', None)
+
+        return tuple(links) if links is not None else None
+
+    @property
+    def json_keys(self):
+        '''
+        Return a dict of the `Instance` json fields to the "ATTR" and "MEAS" keys requested for
+        the UOA `Item`. Fields without a requested list of keys map to `None` (return all keys)
+
+        Only call this on a valid form, `get_structure_errors` checks the keys are lists of
+        strings so a string isn't split into its characters
+        '''
+
+        uoa_request = self.data_request.get(self.uoa.name, {})
+
+        return {
+            field_name: tuple(uoa_request[key]) if key in uoa_request else None
+            for field_name, key in [('attribute', 'ATTR'), ('measure', 'MEAS')]
+        }
+
+    @property
+    def retrieval_key(self):
+        '''
+        Return a hashable key describing the retrieval this `data_request` needs. Requests with
+        the same key return the same `Instance` data
+        '''
+
+        return (self.uoa.id, self.link_path, tuple(self.json_keys.items()))
 
     def retrieve_instances(self):
         '''
@@ -101,9 +171,6 @@ class RetrieveDataForm(forms.Form):
         `data_request` json should be validated first before calling this function
         '''
 
-        # Return empty queryset by default
-        retrieved_instances = models.Instance.objects.none()
-
         # Check if `is_valid()` has been called to validate the input `data_request`
         if not self.cleaned_data:
             raise ValueError('is_valid() must be called before return_data().')
@@ -114,7 +181,56 @@ class RetrieveDataForm(forms.Form):
                 'return_data() cannot be called because input form data didn''t validate.'
             )
 
-        return retrieved_instances
+        # Return the `Instance` entries of the UOA `Item`
+        retrieved_instances = models.Instance.objects.filter(
+            abm__master_item=self.uoa
+        ).select_related('abm__master_item').order_by('id')
+
+        # Only return links following the requested relationships if any are given
+        link_qs = models.InstanceLink.objects.all()
+
+        if self.link_path is not None:
+            link_qs = link_qs.filter(relationship__relationship_str__in=self.link_path)
+
+        return retrieved_instances.prefetch_related(Prefetch('link', queryset=link_qs))
+
+
+class InferCsvSchemaForm(forms.Form):
+    '''
+    Form provides fields for a user to upload a csv file to infer a proposed `AbstractModel` and
+    `abm_match_json` from, plus an optional `Item` name for the proposed `AbstractModel`
+
+    Unlike `UploadCsvFileForm` the file isn't copied to temporary storage, only a bounded sample
+    of it is read, see `data.inference`
+    '''
+
+    upload_file = forms.FileField(required=True, max_length=50, widget=forms.ClearableFileInput())
+    master_item = forms.CharField(required=False, max_length=255)
+
+    def clean_upload_file(self):
+        '''
+        Override field clean to check the uploaded file is a csv file
+        '''
+
+        upload_file = self.cleaned_data['upload_file']
+
+        if not os.path.splitext(upload_file.name)[1] == '.csv':
+            # If extension is not csv, raise error
+            raise forms.ValidationError('"' + upload_file.name + '" is not a valid csv.')
+
+        return upload_file
+
+    def infer(self):
+        '''
+        Method returns the schema inferred from the `upload_file` csv if all input data has been
+        validated, see `data.inference.infer_csv_schema`. The `master_item` defaults to the file
+        name without its extension
+        '''
+
+        upload_file = self.cleaned_data['upload_file']
+        master_item = self.cleaned_data['master_item'] or os.path.splitext(upload_file.name)[0]
+
+        return inference.infer_csv_schema(upload_file, master_item)
 
 
 class UploadCsvFileForm(forms.Form):
@@ -181,7 +297,7 @@ class UploadCsvFileForm(forms.Form):
         '''
         Override field clean to check the input abm_match_json:
          * is actually json
-         * references valid `AbstractModel` entries
+         * references valid `AbstractModel` entries, checked together in the schema snapshot
         '''
 
         abm_match_json = self.cleaned_data['abm_match_json']
@@ -194,13 +310,32 @@ class UploadCsvFileForm(forms.Form):
             # If input data is not json, raise error
             self.add_error('abm_match_json', [err])
 
+        # Check the data is a dict of column name to `AbstractModel` id
+        if self.abm_match_dict and not isinstance(self.abm_match_dict, dict):
+            self.add_error(
+                'abm_match_json', 'Data must be a json object of column names to AbstractModel ids.'
+            )
+            self.abm_match_dict = None
+
         # Now check if the data contains valid `AbstractModel` entries
         if self.abm_match_dict:
-            # Check that the referenced `AbstractModel` ids actually exist
-            if not all([models.AbstractModel.objects.filter(id=e).exists() for e in self.abm_match_dict.values()]): # pylint: disable=line-too-long
+            # Check that the referenced `AbstractModel` ids actually exist in the schema snapshot
+            abm_ids = [validators.to_id(value) for value in self.abm_match_dict.values()]
+            abstract_models = schema.schema_snapshot.get_containing(
+                'abstract_models', set(abm_ids) - {None}
+            ).abstract_models
+
+            # Report every missing reference together, once each in input order
+            missing = list(dict.fromkeys(
+                str(value) for value, abm_id in zip(self.abm_match_dict.values(), abm_ids)
+                if abm_id not in abstract_models
+            ))
+
+            if missing:
                 self.add_error(
                     'abm_match_json',
-                    'Data contains references to AbstractModel entries that do not exist.'
+                    'Data contains references to AbstractModel entries that do not exist: ' +
+                    ', '.join(missing) + '.'
                 )
                 # Clear the `abm_match_dict` as the data is invalid
                 self.abm_match_dict = None
@@ -232,12 +367,19 @@ class UploadCsvFileForm(forms.Form):
 
         # First unpack the `abm_match_dict` and group column names by abm_id
         for key, value in self.abm_match_dict.items():
+            # Ids may be given as json strings, so key them as the ints the codecs use
+            value = int(value)
+
             # If a referenced `AbstractModel` id already exists, append the column name
             if abm_ids.get(value, None):
                 abm_ids[value] =  abm_ids[value] + [key]
             else:
                 abm_ids[value] = [key]
 
+        # Get the compiled codec of each referenced `AbstractModel` once, to convert the values
+        # of its columns to their `DataType`s
+        abm_codecs = codec.abm_codecs.get_many(abm_ids)
+
         # Now open the csv and create `Instance` entries based on row data
         with open(self.upload_file_path, 'r') as csv_file:
             reader = csv.DictReader(csv_file)
@@ -252,8 +394,9 @@ class UploadCsvFileForm(forms.Form):
                         attribute_data[col_name] = row[col_name]
 
                     entry = models.Instance.objects.create(
-                        abm=models.AbstractModel.objects.get(id=abm_id),
-                        attribute=json.dumps(attribute_data)
+                        abm_id=abm_id,
+                        attribute=abm_codecs[abm_id].encode('attribute', attribute_data),
+                        schema_version=abm_codecs[abm_id].schema_version
                     )
 
                     # Add new entry to the list
@@ -0,0 +1,117 @@
+'''
+Write-behind group commit for the `data` Django app
+
+Writes submitted from many request threads are buffered for up to
+`settings.GROUP_COMMIT_WINDOW_MS` milliseconds by a single writer thread, then run in one
+transaction so they share one commit. Each submitter is only answered after that commit, so an
+acknowledged write is as durable as one committed on its own
+'''
+
+
+import queue
+import threading
+import time
+
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+
+class GroupCommitter:
+    '''
+    Runs submitted write functions in batches, one transaction per batch
+    '''
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, func):
+        '''
+        Run the input write `func` in the next batch and return its result once the batch has
+        committed. Errors raised by `func`, or by the commit, are raised here
+
+        A `func` that fails is rolled back to a savepoint so the rest of the batch still commits
+        '''
+
+        future = Future()
+        self._queue.put((func, future))
+        self._start_writer()
+
+        return future.result()
+
+    def _start_writer(self):
+        '''
+        Start the writer thread if it isn't running yet
+        '''
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run_writer, name='group-commit', daemon=True
+                )
+                self._thread.start()
+
+    def _run_writer(self):
+        '''
+        Writer thread loop, collects submitted writes until the window closes or the batch is
+        full and then flushes them
+        '''
+
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + settings.GROUP_COMMIT_WINDOW_MS / 1000
+
+            while len(batch) < settings.GROUP_COMMIT_MAX_BATCH:
+                timeout = deadline - time.monotonic()
+
+                if timeout <= 0:
+                    break
+
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+
+                except queue.Empty:
+                    break
+
+            self._flush(batch)
+
+    def _flush(self, batch): # pylint: disable=no-self-use
+        '''
+        Run every write in the input `batch` in one transaction, then answer each submitter
+        '''
+
+        outcomes = []
+        close_old_connections()
+
+        try:
+            with transaction.atomic():
+                for func, future in batch:
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((future, func(), None))
+
+                    except Exception as err: # pylint: disable=broad-except
+                        outcomes.append((future, None, err))
+
+        except Exception as err: # pylint: disable=broad-except
+            # The commit failed, so none of the writes in the batch were saved
+            for _, future in batch:
+                future.set_exception(err)
+
+            return
+
+        finally:
+            close_old_connections()
+
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+
+            else:
+                future.set_exception(error)
+
+
+instance_group_commit = GroupCommitter()
@@ -3,7 +3,243 @@ Helper functions for the `data` Django application
 '''
 
 
-from data import models, serializers
+import asyncio
+import contextlib
+import functools
+import time
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F, Prefetch
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+
+from data import codec, models, serializers
+
+
+# Bounded pool of threads used by async views to run blocking database work
+DB_EXECUTOR = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_WORKERS, thread_name_prefix='nrrt-db'
+)
+
+
+def _run_with_db_connection(func, *args, **kwargs):
+    '''
+    Run the input `func` in the current thread, making sure its database connection is fresh
+    before and released after, the same as Django does around a sync request
+    '''
+
+    close_old_connections()
+
+    try:
+        return func(*args, **kwargs)
+
+    finally:
+        close_old_connections()
+
+
+async def run_in_db_pool(func, *args, **kwargs):
+    '''
+    Run the blocking input `func` in the bounded `DB_EXECUTOR` thread pool and await the result
+    so the event loop is free to serve other requests in the meantime
+    '''
+
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(
+        DB_EXECUTOR, functools.partial(_run_with_db_connection, func, *args, **kwargs)
+    )
+
+
+def retrieve_data_requests(data_request_forms):
+    '''
+    Return serialized `Instance` data for each validated `RetrieveDataForm` in the input
+    `data_request_forms`, in the same order
+
+    Forms are grouped by `retrieval_key` (UOA, link path and json keys) so each group is only
+    serialized once, and the `Instance` entries of every UOA in the batch are fetched together in
+    one query with their links prefetched once
+    '''
+
+    groups = defaultdict(list)
+
+    # Group the forms by the retrieval they need
+    for index, form in enumerate(data_request_forms):
+        groups[form.retrieval_key].append(index)
+
+    uoa_ids = {key[0] for key in groups}
+
+    # Fetch all `Instance` entries for all UOAs in one go
+    instances = models.Instance.objects.filter(
+        abm__master_item__in=uoa_ids
+    ).select_related('abm__master_item').prefetch_related(
+        Prefetch('link', queryset=models.InstanceLink.objects.select_related('relationship'))
+    ).order_by('id')
+
+    instances_by_uoa = defaultdict(list)
+    link_relationships = {}
+
+    for instance in instances:
+        instances_by_uoa[instance.abm.master_item_id].append(instance)
+
+        for link in instance.link.all():
+            link_relationships[link.id] = link.relationship.relationship_str
+
+    # Serialize the `Instance` entries of each UOA once
+    serialized_by_uoa = {
+        uoa_id: serializers.InstanceSerializer(instances_by_uoa[uoa_id], many=True).data
+        for uoa_id in uoa_ids
+    }
+
+    results = [None] * len(data_request_forms)
+
+    for (uoa_id, link_path, json_keys), indexes in groups.items():
+        data = serialized_by_uoa[uoa_id]
+
+        # Only keep links following the requested relationships if any are given
+        if link_path is not None:
+            data = [
+                dict(row, link=[l for l in row['link'] if link_relationships[l] in link_path])
+                for row in data
+            ]
+
+        # Only keep the requested json keys
+        for field_name, keys in json_keys:
+            if keys is not None:
+                data = [
+                    dict(row, **{
+                        field_name: serializers.project_json_keys(row[field_name], keys)
+                    })
+                    for row in data
+                ]
+
+        for index in indexes:
+            results[index] = data
+
+    return results
+
+
+def explain_queries(captured_queries):
+    '''
+    Return each captured sql statement with its execution time and the database query plan
+    from the vendor's `EXPLAIN` prefix e.g. `EXPLAIN QUERY PLAN` on sqlite
+    '''
+
+    explained = []
+
+    for query in captured_queries:
+        entry = {'sql': query['sql'], 'time': float(query['time']), 'plan': None}
+
+        # Only select statements can be explained safely
+        if query['sql'].lstrip().upper().startswith('SELECT'):
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        connection.ops.explain_query_prefix() + ' ' + query['sql']
+                    )
+                    entry['plan'] = [list(row) for row in cursor.fetchall()]
+
+            except DatabaseError as err:
+                entry['plan'] = str(err)
+
+        explained += [entry]
+
+    return explained
+
+
+@contextlib.contextmanager
+def profile_stage(name, stages):
+    '''
+    Context manager to time a stage of a request and capture its sql statements. A dict
+    describing the stage is appended to the input `stages` list and yielded so the caller can
+    record the number of rows touched
+    '''
+
+    stage = {'stage': name, 'rows': None}
+
+    with CaptureQueriesContext(connection) as captured:
+        start = time.perf_counter()
+        yield stage
+        stage['time_ms'] = (time.perf_counter() - start) * 1000
+
+    stage['queries'] = explain_queries(captured.captured_queries)
+    stages += [stage]
+
+
+def explain_data_request(form):
+    '''
+    Validate the input unbound `RetrieveDataForm`, retrieve and serialize its `Instance` entries
+    and return a report of the compiled plan, sql statements with their query plans, and the
+    wall time and rows touched by each stage
+    '''
+
+    stages = []
+
+    with profile_stage('validate', stages):
+        is_valid = form.is_valid()
+
+    report = {'valid': is_valid, 'plan': None, 'stages': stages}
+
+    if not is_valid:
+        report['errors'] = form.errors.get_json_data()
+
+        return report
+
+    instances_qs = form.retrieve_instances()
+
+    report['plan'] = {
+        'uoa': form.uoa.name,
+        'link_path': form.link_path,
+        'sql': str(instances_qs.query),
+    }
+
+    with profile_stage('retrieve', stages) as stage:
+        instances = list(instances_qs)
+        stage['rows'] = len(instances) + sum(len(e.link.all()) for e in instances)
+
+    with profile_stage('serialize', stages) as stage:
+        stage['rows'] = len(serializers.InstanceSerializer(instances, many=True).data)
+
+    report['total_time_ms'] = sum(stage['time_ms'] for stage in stages)
+
+    return report
+
+
+def rank_instances(instances, ranking_feature):
+    '''
+    Return the input `Instance` entries ordered by the value of their `ranking_feature` attribute
+    or measure, decoded with the compiled codec of their `AbstractModel`
+
+    Numbers rank first from highest to lowest, then other values in text order, then entries
+    without the feature. Entries that tie keep their input order
+    '''
+
+    abm_codecs = codec.abm_codecs.get_many({instance.abm_id for instance in instances})
+
+    def ranking_key(instance):
+        abm_codec = abm_codecs.get(instance.abm_id, None)
+
+        if abm_codec is None:
+            return (2, 0)
+
+        for field_name in ['measure', 'attribute']:
+            values = abm_codec.decode(field_name, getattr(instance, field_name))
+
+            if ranking_feature in values:
+                value = values[ranking_feature]
+
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    return (0, -value)
+
+                return (1, str(value))
+
+        return (2, 0)
+
+    return sorted(instances, key=ranking_key)
 
 
 def update_ranking_clusters(item_qs, ranking_feature='NULL'):
@@ -12,12 +248,18 @@ def update_ranking_clusters(item_qs, ranking_feature='NULL'):
      * Return all `Instance` entries linked to the `Item`
      * Serialize the returned `Instance` entries
      * Get or create a `RankingCluster` entry master_item=`Item` and ranking_feature=None
-     * Update the `instances_ranking` field with the serialized `Instance` entries
+     * Update the `instances_ranking` field with the serialized `Instance` entries, ranked by
+       the `ranking_feature` attribute or measure if one is given
     '''
 
+    # Read the number of instances of every `Item` from their counters in one query
+    instance_counts = models.ItemInstanceCounter.objects.get_counts([item.id for item in item_qs])
+
     for item in item_qs:
         # Grab the related `Instance` entries
-        instance_qs = models.Instance.objects.filter(abm__master_item=item)
+        instance_qs = models.Instance.objects.filter(
+            abm__master_item=item
+        ).select_related('abm__master_item').prefetch_related('link')
 
         # Get or create the `RankingCluster` entry with `ranking_feature=ranking_feature`
         ranking_cluster, _ = models.RankingCluster.objects.get_or_create(
@@ -25,8 +267,163 @@ def update_ranking_clusters(item_qs, ranking_feature='NULL'):
         )
 
         # Serialize the `instance_qs` and save to the `RankingCluster`
-        serializer = serializers.InstanceSerializer(instance_qs, many=True)
+        instances = list(instance_qs)
+
+        if ranking_feature != 'NULL':
+            instances = rank_instances(instances, ranking_feature)
 
-        ranking_cluster.number_of_instances = instance_qs.count()
+        serializer = serializers.InstanceSerializer(instances, many=True)
+
+        ranking_cluster.number_of_instances = instance_counts[item.id]
         ranking_cluster.instances_ranking = serializer.data
         ranking_cluster.save()
+
+
+def get_instance_summary():
+    '''
+    Return the number of `Instance` entries per `Item` and per `AbstractModel`, and the number of
+    `Instance` links per `Relationship`, read from the instance counters
+
+    Only targets with a counter are included, so unused entries are left out
+    '''
+
+    def read_counters(counter_model, name_key, name_field, count_key):
+        rows = counter_model.objects.order_by('target_id').values_list(
+            'target_id', name_field, 'count'
+        )
+
+        return [
+            {'id': target_id, name_key: name, count_key: count} for target_id, name, count in rows
+        ]
+
+    return {
+        'items': read_counters(
+            models.ItemInstanceCounter, 'name', 'target__name', 'instances'
+        ),
+        'abstract_models': read_counters(
+            models.AbstractModelInstanceCounter, 'master_item', 'target__master_item__name',
+            'instances'
+        ),
+        'relationships': read_counters(
+            models.RelationshipInstanceCounter, 'relationship_str', 'target__relationship_str',
+            'instance_links'
+        ),
+    }
+
+
+def import_abstract_models(records):
+    '''
+    Validate every `AbstractModel` json object in the input `records` iterable, and if all are
+    valid create them in batches of `settings.BULK_BATCH_SIZE`, one transaction and one set of
+    set-based writes per batch
+
+    Returns a report with a result per record in input order (`index`, `status` and the `id` of
+    the entry or the `errors`), the number created and the throughput. Records with the same
+    structure as an existing `AbstractModel`, or an earlier record, aren't created again and get
+    a 200 status with `"existing": true` instead of 201
+    '''
+
+    start = time.perf_counter()
+
+    # Validate the whole set first
+    bound_serializers = []
+    results = []
+
+    for index, record in enumerate(records):
+        serializer = serializers.AbstractModelSerializer(data=record)
+        result = {'index': index}
+
+        if not serializer.is_valid():
+            result.update(status=status.HTTP_400_BAD_REQUEST, errors=serializer.errors)
+
+        bound_serializers += [serializer]
+        results += [result]
+
+    if not any('errors' in result for result in results):
+        for batch_start in range(0, len(bound_serializers), settings.BULK_BATCH_SIZE):
+            batch_end = batch_start + settings.BULK_BATCH_SIZE
+
+            try:
+                entries = serializers.AbstractModelSerializer.create_all([
+                    serializer.validated_data
+                    for serializer in bound_serializers[batch_start:batch_end]
+                ], return_created=True)
+
+            except DatabaseError as err:
+                # The batch was rolled back, so fail every record in it
+                for result in results[batch_start:batch_end]:
+                    result.update(status=status.HTTP_409_CONFLICT, errors=[str(err)])
+
+                continue
+
+            for result, (entry, created) in zip(results[batch_start:batch_end], entries):
+                if created:
+                    result.update(status=status.HTTP_201_CREATED, id=entry.id)
+
+                else:
+                    result.update(status=status.HTTP_200_OK, id=entry.id, existing=True)
+
+    elapsed = time.perf_counter() - start
+
+    return {
+        'records': len(results),
+        'created': sum(result.get('status') == status.HTTP_201_CREATED for result in results),
+        'existing': sum(result.get('existing', False) for result in results),
+        'time_ms': round(elapsed * 1000, 3),
+        'records_per_second': round(len(results) / elapsed, 1) if elapsed else None,
+        'results': results,
+    }
+
+
+def migrate_instance_schemas(batch_size=None, pause_ms=None, abm_ids=None):
+    '''
+    Rewrite the `attribute` and `measure` json of `Instance` entries written under an older
+    schema version of their `AbstractModel`, optionally only those of the input `abm_ids`
+
+    Entries are upgraded `batch_size` at a time in id order, one locked transaction per batch
+    that also re-indexes their `InstanceValue`s, with a `pause_ms` millisecond pause between
+    batches so the migration doesn't crowd out other writes. Defaults are read from the
+    `SCHEMA_MIGRATION_*` settings
+
+    Returns a report of the number of entries migrated, the number of batches and the time taken
+    '''
+
+    batch_size = batch_size or settings.SCHEMA_MIGRATION_BATCH_SIZE
+    pause_ms = settings.SCHEMA_MIGRATION_PAUSE_MS if pause_ms is None else pause_ms
+
+    start = time.perf_counter()
+    stale_qs = models.Instance.objects.filter(schema_version__lt=F('abm__schema_version'))
+
+    if abm_ids is not None:
+        stale_qs = stale_qs.filter(abm_id__in=abm_ids)
+
+    migrated = 0
+    batches = 0
+    last_id = 0
+
+    while True:
+        with transaction.atomic():
+            # Walk forward by id so every entry is visited once, even if its codec is stale
+            batch = list(stale_qs.filter(id__gt=last_id).order_by('id').select_for_update()[
+                :batch_size
+            ])
+
+            if not batch:
+                break
+
+            codec.upgrade_instances(batch)
+            models.Instance.objects.bulk_update(batch, ['attribute', 'measure', 'schema_version'])
+            models.InstanceValue.objects.index_instances(batch)
+
+        last_id = batch[-1].id
+        migrated += len(batch)
+        batches += 1
+
+        if pause_ms:
+            time.sleep(pause_ms / 1000)
+
+    return {
+        'migrated': migrated,
+        'batches': batches,
+        'time_ms': round((time.perf_counter() - start) * 1000, 3),
+    }
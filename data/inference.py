@@ -0,0 +1,224 @@
+'''
+Schema inference from a bounded sample of an uploaded csv for the `data` Django app
+
+Only the header, the first `settings.SCHEMA_INFERENCE_HEAD_ROWS` rows and a random sample of up
+to `settings.SCHEMA_INFERENCE_SAMPLE_ROWS` other rows are read, so inference runs in bounded time
+and memory however large the file is
+'''
+
+
+import csv
+import itertools
+import os
+import random
+
+from django.conf import settings
+from django.utils.dateparse import parse_date, parse_datetime
+
+from data import codec, models
+
+
+def to_timestamp(value):
+    '''
+    Return the input ISO 8601 date or datetime string as a date or datetime
+    '''
+
+    parsed = parse_datetime(value) or parse_date(value)
+
+    if parsed is None:
+        raise ValueError('"' + value + '" is not a timestamp.')
+
+    return parsed
+
+
+# `DataType` names tried in order by `infer_data_type`, narrowest first, with their converters
+INFERRED_TYPES = [
+    ('INT', codec.to_int),
+    ('FLOAT', codec.to_float),
+    ('BOOL', codec.to_bool),
+    ('TIMESTAMP', to_timestamp),
+]
+
+
+def converts(converter, value):
+    '''
+    Return `True` if the input `converter` accepts the input `value`
+    '''
+
+    try:
+        converter(value)
+
+    except (TypeError, ValueError, OverflowError):
+        return False
+
+    return True
+
+
+def infer_data_type(values):
+    '''
+    Return the name of the narrowest `DataType` every non blank value in the input `values`
+    converts to, INT, FLOAT, BOOL or TIMESTAMP, or VARCHAR if there is none
+    '''
+
+    values = [value.strip() for value in values if value and value.strip()]
+
+    for name, converter in INFERRED_TYPES:
+        if values and all(converts(converter, value) for value in values):
+            return name
+
+    return 'VARCHAR'
+
+
+def iter_lines(file, encoding='utf-8'):
+    '''
+    Generator yields the lines of the input binary `file` decoded, from its current position.
+    Each line read is capped at `settings.SCHEMA_INFERENCE_MAX_LINE_BYTES`
+    '''
+
+    while True:
+        line = file.readline(settings.SCHEMA_INFERENCE_MAX_LINE_BYTES)
+
+        if not line:
+            return
+
+        yield line.decode(encoding, errors='replace')
+
+
+def sample_csv(file, rng=None):
+    '''
+    Return the header, the head rows and a random sample of the other rows of the input seekable
+    binary csv `file`, and a dict describing the sample
+
+    If the rest of the file fits in `settings.SCHEMA_INFERENCE_SCAN_BYTES` it is read to the end
+    and sampled uniformly with a reservoir. Larger files are sampled by seeking to random byte
+    offsets and reading the next whole line, which reads a bounded number of bytes but favours
+    longer rows and skips rows containing quoted line breaks
+    '''
+
+    rng = rng or random.Random()
+    sample_size = settings.SCHEMA_INFERENCE_SAMPLE_ROWS
+
+    file.seek(0, os.SEEK_END)
+    file_bytes = file.tell()
+    file.seek(0)
+
+    reader = csv.reader(iter_lines(file, 'utf-8-sig'))
+    header = next(reader, [])
+    head = list(itertools.islice(reader, settings.SCHEMA_INFERENCE_HEAD_ROWS))
+    head_end = file.tell()
+    sample = []
+
+    if file_bytes - head_end <= settings.SCHEMA_INFERENCE_SCAN_BYTES:
+        method = 'reservoir'
+
+        for seen, row in enumerate(reader):
+            if seen < sample_size:
+                sample += [row]
+
+            else:
+                index = rng.randint(0, seen)
+
+                if index < sample_size:
+                    sample[index] = row
+
+    else:
+        method = 'random_offsets'
+
+        for offset in sorted(rng.randrange(head_end, file_bytes) for _ in range(sample_size)):
+            file.seek(offset)
+
+            # Skip the rest of the line the offset landed in
+            file.readline(settings.SCHEMA_INFERENCE_MAX_LINE_BYTES)
+            row = next(csv.reader(itertools.islice(iter_lines(file), 1)), None)
+
+            # Rows with the wrong number of columns were cut off or split by a quoted line break
+            if row is not None and len(row) == len(header):
+                sample += [row]
+
+    return header, head, sample, {
+        'method': method,
+        'file_bytes': file_bytes,
+        'head_rows': len(head),
+        'sample_rows': len(sample),
+    }
+
+
+def get_abm_match(column_names, existing_abm_id):
+    '''
+    Return a dict proposing the `AbstractModel` id for each of the input csv `column_names`:
+     * the input `existing_abm_id` for every column, if an `AbstractModel` with the inferred
+       structure already exists
+     * otherwise the `AbstractModel` with an attribute of the same name that covers the most
+       columns, or `None` if there is none and a new `AbstractModel` is needed
+    '''
+
+    if existing_abm_id is not None:
+        return {name: existing_abm_id for name in column_names}
+
+    candidates = {name: [] for name in column_names}
+    coverage = {}
+
+    for abm_id, name in models.AbstractModel.attribute.through.objects.filter(
+            attribute__name__in=column_names
+    ).order_by('abstractmodel_id').values_list('abstractmodel_id', 'attribute__name'):
+        candidates[name] += [abm_id]
+        coverage[abm_id] = coverage.get(abm_id, 0) + 1
+
+    return {
+        name: max(abm_ids, key=lambda abm_id: (coverage[abm_id], -abm_id)) if abm_ids else None
+        for name, abm_ids in candidates.items()
+    }
+
+
+def infer_csv_schema(file, master_item, rng=None):
+    '''
+    Infer the schema of the input seekable binary csv `file` from a bounded sample of its rows
+
+    Returns a dict of:
+     * `columns`: each column name with its inferred `DataType`, the number of blank sampled
+       values and up to three example values
+     * `abstract_model`: a proposed `AbstractModel` json object for the input `master_item`
+       name, in the shape `AbstractModelSerializer` accepts
+     * `existing_abm`: the id of an `AbstractModel` with exactly this structure, or `None`
+     * `abm_match`: a proposed `abm_match_json` mapping for `UploadCsvFileForm`, see
+       `get_abm_match`
+     * `sample`: a description of the rows read, see `sample_csv`
+    '''
+
+    header, head, sample, sample_report = sample_csv(file, rng)
+    rows = head + sample
+    columns = []
+
+    for index, name in enumerate(header):
+        values = [row[index] if index < len(row) else '' for row in rows]
+        examples = list(dict.fromkeys(value for value in values if value.strip()))[:3]
+
+        columns += [{
+            'name': name,
+            'value_dtype': infer_data_type(values),
+            'blank_values': sum(1 for value in values if not value.strip()),
+            'examples': examples,
+        }]
+
+    master_item = master_item.capitalize()
+    fingerprint = models.get_abm_fingerprint(
+        master_item, [(c['name'], c['value_dtype']) for c in columns], [], []
+    )
+    existing_abm_id = models.AbstractModel.objects.filter(
+        fingerprint=fingerprint
+    ).values_list('id', flat=True).first()
+
+    return {
+        'columns': columns,
+        'abstract_model': {
+            'master_item': master_item,
+            'attribute': [
+                {'attribute_name': c['name'], 'value_dtype': c['value_dtype']} for c in columns
+            ],
+            'measure': [],
+            'link': [],
+        },
+        'existing_abm': existing_abm_id,
+        'abm_match': get_abm_match(header, existing_abm_id),
+        'sample': sample_report,
+    }
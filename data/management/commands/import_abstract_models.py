@@ -0,0 +1,59 @@
+'''
+Management command to import `AbstractModel` definitions from a json array or JSONL file
+'''
+
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.exceptions import ParseError
+
+from data import helpers, parsers
+
+
+class Command(BaseCommand):
+    '''
+    Imports a json array or JSONL file of `AbstractModel` objects in the `doc/abm_input.json`
+    shape, reading the file incrementally. Every object is validated before anything is written
+    '''
+
+    help = 'Import AbstractModel definitions from a json array or JSONL file ("-" for stdin)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='json array or JSONL file of AbstractModel objects')
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            report = self.import_file(sys.stdin.buffer)
+
+        else:
+            try:
+                with open(options['path'], 'rb') as file:
+                    report = self.import_file(file)
+
+            except OSError as err:
+                raise CommandError(err)
+
+        for result in report['results']:
+            if 'errors' in result:
+                self.stderr.write('Record {}: {}'.format(result['index'], result['errors']))
+
+        self.stdout.write('Imported {created} of {records} AbstractModels ({existing} already '
+                          'existed) in {time_ms} ms ({records_per_second} records/s)'
+                          .format(**report))
+
+        if report['created'] + report['existing'] != report['records']:
+            raise CommandError('Import failed, see the record errors above.')
+
+    @staticmethod
+    def import_file(file):
+        '''
+        Import the `AbstractModel` objects in the input binary `file`
+        '''
+
+        try:
+            return helpers.import_abstract_models(parsers.iter_json_values(file))
+
+        except ParseError as err:
+            raise CommandError(err.detail)
@@ -0,0 +1,35 @@
+'''
+Management command to upgrade `Instance` json to the current schema version of its
+`AbstractModel`
+'''
+
+
+from django.core.management.base import BaseCommand
+
+from data import helpers
+
+
+class Command(BaseCommand):
+    '''
+    Rewrites `Instance` entries written under an older `AbstractModel` schema version in
+    throttled batches. Entries are upgraded when read anyway, so this can run in the background
+    '''
+
+    help = 'Upgrade Instance json written under older AbstractModel schema versions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--abm', type=int, nargs='+', dest='abm_ids',
+                            help='only migrate the Instances of these AbstractModel ids')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Instances rewritten per transaction')
+        parser.add_argument('--pause-ms', type=int, default=None,
+                            help='milliseconds to pause between batches')
+
+    def handle(self, *args, **options):
+        report = helpers.migrate_instance_schemas(
+            batch_size=options['batch_size'], pause_ms=options['pause_ms'],
+            abm_ids=options['abm_ids']
+        )
+
+        self.stdout.write('Migrated {migrated} Instances in {batches} batches in {time_ms} ms'
+                          .format(**report))
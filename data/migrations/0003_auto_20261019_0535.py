@@ -0,0 +1,118 @@
+# Generated by Django 3.1.2 on 2026-10-19 05:35
+
+import re
+
+from collections import namedtuple
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Frozen copy of the `relationship_str` parser at the time of this migration, so it doesn't
+# change if the parser in `data.models` does
+
+RELATIONSHIP_STR_REGEX = re.compile(
+    r'^\((?P<left>\w+)\)(?P<in_arrow><?)-\[(?P<label>\w+)\]-(?P<out_arrow>>?)\((?P<right>\w+)\)$'
+)
+
+RELATIONSHIP_ITEMS_REGEX = re.compile(r'^\((\w+)\).+\((\w+)\)$')
+
+ParsedRelationship = namedtuple(
+    'ParsedRelationship', ['left_item', 'right_item', 'label', 'direction']
+)
+
+
+def parse_relationship_str(relationship_str):
+    '''
+    Parse an input `relationship_str` e.g. (Book)<-[WROTE]-(Person) into a `ParsedRelationship`
+    containing the left and right `Item` names, the label and the direction. Returns `None` if no
+    `Item` names can be found
+    '''
+
+    m = RELATIONSHIP_STR_REGEX.match(relationship_str)
+
+    if m:
+        direction = {
+            ('<', '>'): 'BOTH',
+            ('<', ''): 'LEFT',
+            ('', '>'): 'RIGHT',
+        }.get((m.group('in_arrow'), m.group('out_arrow')), 'NONE')
+
+        return ParsedRelationship(
+            m.group('left').capitalize(), m.group('right').capitalize(),
+            m.group('label').upper(), direction
+        )
+
+    m = RELATIONSHIP_ITEMS_REGEX.match(relationship_str)
+
+    if m:
+        return ParsedRelationship(m.group(1).capitalize(), m.group(2).capitalize(), '', '')
+
+    return None
+
+
+def populate_parsed_relationship_columns(apps, schema_editor):
+    '''
+    Parse the `relationship_str` of existing `Relationship` entries into the new columns
+    '''
+
+    Item = apps.get_model('data', 'Item')
+    Relationship = apps.get_model('data', 'Relationship')
+
+    for relationship in Relationship.objects.all():
+        parsed = parse_relationship_str(relationship.relationship_str)
+
+        if parsed:
+            relationship.left_item, _ = Item.objects.get_or_create(name=parsed.left_item)
+            relationship.right_item, _ = Item.objects.get_or_create(name=parsed.right_item)
+            relationship.label = parsed.label
+            relationship.direction = parsed.direction
+            relationship.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0002_auto_20201112_2005'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='relationship',
+            name='direction',
+            field=models.CharField(blank=True, choices=[('LEFT', 'Right to left e.g. (Book)<-[WROTE]-(Person)'), ('RIGHT', 'Left to right e.g. (Person)-[BORN]->(Country)'), ('BOTH', 'Both ways e.g. (Person)<-[KNOWS]->(Person)'), ('NONE', 'No direction e.g. (Person)-[KNOWS]-(Person)')], max_length=5),
+        ),
+        migrations.AddField(
+            model_name='relationship',
+            name='label',
+            field=models.CharField(blank=True, max_length=140),
+        ),
+        migrations.AddField(
+            model_name='relationship',
+            name='left_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='left_relationships', to='data.item'),
+        ),
+        migrations.AddField(
+            model_name='relationship',
+            name='right_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='right_relationships', to='data.item'),
+        ),
+        migrations.AlterField(
+            model_name='relationship',
+            name='relationship_str',
+            field=models.CharField(db_index=True, max_length=140),
+        ),
+        migrations.AddIndex(
+            model_name='relationship',
+            index=models.Index(fields=['label', 'direction'], name='data_relati_label_5cc354_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='relationship',
+            index=models.Index(fields=['left_item', 'label'], name='data_relati_left_it_d987fd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='relationship',
+            index=models.Index(fields=['right_item', 'label'], name='data_relati_right_i_b2e2d3_idx'),
+        ),
+        migrations.RunPython(populate_parsed_relationship_columns, migrations.RunPython.noop),
+    ]
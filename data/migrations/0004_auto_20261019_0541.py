@@ -0,0 +1,93 @@
+# Generated by Django 3.1.2 on 2026-10-19 05:41
+
+import json
+import math
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Frozen copies of the `InstanceValue` helpers at the time of this migration, so it doesn't
+# change if the model does
+
+FIELD_NAMES = ['attribute', 'measure']
+
+
+def parse_values(json_str):
+    '''
+    Return the key value pairs of the input json object string as strings. Returns nothing if the
+    string isn't a json object
+    '''
+
+    try:
+        data = json.loads(json_str)
+
+    except (TypeError, ValueError):
+        return []
+
+    if not isinstance(data, dict):
+        return []
+
+    return [(key, str(value)) for key, value in data.items()]
+
+
+def to_number(value):
+    '''
+    Return the input string `value` as a float if it is a finite number, otherwise `None`
+    '''
+
+    try:
+        number = float(value)
+
+    except ValueError:
+        return None
+
+    return number if math.isfinite(number) else None
+
+
+def index_existing_instance_values(apps, schema_editor):
+    '''
+    Create `InstanceValue` entries for the `attribute` and `measure` json of existing `Instance`
+    entries
+    '''
+
+    Instance = apps.get_model('data', 'Instance')
+    InstanceValue = apps.get_model('data', 'InstanceValue')
+
+    for instance in Instance.objects.iterator():
+        InstanceValue.objects.bulk_create([
+            InstanceValue(instance=instance, field=field_name, key=key, value=value,
+                          number=to_number(value))
+            for field_name in FIELD_NAMES
+            for key, value in parse_values(getattr(instance, field_name))
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0003_auto_20261019_0535'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstanceValue',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('attribute', 'attribute'), ('measure', 'measure')], max_length=9)),
+                ('key', models.CharField(max_length=140)),
+                ('value', models.CharField(max_length=140)),
+                ('number', models.FloatField(blank=True, null=True)),
+                ('instance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='data.instance')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='instancevalue',
+            index=models.Index(fields=['field', 'key', 'value'], name='data_instan_field_d95798_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instancevalue',
+            index=models.Index(fields=['field', 'key', 'number'], name='data_instan_field_cc416b_idx'),
+        ),
+        migrations.RunPython(index_existing_instance_values, migrations.RunPython.noop),
+    ]
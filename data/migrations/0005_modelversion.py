@@ -0,0 +1,23 @@
+# Generated by Django 3.1.2 on 2026-10-19 05:42
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0004_auto_20261019_0541'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=140, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('last_modified', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 3.1.2 on 2026-10-19 05:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_instance_counters(apps, schema_editor):
+    '''
+    Create the instance counters of existing `Instance` entries, counted from the historical
+    `Instance` model
+    '''
+
+    Instance = apps.get_model('data', 'Instance')
+
+    def count(queryset, field_name):
+        return dict(queryset.order_by().values_list(field_name).annotate(
+            count=models.Count('pk')
+        ))
+
+    counts = {
+        'item': count(Instance.objects, 'abm__master_item'),
+        'abstract_model': count(Instance.objects, 'abm'),
+        'relationship': count(Instance.link.through.objects, 'instancelink__relationship'),
+    }
+
+    for model_name, key in [('ItemInstanceCounter', 'item'),
+                            ('AbstractModelInstanceCounter', 'abstract_model'),
+                            ('RelationshipInstanceCounter', 'relationship')]:
+        counter_model = apps.get_model('data', model_name)
+        counter_model.objects.bulk_create([
+            counter_model(target_id=target_id, count=count)
+            for target_id, count in counts[key].items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0005_modelversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AbstractModelInstanceCounter',
+            fields=[
+                ('count', models.BigIntegerField(default=0)),
+                ('target', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='instance_counter', serialize=False, to='data.abstractmodel')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemInstanceCounter',
+            fields=[
+                ('count', models.BigIntegerField(default=0)),
+                ('target', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='instance_counter', serialize=False, to='data.item')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='RelationshipInstanceCounter',
+            fields=[
+                ('count', models.BigIntegerField(default=0)),
+                ('target', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='instance_counter', serialize=False, to='data.relationship')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(fill_instance_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.1.2 on 2026-10-19 06:00
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+# Frozen copy of the `AbstractModel` fingerprint at the time of this migration, so it doesn't
+# change if the fingerprint format in `data.models` does
+
+def get_entry_fingerprint(entry):
+    '''
+    Return a sha256 hex digest of the canonical json form of the structure of the input
+    historical `AbstractModel` entry, which doesn't depend on the order or repetition of its
+    related entries
+    '''
+
+    canonical = json.dumps([
+        entry.master_item.name,
+        sorted(set(entry.attribute.values_list('name', 'dtype__name'))),
+        sorted(set(entry.measure.values_list(
+            'name', 'measure_type', 'unit_of_measurement', 'statistic_type',
+            'measurement_reference_time', 'measurement_precision', 'value_dtype__name'
+        ))),
+        sorted(set(entry.link.values_list(
+            'relationship__relationship_str', 'instances_value_dtype', 'time_link',
+            'link_criteria', 'values'
+        ))),
+    ], separators=(',', ':'))
+
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def fill_fingerprints(apps, schema_editor):
+    '''
+    Set the fingerprint of existing `AbstractModel` entries. Only the oldest of any structural
+    duplicates gets the fingerprint, the rest keep `null` as it is unique
+    '''
+
+    AbstractModel = apps.get_model('data', 'AbstractModel')
+    seen = set()
+
+    for entry in AbstractModel.objects.select_related('master_item').order_by('id'):
+        fingerprint = get_entry_fingerprint(entry)
+
+        if fingerprint not in seen:
+            seen.add(fingerprint)
+            AbstractModel.objects.filter(id=entry.id).update(fingerprint=fingerprint)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0006_instance_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='abstractmodel',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.1.2 on 2026-10-19 06:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0007_abstractmodel_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='abstractmodel',
+            name='schema_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='instance',
+            name='schema_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='AbstractModelSchemaChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('operations', models.JSONField()),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('abm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schema_changes', to='data.abstractmodel')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='abstractmodelschemachange',
+            constraint=models.UniqueConstraint(fields=('abm', 'version'), name='unique_abm_schema_version'),
+        ),
+    ]
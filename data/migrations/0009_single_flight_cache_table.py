@@ -0,0 +1,25 @@
+# Generated by Django 3.1.2 on 2026-10-19 07:02
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_tables(apps, schema_editor): # pylint: disable=unused-argument
+    '''
+    Create the tables of the database caches, including the `single_flight` cache coalesced
+    reads lock in, so a database built with `migrate` alone can serve them. Tables that already
+    exist are left as they are
+    '''
+
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0008_abm_schema_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_tables, migrations.RunPython.noop),
+    ]
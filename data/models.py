@@ -3,9 +3,32 @@ Defines all database tables for the `data` django app
 '''
 
 
+import functools
+import hashlib
+import json
+import math
 import re
+import threading
+import time
 
-from django.db import models
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+
+# Matches a fully formed relationship string e.g. (Book)<-[WROTE]-(Person)
+RELATIONSHIP_STR_REGEX = re.compile(
+    r'^\((?P<left>\w+)\)(?P<in_arrow><?)-\[(?P<label>\w+)\]-(?P<out_arrow>>?)\((?P<right>\w+)\)$'
+)
+
+# Looser match used as a fallback, only picks out the two `Item` names e.g. (Book)...(Person)
+RELATIONSHIP_ITEMS_REGEX = re.compile(r'^\((\w+)\).+\((\w+)\)$')
+
+ParsedRelationship = namedtuple(
+    'ParsedRelationship', ['left_item', 'right_item', 'label', 'direction']
+)
 
 
 class DataType(models.Model):
@@ -58,37 +81,189 @@ class Item(models.Model):
         return self.name
 
 
+class RelationshipDirection(models.TextChoices):
+    '''
+    Direction of the arrow in a `Relationship` `relationship_str`
+    '''
+
+    LEFT = 'LEFT', 'Right to left e.g. (Book)<-[WROTE]-(Person)'
+    RIGHT = 'RIGHT', 'Left to right e.g. (Person)-[BORN]->(Country)'
+    BOTH = 'BOTH', 'Both ways e.g. (Person)<-[KNOWS]->(Person)'
+    NONE = 'NONE', 'No direction e.g. (Person)-[KNOWS]-(Person)'
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_relationship_str(relationship_str):
+    '''
+    Parse an input `relationship_str` e.g. (Book)<-[WROTE]-(Person) into a `ParsedRelationship`
+    containing the left and right `Item` names, the label and the direction
+
+    If the string isn't fully formed but still contains two `Item` names, `label` and `direction`
+    are returned as empty strings. Returns `None` if no `Item` names can be found
+
+    Results are cached as the same handful of strings are parsed over and over during ingest
+    '''
+
+    m = RELATIONSHIP_STR_REGEX.match(relationship_str) # pylint: disable=invalid-name
+
+    if m:
+        direction = {
+            ('<', '>'): RelationshipDirection.BOTH,
+            ('<', ''): RelationshipDirection.LEFT,
+            ('', '>'): RelationshipDirection.RIGHT,
+        }.get((m.group('in_arrow'), m.group('out_arrow')), RelationshipDirection.NONE)
+
+        return ParsedRelationship(
+            m.group('left').capitalize(), m.group('right').capitalize(),
+            m.group('label').upper(), direction.value
+        )
+
+    # Fall back to just finding the `Item` names
+    m = RELATIONSHIP_ITEMS_REGEX.match(relationship_str) # pylint: disable=invalid-name
+
+    if m:
+        return ParsedRelationship(m.group(1).capitalize(), m.group(2).capitalize(), '', '')
+
+    return None
+
+
+class RelationshipQuerySet(models.QuerySet):
+    '''
+    Custom queryset for `Relationship` entries so lookups can use the indexed parsed columns
+    rather than string matching on `relationship_str`
+    '''
+
+    def matching(self, relationship_str):
+        '''
+        Return `Relationship` entries matching the parsed parts of the input `relationship_str`
+        '''
+
+        parsed = parse_relationship_str(relationship_str)
+
+        # If the string can't be fully parsed we can only match it exactly
+        if not parsed or not parsed.label:
+            return self.filter(relationship_str=relationship_str)
+
+        return self.filter(
+            left_item__name=parsed.left_item, right_item__name=parsed.right_item,
+            label=parsed.label, direction=parsed.direction
+        )
+
+    def with_label(self, label):
+        '''
+        Return `Relationship` entries with the input `label` e.g. WRITTEN_BY
+        '''
+
+        return self.filter(label=label.upper())
+
+    def register(self, relationship_strs):
+        '''
+        Return a dict of each of the input `relationship_strs` to the id of its `Relationship`
+        entry, creating the entries that don't exist in bulk
+
+        All the strings are parsed up front and every `Item` they reference is resolved or created
+        in one pass, then the new entries and their `item` rows are inserted with a single
+        `bulk_create()` each, rather than a `save()` and `item.add()` per relationship
+        '''
+
+        relationship_strs = set(relationship_strs)
+        ids = relationship_ids.get_ids(relationship_strs)
+        missing = sorted(relationship_strs - set(ids))
+
+        if not missing:
+            return ids
+
+        parsed = {
+            relationship_str: parse_relationship_str(relationship_str)
+            for relationship_str in missing
+        }
+
+        with transaction.atomic():
+            found_item_ids = item_ids.get_or_create_ids({
+                name for p in parsed.values() if p for name in [p.left_item, p.right_item]
+            })
+
+            # `bulk_create()` doesn't call `save()` or send signals, so fill in the parsed columns
+            # here and bump the `ModelVersion` counter
+            self.bulk_create([
+                self.model(
+                    relationship_str=relationship_str, left_item_id=found_item_ids[p.left_item],
+                    right_item_id=found_item_ids[p.right_item], label=p.label,
+                    direction=p.direction
+                ) if p else self.model(relationship_str=relationship_str)
+                for relationship_str, p in parsed.items()
+            ])
+            ModelVersion.objects.bump(self.model)
+
+            # Read back the created entries, as not all databases return ids from `bulk_create()`
+            created = relationship_ids.get_ids(missing)
+
+            self.model.item.through.objects.bulk_create([
+                self.model.item.through(relationship_id=created[relationship_str], item_id=item_id)
+                for relationship_str, p in parsed.items() if p
+                for item_id in {found_item_ids[p.left_item], found_item_ids[p.right_item]}
+            ])
+
+        ids.update(created)
+
+        return ids
+
+
 class Relationship(models.Model):
     '''
     Defines db table for a `Relationship` e.g. (Book)<-[WROTE]-(Person)
+
+    The `relationship_str` is parsed once on save into the `left_item`, `right_item`, `label` and
+    `direction` columns so relationship lookups can use indexes instead of string matching
     '''
 
     item = models.ManyToManyField(Item) # Assume this would normally be maximum of two?
-    relationship_str = models.CharField(max_length=140) # e.g. (Book)<-[WROTE]-(Person)
+    # e.g. (Book)<-[WROTE]-(Person)
+    relationship_str = models.CharField(max_length=140, db_index=True)
+    left_item = models.ForeignKey(
+        Item, null=True, blank=True, on_delete=models.CASCADE, related_name='left_relationships'
+    )
+    right_item = models.ForeignKey(
+        Item, null=True, blank=True, on_delete=models.CASCADE, related_name='right_relationships'
+    )
+    label = models.CharField(max_length=140, blank=True) # e.g. WROTE
+    direction = models.CharField(max_length=5, blank=True, choices=RelationshipDirection.choices)
+
+    objects = RelationshipQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['label', 'direction']),
+            models.Index(fields=['left_item', 'label']),
+            models.Index(fields=['right_item', 'label']),
+        ]
 
     def save(self, *args, **kwargs): # pylint: disable=signature-differs
         '''
-        Override save method to do validation on the `relationship_str`
+        Override save method to parse the `relationship_str`
 
          * create relationships to `Item` entries based on input `relationship_str`. If `Item`
            entries do not exist, create them
-         * Perform some sort of validation on the string itself using a regex.
-           What is the expected makeup of this string?
+         * store the parsed `Item` entries, label and direction in their own columns so the
+           string only has to be parsed once
         '''
 
-        # Call default save to create the entry
-        super().save(*args, **kwargs)
+        # Find any `Items`, the label and direction in the input `relationship_str`
+        parsed = parse_relationship_str(self.relationship_str)
 
-        # Find any `Items` in the input `relationship_str`
-        m = re.match(r'^\((\w+)\).+\((\w+)\)$', self.relationship_str) # pylint: disable=invalid-name
+        # If we find some, get or create `Item` entries before the single save
+        if parsed:
+            self.left_item_id = item_ids.get_or_create_id(parsed.left_item)
+            self.right_item_id = item_ids.get_or_create_id(parsed.right_item)
+            self.label = parsed.label
+            self.direction = parsed.direction
 
-        # If we find some, get or create `Item` entries
-        if m:
-            item_1, _ = Item.objects.get_or_create(name=m.group(1))
-            item_2, _ = Item.objects.get_or_create(name=m.group(2))
+        # Call default save to create the entry
+        super().save(*args, **kwargs)
 
+        if parsed:
             # Add these `Item` entries to the `ManyToMany` field
-            self.item.add(item_1, item_2)
+            self.item.add(self.left_item_id, self.right_item_id)
 
     def __str__(self):
         '''
@@ -165,6 +340,100 @@ class AbstractModel(models.Model):
     attribute = models.ManyToManyField(Attribute)
     measure = models.ManyToManyField(Measure)
     link = models.ManyToManyField(AMLink)
+    # Structural fingerprint, see `get_abm_fingerprint`. Set when created through
+    # `AbstractModelSerializer`, `null` for older duplicates
+    fingerprint = models.CharField(
+        max_length=64, unique=True, null=True, blank=True, editable=False
+    )
+    # Bumped by each `AbstractModelSchemaChange`
+    schema_version = models.PositiveIntegerField(default=1, editable=False)
+
+
+def get_abm_fingerprint(master_item, attributes, measures, links):
+    '''
+    Return a sha256 hex digest of the canonical json form of an `AbstractModel` structure, which
+    doesn't depend on the order or repetition of its related entries
+     * `master_item` is the `Item` name
+     * `attributes` is an iterable of (name, `DataType` name) tuples
+     * `measures` is an iterable of (name, measure_type, unit_of_measurement, statistic_type,
+       measurement_reference_time, measurement_precision, `DataType` name) tuples
+     * `links` is an iterable of (relationship_str, instances_value_dtype, time_link,
+       link_criteria, values) tuples
+    '''
+
+    canonical = json.dumps([
+        master_item,
+        sorted(set(tuple(a) for a in attributes)),
+        sorted(set(tuple(m) for m in measures)),
+        sorted(set(tuple(l) for l in links)),
+    ], separators=(',', ':'))
+
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def get_entry_fingerprint(entry):
+    '''
+    Return the structural fingerprint of the input saved `AbstractModel` entry, read from its
+    related entries
+    '''
+
+    return get_abm_fingerprint(
+        entry.master_item.name,
+        entry.attribute.values_list('name', 'dtype__name'),
+        entry.measure.values_list(
+            'name', 'measure_type', 'unit_of_measurement', 'statistic_type',
+            'measurement_reference_time', 'measurement_precision', 'value_dtype__name'
+        ),
+        entry.link.values_list(
+            'relationship__relationship_str', 'instances_value_dtype', 'time_link',
+            'link_criteria', 'values'
+        ),
+    )
+
+
+class AbstractModelSchemaChange(models.Model):
+    '''
+    Defines db table for a change to the attributes or measures of an `AbstractModel`, which
+    upgrades it to schema `version`
+
+    `operations` is a list of dicts applied in order to the json of `Instance` entries written
+    under an earlier version, each with:
+     * "op": "add" to set the column to "default" if it is missing, or "remove" to drop it
+     * "field": the `Instance` json field, "attribute" or "measure"
+     * "name": the column name
+     * "default": optional, only for "add". Without one, instances just don't have the column
+
+    Operations are idempotent so json already in the new shape is left as it is
+    '''
+
+    abm = models.ForeignKey(
+        AbstractModel, on_delete=models.CASCADE, related_name='schema_changes'
+    )
+    version = models.PositiveIntegerField()
+    operations = models.JSONField()
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['abm', 'version'], name='unique_abm_schema_version'),
+        ]
+
+
+def upgrade_json_values(values, operations):
+    '''
+    Apply the input list of `AbstractModelSchemaChange` `operations` for one json field to the
+    input dict of `values` in place, and return it
+    '''
+
+    for operation in operations:
+        if operation['op'] == 'add':
+            if 'default' in operation:
+                values.setdefault(operation['name'], operation['default'])
+
+        else:
+            values.pop(operation['name'], None)
+
+    return values
 
 
 # See `AMLink` above
@@ -206,6 +475,153 @@ class Instance(models.Model):
     measure = models.CharField(max_length=140)
     link = models.ManyToManyField(InstanceLink) # e.g. (Book)<-[WROTE]-(Person)
     iil = models.ManyToManyField(IncomingInteractionLink)
+    # `AbstractModel` schema version the json was written under. Older instances are upgraded on
+    # read, see `data.codec.upgrade_instances`, and in the background by the
+    # `migrate_instance_schemas` command
+    schema_version = models.PositiveIntegerField(default=1)
+
+    def save(self, *args, **kwargs): # pylint: disable=signature-differs
+        '''
+        Override default save method to keep the `InstanceValue` index of the `attribute` and
+        `measure` values and the instance counters up to date, in the same transaction
+        '''
+
+        with transaction.atomic():
+            # Look up the stored `abm` of an existing entry, in case it is being changed
+            previous_abm_id = None if self._state.adding else Instance.objects.filter(
+                pk=self.pk
+            ).values_list('abm_id', flat=True).first()
+
+            # Call default inherited save
+            super().save(*args, **kwargs)
+
+            InstanceValue.objects.index_instances([self])
+
+            if previous_abm_id != self.abm_id:
+                abm_deltas = {self.abm_id: 1}
+
+                if previous_abm_id is not None:
+                    abm_deltas[previous_abm_id] = -1
+
+                count_instances(abm_deltas)
+
+
+class InstanceValueManager(models.Manager):
+    '''
+    Custom manager for `InstanceValue` entries
+    '''
+
+    def index_instances(self, instances):
+        '''
+        Replace the `InstanceValue` entries of the input saved `Instance` entries with entries
+        for every key value pair in their `attribute` and `measure` json
+
+        Used directly by bulk writes that don't call `Instance.save()`
+        '''
+
+        instances = list(instances)
+
+        self.filter(instance__in=instances).delete()
+
+        self.bulk_create([
+            InstanceValue(instance=instance, field=field_name, key=key, value=value,
+                          number=InstanceValue.to_number(value))
+            for instance in instances
+            for field_name in InstanceValue.FIELD_NAMES
+            for key, value in InstanceValue.parse_values(getattr(instance, field_name))
+        ])
+
+    def apply_schema_change(self, abm_id, operations):
+        '''
+        Update the `InstanceValue` entries of the `Instance` entries of the input `AbstractModel`
+        id for the input `AbstractModelSchemaChange` operations, so value filters match the
+        upgraded json reads return before the entries themselves are migrated. Only the entries
+        of the added or removed columns are written, with set-based queries:
+         * removed columns have their entries deleted
+         * columns added with a default get an entry for each `Instance` without one
+        '''
+
+        instances = Instance.objects.filter(abm_id=abm_id)
+
+        for operation in operations:
+            values = self.filter(field=operation['field'], key=operation['name'])
+
+            if operation['op'] == 'remove':
+                values.filter(instance__abm_id=abm_id).delete()
+
+            elif 'default' in operation:
+                value = str(operation['default'])
+                instance_ids = list(instances.exclude(
+                    id__in=values.values('instance_id')
+                ).values_list('id', flat=True))
+
+                for start in range(0, len(instance_ids), settings.BULK_BATCH_SIZE):
+                    self.bulk_create([
+                        InstanceValue(instance_id=instance_id, field=operation['field'],
+                                      key=operation['name'], value=value,
+                                      number=InstanceValue.to_number(value))
+                        for instance_id in instance_ids[start:start + settings.BULK_BATCH_SIZE]
+                    ])
+
+
+class InstanceValue(models.Model):
+    '''
+    Defines db table for a single `Instance` `attribute` or `measure` key value pair
+
+    The json in `Instance` can't be indexed, so values are copied here so `Instance` entries can
+    be filtered by value using indexes. Numeric values are also stored in `number` so range
+    filters compare numbers rather than strings
+    '''
+
+    FIELD_NAMES = ['attribute', 'measure']
+
+    instance = models.ForeignKey(Instance, on_delete=models.CASCADE, related_name='values')
+    field = models.CharField(
+        max_length=9, choices=[(field_name, field_name) for field_name in FIELD_NAMES]
+    )
+    key = models.CharField(max_length=140)
+    value = models.CharField(max_length=140)
+    number = models.FloatField(null=True, blank=True)
+
+    objects = InstanceValueManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['field', 'key', 'value']),
+            models.Index(fields=['field', 'key', 'number']),
+        ]
+
+    @staticmethod
+    def parse_values(json_str):
+        '''
+        Return the key value pairs of the input json object string as strings. Returns nothing
+        if the string isn't a json object
+        '''
+
+        try:
+            data = json.loads(json_str)
+
+        except (TypeError, ValueError):
+            return []
+
+        if not isinstance(data, dict):
+            return []
+
+        return [(key, str(value)) for key, value in data.items()]
+
+    @staticmethod
+    def to_number(value):
+        '''
+        Return the input string `value` as a float if it is a finite number, otherwise `None`
+        '''
+
+        try:
+            number = float(value)
+
+        except ValueError:
+            return None
+
+        return number if math.isfinite(number) else None
 
 
 class RankingCluster(models.Model):
@@ -218,3 +634,421 @@ class RankingCluster(models.Model):
     number_of_instances = models.PositiveIntegerField(null=True, blank=True)
     instances_ranking = models.JSONField(null=True, blank=True)
     links_ranking = models.JSONField(null=True, blank=True)
+
+
+class InstanceCounterManager(models.Manager):
+    '''
+    Custom manager for instance counter entries
+    '''
+
+    def add(self, deltas):
+        '''
+        Add each count in the input dict of target id to count change, creating the counter if
+        it doesn't exist yet
+        '''
+
+        for target_id, delta in deltas.items():
+            if not delta or target_id is None:
+                continue
+
+            updated = self.filter(target_id=target_id).update(count=models.F('count') + delta)
+
+            if not updated:
+                _, created = self.get_or_create(target_id=target_id, defaults={'count': delta})
+
+                # Another process created the counter first, so add to it instead
+                if not created:
+                    self.add({target_id: delta})
+
+    def get_counts(self, target_ids):
+        '''
+        Return a dict of target id to count for the input target ids, in a single query. Targets
+        without a counter have no entries yet so their count is 0
+        '''
+
+        counts = dict(self.filter(target_id__in=target_ids).values_list('target_id', 'count'))
+
+        return {target_id: counts.get(target_id, 0) for target_id in target_ids}
+
+
+class InstanceCounter(models.Model):
+    '''
+    Abstract db table for a count of `Instance` entries related to a `target` entry
+
+    Counters are updated in the same transaction as the writes they count, so reading a count is
+    a single row lookup rather than a COUNT over the `Instance` table
+    '''
+
+    count = models.BigIntegerField(default=0)
+
+    objects = InstanceCounterManager()
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        '''
+        Defines the return string for an instance counter db table entry
+        '''
+
+        return '{}: {}'.format(self.target, self.count)
+
+
+class ItemInstanceCounter(InstanceCounter):
+    '''
+    Defines db table for the number of `Instance` entries with an `abm` whose `master_item` is
+    the `target` `Item`
+    '''
+
+    target = models.OneToOneField(
+        Item, primary_key=True, on_delete=models.CASCADE, related_name='instance_counter'
+    )
+
+
+class AbstractModelInstanceCounter(InstanceCounter):
+    '''
+    Defines db table for the number of `Instance` entries of the `target` `AbstractModel`
+    '''
+
+    target = models.OneToOneField(
+        AbstractModel, primary_key=True, on_delete=models.CASCADE, related_name='instance_counter'
+    )
+
+
+class RelationshipInstanceCounter(InstanceCounter):
+    '''
+    Defines db table for the number of links from `Instance` entries to `InstanceLink` entries
+    of the `target` `Relationship`
+    '''
+
+    target = models.OneToOneField(
+        Relationship, primary_key=True, on_delete=models.CASCADE, related_name='instance_counter'
+    )
+
+
+def count_instances(abm_deltas):
+    '''
+    Apply the input dict of `AbstractModel` id to change in `Instance` entries to the
+    `AbstractModel` counters and the counters of their `master_item`s
+    '''
+
+    AbstractModelInstanceCounter.objects.add(abm_deltas)
+
+    item_deltas = {}
+
+    for abm_id, item_id in AbstractModel.objects.filter(
+            pk__in=list(abm_deltas)
+    ).values_list('id', 'master_item_id'):
+        item_deltas[item_id] = item_deltas.get(item_id, 0) + abm_deltas[abm_id]
+
+    ItemInstanceCounter.objects.add(item_deltas)
+
+
+def count_instance_links(links_qs, sign=1):
+    '''
+    Add (or with `sign=-1` subtract) the links in the input queryset of `Instance.link` through
+    entries to the counters of their `Relationship`s
+    '''
+
+    RelationshipInstanceCounter.objects.add({
+        relationship_id: sign * count
+        for relationship_id, count in links_qs.order_by().values_list(
+            'instancelink__relationship'
+        ).annotate(count=models.Count('pk'))
+    })
+
+
+def get_instance_counts(instance_model):
+    '''
+    Return dicts of `Instance` entries per `Item` and per `AbstractModel`, and of `Instance`
+    links per `Relationship`, counted from scratch from the input `Instance` model class
+
+    Used to fill the counter tables from scratch
+    '''
+
+    def counts(queryset, field_name):
+        return dict(queryset.order_by().values_list(field_name).annotate(
+            count=models.Count('pk')
+        ))
+
+    return {
+        'item': counts(instance_model.objects, 'abm__master_item'),
+        'abstract_model': counts(instance_model.objects, 'abm'),
+        'relationship': counts(instance_model.link.through.objects, 'instancelink__relationship'),
+    }
+
+
+def rebuild_instance_counters():
+    '''
+    Replace all instance counters with counts made from scratch, e.g. after loading fixtures
+    which bypass `Instance.save()`
+    '''
+
+    counts = get_instance_counts(Instance)
+
+    with transaction.atomic():
+        for counter_model, key in [(ItemInstanceCounter, 'item'),
+                                   (AbstractModelInstanceCounter, 'abstract_model'),
+                                   (RelationshipInstanceCounter, 'relationship')]:
+            counter_model.objects.all().delete()
+            counter_model.objects.bulk_create([
+                counter_model(target_id=target_id, count=count)
+                for target_id, count in counts[key].items()
+            ])
+
+
+class ModelVersionManager(models.Manager):
+    '''
+    Custom manager for `ModelVersion` entries
+    '''
+
+    def bump(self, *model_classes):
+        '''
+        Increment the version counter of each of the input model classes, creating the counter
+        if it doesn't exist yet
+        '''
+
+        for model_class in model_classes:
+            model_name = model_class._meta.label_lower # pylint: disable=protected-access
+
+            updated = self.filter(model_name=model_name).update(
+                version=models.F('version') + 1, last_modified=timezone.now()
+            )
+
+            if not updated:
+                _, created = self.get_or_create(model_name=model_name, defaults={'version': 1})
+
+                # Another process created the counter first, so bump it instead
+                if not created:
+                    self.bump(model_class)
+
+    def get_stamp(self, *model_classes):
+        '''
+        Return a tuple of the versions of the input model classes and the latest time any of
+        them were modified, in a single query
+        '''
+
+        model_names = [
+            model_class._meta.label_lower for model_class in model_classes # pylint: disable=protected-access
+        ]
+        entries = {e.model_name: e for e in self.filter(model_name__in=model_names)}
+
+        versions = tuple(
+            entries[name].version if name in entries else 0 for name in model_names
+        )
+        last_modified = max((e.last_modified for e in entries.values()), default=None)
+
+        return versions, last_modified
+
+
+class ModelVersion(models.Model):
+    '''
+    Defines db table for a version counter per model db table
+
+    The counter is bumped on every write to the model, so a cheap lookup here tells readers if
+    the table has changed e.g. to answer conditional GET requests
+    '''
+
+    model_name = models.CharField(max_length=140, unique=True) # e.g. data.instance
+    version = models.PositiveBigIntegerField(default=0)
+    last_modified = models.DateTimeField(default=timezone.now)
+
+    objects = ModelVersionManager()
+
+    def __str__(self):
+        '''
+        Defines the return string for a `ModelVersion` db table entry
+        '''
+
+        return self.model_name + ' v' + str(self.version)
+
+
+class VersionStampedCache:
+    '''
+    Base class for a process-local cache of data read from the input `watched_models`
+
+     * only data read in committed transactions should be cached, see `store_on_commit()`
+     * the `ModelVersion` stamp of the watched models is checked at most every
+       `settings.LOCAL_CACHE_CHECK_INTERVAL` seconds and the cache cleared if another process
+       changed them
+     * writes in this process clear the cache straight away, see `data.signals`
+    '''
+
+    def __init__(self, *watched_models):
+        self.watched_models = watched_models
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._checked_at = None
+
+    def clear(self):
+        '''
+        Remove everything cached, implemented by subclasses
+        '''
+
+        raise NotImplementedError
+
+    def store_on_commit(self, store):
+        '''
+        Call the input `store` function under the cache lock once the current transaction
+        commits, or straight away outside of a transaction, so data from rolled back writes is
+        never cached
+        '''
+
+        def locked_store():
+            with self._lock:
+                store()
+
+        transaction.on_commit(locked_store)
+
+    def check_stamp(self, force=False):
+        '''
+        Clear the cache if the `ModelVersion` stamp of the watched models changed since it was
+        last checked. Unless `force` is `True`, the stamp is only read if it wasn't checked in
+        the last `settings.LOCAL_CACHE_CHECK_INTERVAL` seconds
+        '''
+
+        now = time.monotonic()
+
+        if not force and self._checked_at is not None and \
+                now - self._checked_at < settings.LOCAL_CACHE_CHECK_INTERVAL:
+            return
+
+        versions, _ = ModelVersion.objects.get_stamp(*self.watched_models)
+        self._checked_at = now
+
+        if versions != self._stamp:
+            self.clear()
+            self._stamp = versions
+
+    def check_versions(self, model_versions):
+        '''
+        Clear the cache if the versions of the watched models in the input dict of model class to
+        `ModelVersion` version differ from the ones it was last checked against
+
+        Lets a request that already read the versions, e.g. to build an `ETag`, make sure the
+        cache is no older than them without another query
+        '''
+
+        versions = tuple(model_versions[model] for model in self.watched_models)
+        self._checked_at = time.monotonic()
+
+        if versions != self._stamp:
+            self.clear()
+            self._stamp = versions
+
+
+class NameCache(VersionStampedCache):
+    '''
+    Process-local, size bounded cache of name to id for a small, rarely changing model such as
+    `Item`, so hot paths can resolve names without a query each time
+    '''
+
+    def __init__(self, model, name_field):
+        super().__init__(model)
+        self.model = model
+        self.name_field = name_field
+        self._ids = OrderedDict()
+
+    def clear(self):
+        '''
+        Remove every cached name
+        '''
+
+        with self._lock:
+            self._ids.clear()
+
+    def get_ids(self, names):
+        '''
+        Return a dict of name to id for each of the input `names` that exists. Names that aren't
+        cached are looked up in a single query
+        '''
+
+        self.check_stamp()
+
+        names = set(names)
+        ids = {}
+
+        with self._lock:
+            for name in names:
+                if name in self._ids:
+                    self._ids.move_to_end(name)
+                    ids[name] = self._ids[name]
+
+        missing = names - set(ids)
+
+        if missing:
+            found = dict(self.model.objects.filter(
+                **{self.name_field + '__in': missing}
+            ).values_list(self.name_field, 'id'))
+
+            self._remember(found)
+            ids.update(found)
+
+        return ids
+
+    def get_id(self, name):
+        '''
+        Return the id of the entry with the input `name`, or `None` if it doesn't exist
+        '''
+
+        return self.get_ids([name]).get(name, None)
+
+    def get_or_create_id(self, name):
+        '''
+        Return the id of the entry with the input `name`, creating the entry if it doesn't exist
+        '''
+
+        entry_id = self.get_id(name)
+
+        if entry_id is None:
+            entry, _ = self.model.objects.get_or_create(**{self.name_field: name})
+            entry_id = entry.id
+
+            self._remember({name: entry_id})
+
+        return entry_id
+
+    def get_or_create_ids(self, names):
+        '''
+        Return a dict of name to id for each of the input `names`, creating the entries that
+        don't exist with a single `bulk_create()`
+
+        `bulk_create()` doesn't call `save()` or send signals, so names must already be
+        normalized and the model's `ModelVersion` counter is bumped here
+        '''
+
+        names = set(names)
+        ids = self.get_ids(names)
+        missing = names - set(ids)
+
+        if missing:
+            # Entries created by another process in the meantime are left as they are
+            self.model.objects.bulk_create([
+                self.model(**{self.name_field: name}) for name in sorted(missing)
+            ], ignore_conflicts=True)
+            ModelVersion.objects.bump(self.model)
+
+            # Read back the created entries, as not all databases return ids from `bulk_create()`
+            ids.update(self.get_ids(missing))
+
+        return ids
+
+    def _remember(self, ids):
+        '''
+        Cache the input dict of name to id once the current transaction commits
+        '''
+
+        def store():
+            self._ids.update(ids)
+
+            while len(self._ids) > settings.NAME_CACHE_SIZE:
+                self._ids.popitem(last=False)
+
+        if ids:
+            self.store_on_commit(store)
+
+
+# Name to id caches of the models looked up by name on hot paths
+data_type_ids = NameCache(DataType, 'name')
+item_ids = NameCache(Item, 'name')
+relationship_ids = NameCache(Relationship, 'relationship_str')
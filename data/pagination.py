@@ -0,0 +1,21 @@
+'''
+Defines pagination classes for the `data` Django app
+'''
+
+
+from django.conf import settings
+
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    '''
+    Cursor pagination over the indexed primary key
+
+    Each page is found with an indexed `id > cursor` lookup rather than an OFFSET, so deep pages
+    cost the same as the first page and rows added while paging aren't skipped or repeated
+    '''
+
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = settings.MAX_PAGE_SIZE
@@ -0,0 +1,160 @@
+'''
+Defines drf parsers for the `data` Django app
+'''
+
+
+import codecs
+import json
+
+from django.conf import settings
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    '''
+    Parses newline delimited json (one json object per line) into a list of objects
+
+    Blank lines are skipped
+    '''
+
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        '''
+        Parse each line of the incoming bytestream as json and return a list of the results
+        '''
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        data = []
+
+        for line_number, line in enumerate(stream, start=1):
+            line = line.decode(encoding).strip()
+
+            if not line:
+                continue
+
+            try:
+                data += [json.loads(line)]
+
+            except ValueError as err:
+                raise ParseError('NDJSON parse error on line ' + str(line_number) + ': ' + str(err))
+
+        return data
+
+
+def iter_json_values(stream, encoding=None, chunk_size=64 * 1024): # pylint: disable=too-many-statements
+    '''
+    Generator yields each json value in the input byte or text `stream`, which holds either a
+    json array of values or a sequence of values separated by whitespace e.g. JSONL
+
+    The stream is read `chunk_size` at a time and each value decoded with `raw_decode()` as soon
+    as it is complete, so the whole stream is never held in memory as one string. A stream
+    starting with "[" is read as a json array. Raises `ParseError` on invalid json
+    '''
+
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder(encoding or settings.DEFAULT_CHARSET)()
+    buffer = ''
+    index = 0
+    eof = False
+
+    def fill():
+        '''
+        Drop the consumed part of the buffer and read the next chunk onto the end. Returns
+        `False` at the end of the stream
+        '''
+
+        nonlocal buffer, index, eof
+
+        chunk = stream.read(chunk_size)
+
+        if not chunk:
+            eof = True
+
+        if isinstance(chunk, bytes):
+            chunk = text_decoder.decode(chunk, final=eof)
+
+        buffer = buffer[index:] + chunk
+        index = 0
+
+        return not eof
+
+    def skip_whitespace():
+        '''
+        Move past any whitespace. Returns `False` if the end of the stream was reached
+        '''
+
+        nonlocal index
+
+        while True:
+            while index < len(buffer) and buffer[index].isspace():
+                index += 1
+
+            if index < len(buffer):
+                return True
+
+            if eof or not fill():
+                return index < len(buffer)
+
+    def decode_value():
+        '''
+        Decode and return the json value at the current position, reading more of the stream
+        until it is complete
+        '''
+
+        nonlocal index
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, index)
+
+                # A value running to the end of the buffer may continue in the next chunk
+                if end < len(buffer) or eof:
+                    index = end
+                    return value
+
+            except ValueError as err:
+                if eof:
+                    raise ParseError('JSON parse error: ' + str(err))
+
+            fill()
+
+    if not skip_whitespace():
+        return
+
+    if buffer[index] != '[':
+        while skip_whitespace():
+            yield decode_value()
+
+        return
+
+    index += 1
+
+    if skip_whitespace() and buffer[index] == ']':
+        index += 1
+
+    else:
+        while True:
+            if not skip_whitespace():
+                raise ParseError('JSON parse error: unterminated array.')
+
+            yield decode_value()
+
+            if not skip_whitespace():
+                raise ParseError('JSON parse error: unterminated array.')
+
+            char = buffer[index]
+            index += 1
+
+            if char == ']':
+                break
+
+            if char != ',':
+                raise ParseError('JSON parse error: expected "," or "]" in array.')
+
+    if skip_whitespace():
+        raise ParseError('JSON parse error: unexpected data after array.')
@@ -0,0 +1,121 @@
+'''
+Defines drf renderers and streaming export helpers for the `data` Django app
+
+Exports are line oriented so downstream tools can process them a row at a time:
+ * NDJSON writes each serialized `Instance` as a json object on its own line
+ * CSV writes `id` and `abm` columns followed by a column for each `attribute` json key, so an
+   export of a single `AbstractModel` can be uploaded again with `UploadCsvFileForm`
+'''
+
+
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+from data import models
+
+
+CSV_META_COLUMNS = ['id', 'abm']
+
+
+def attribute_keys(attribute_strs):
+    '''
+    Return the unique `attribute` json keys found in the input iterable of json strings, in the
+    order they are first seen
+    '''
+
+    keys = {}
+
+    for attribute_str in attribute_strs:
+        for key, _ in models.InstanceValue.parse_values(attribute_str):
+            keys[key] = None
+
+    return list(keys)
+
+
+def instance_csv_row(row, keys):
+    '''
+    Return the csv row for the input serialized `Instance` dict and `attribute` column keys
+    '''
+
+    values = dict(models.InstanceValue.parse_values(row.get('attribute', '')))
+
+    return [row.get(c, '') for c in CSV_META_COLUMNS] + [values.get(k, '') for k in keys]
+
+
+def stream_ndjson(rows):
+    '''
+    Generator yields each dict in the input iterable `rows` as a line of json
+    '''
+
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+def stream_csv(rows, keys):
+    '''
+    Generator yields a csv header line and then a csv line for each serialized `Instance` dict
+    in the input iterable `rows`
+    '''
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(CSV_META_COLUMNS + keys)
+
+    yield buffer.getvalue()
+
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(instance_csv_row(row, keys))
+
+        yield buffer.getvalue()
+
+
+class NDJSONRenderer(BaseRenderer):
+    '''
+    Renders a list of objects as newline delimited json, one object per line. A single object
+    is rendered as one line
+    '''
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        '''
+        Render the input `data` as NDJSON
+        '''
+
+        rows = data if isinstance(data, list) else [data]
+
+        return ''.join(stream_ndjson(rows)).encode(self.charset)
+
+
+class InstanceCSVRenderer(BaseRenderer):
+    '''
+    Renders serialized `Instance` data as csv, with a column for each `attribute` json key
+    '''
+
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        '''
+        Render the input `data` as csv. Error responses are rendered as json as they aren't
+        `Instance` data
+        '''
+
+        response = (renderer_context or {}).get('response', None)
+
+        if response is not None and response.exception:
+            return ''.join(stream_ndjson([data])).encode(self.charset)
+
+        rows = data if isinstance(data, list) else [data]
+        keys = attribute_keys(row.get('attribute', '') for row in rows)
+
+        return ''.join(stream_csv(rows, keys)).encode(self.charset)
@@ -0,0 +1,237 @@
+'''
+Immutable in-memory snapshot of the `AbstractModel` schema for the `data` Django app
+
+A snapshot holds every `DataType`, `Item`, `Attribute`, `Measure`, `Relationship`, `AMLink` and
+`AbstractModel` entry as immutable objects, indexed by id and by name. It is built once per
+process and replaced as a whole when the `ModelVersion` stamp of the schema tables changes, so
+forms, serializers and views read the schema with in-memory lookups instead of queries
+'''
+
+
+import types
+
+from collections import namedtuple
+
+from data import models
+
+
+class DataTypeSchema(namedtuple('DataTypeSchema', ['id', 'name'])):
+    '''
+    Immutable snapshot of a `DataType` entry
+    '''
+
+    __slots__ = ()
+
+
+class ItemSchema(namedtuple('ItemSchema', ['id', 'name'])):
+    '''
+    Immutable snapshot of an `Item` entry
+    '''
+
+    __slots__ = ()
+
+
+class AttributeSchema(namedtuple('AttributeSchema', ['id', 'name', 'dtype'])):
+    '''
+    Immutable snapshot of an `Attribute` entry, `dtype` is the `DataType` name
+    '''
+
+    __slots__ = ()
+
+
+class MeasureSchema(namedtuple('MeasureSchema', [
+        'id', 'name', 'measure_type', 'unit_of_measurement', 'value_dtype', 'statistic_type',
+        'measurement_reference_time', 'measurement_precision'
+])):
+    '''
+    Immutable snapshot of a `Measure` entry, `value_dtype` is the `DataType` name
+    '''
+
+    __slots__ = ()
+
+
+class RelationshipSchema(namedtuple('RelationshipSchema', [
+        'id', 'relationship_str', 'left_item', 'right_item', 'label', 'direction'
+])):
+    '''
+    Immutable snapshot of a `Relationship` entry, `left_item` and `right_item` are `Item` names
+    '''
+
+    __slots__ = ()
+
+
+class AMLinkSchema(namedtuple('AMLinkSchema', [
+        'id', 'relationship', 'instances_value_dtype', 'time_link', 'link_criteria', 'values'
+])):
+    '''
+    Immutable snapshot of an `AMLink` entry, `relationship` is the `Relationship` string
+    '''
+
+    __slots__ = ()
+
+
+class AbstractModelSchema(namedtuple('AbstractModelSchema', [
+        'id', 'master_item', 'fingerprint', 'schema_version', 'attributes', 'measures', 'links'
+])):
+    '''
+    Immutable snapshot of an `AbstractModel` entry
+     * `master_item` is the `Item` name
+     * `attributes`, `measures` and `links` are tuples of `AttributeSchema`, `MeasureSchema` and
+       `AMLinkSchema` in id order, the same order the fast serializers output them in
+    '''
+
+    __slots__ = ()
+
+
+class SchemaSnapshot(namedtuple('SchemaSnapshot', [
+        'data_types', 'data_type_ids', 'items', 'item_ids', 'attributes', 'measures',
+        'relationships', 'relationship_ids', 'links', 'abstract_models', 'abstract_model_ids',
+])):
+    '''
+    Immutable snapshot of the whole schema. Every index is a read-only mapping:
+     * `data_types`, `items`, `attributes`, `measures`, `relationships`, `links` and
+       `abstract_models` map entry ids to their immutable schema objects
+     * `data_type_ids`, `item_ids` and `relationship_ids` map names to ids, the lowest id for
+       `Relationship` strings shared by several entries
+     * `abstract_model_ids` maps structural fingerprints to `AbstractModel` ids
+    '''
+
+    __slots__ = ()
+
+
+def build_snapshot():
+    '''
+    Return a new `SchemaSnapshot` read from the database, in one query per schema table
+    '''
+
+    def index(entries):
+        return types.MappingProxyType({entry.id: entry for entry in entries})
+
+    def index_names(entries, name_field):
+        names = {}
+
+        for entry in sorted(entries.values()):
+            names.setdefault(getattr(entry, name_field), entry.id)
+
+        return types.MappingProxyType(names)
+
+    data_types = index(
+        DataTypeSchema(*row) for row in models.DataType.objects.values_list('id', 'name')
+    )
+    items = index(ItemSchema(*row) for row in models.Item.objects.values_list('id', 'name'))
+
+    attributes = index(
+        AttributeSchema(*row)
+        for row in models.Attribute.objects.values_list('id', 'name', 'dtype__name')
+    )
+    measures = index(MeasureSchema(*row) for row in models.Measure.objects.values_list(
+        'id', 'name', 'measure_type', 'unit_of_measurement', 'value_dtype__name',
+        'statistic_type', 'measurement_reference_time', 'measurement_precision'
+    ))
+    relationships = index(
+        RelationshipSchema(*row) for row in models.Relationship.objects.values_list(
+            'id', 'relationship_str', 'left_item__name', 'right_item__name', 'label', 'direction'
+        )
+    )
+    links = index(AMLinkSchema(*row) for row in models.AMLink.objects.values_list(
+        'id', 'relationship__relationship_str', 'instances_value_dtype', 'time_link',
+        'link_criteria', 'values'
+    ))
+
+    abm_rows = list(models.AbstractModel.objects.values_list(
+        'id', 'master_item__name', 'fingerprint', 'schema_version'
+    ))
+    related = {abm_id: {'attribute': [], 'measure': [], 'link': []} for abm_id, *_ in abm_rows}
+
+    # (`ManyToMany` field, through table column of the related model, related entries)
+    for field_name, through_field, entries in [('attribute', 'attribute', attributes),
+                                               ('measure', 'measure', measures),
+                                               ('link', 'amlink', links)]:
+        through = getattr(models.AbstractModel, field_name).through
+
+        for abm_id, related_id in through.objects.order_by(through_field + '_id').values_list(
+                'abstractmodel_id', through_field + '_id'
+        ):
+            related[abm_id][field_name] += [entries[related_id]]
+
+    abstract_models = index(
+        AbstractModelSchema(
+            abm_id, master_item, fingerprint, schema_version,
+            *[tuple(related[abm_id][field_name]) for field_name in ['attribute', 'measure', 'link']]
+        )
+        for abm_id, master_item, fingerprint, schema_version in abm_rows
+    )
+
+    return SchemaSnapshot(
+        data_types, index_names(data_types, 'name'), items, index_names(items, 'name'),
+        attributes, measures, relationships, index_names(relationships, 'relationship_str'),
+        links, abstract_models, index_names(abstract_models, 'fingerprint'),
+    )
+
+
+class SchemaSnapshotCache(models.VersionStampedCache):
+    '''
+    Process-local holder of the current `SchemaSnapshot`, rebuilt when any schema table changes
+
+    Readers get the whole snapshot and keep using it, so a rebuild swaps in a new snapshot
+    without changing one that is being read
+    '''
+
+    def __init__(self):
+        super().__init__(
+            models.DataType, models.Item, models.Attribute, models.Measure, models.Relationship,
+            models.AMLink, models.AbstractModel
+        )
+        self._snapshot = None
+
+        # Counts clears, so a snapshot built before a clear is never stored after it
+        self._generation = 0
+
+    def clear(self):
+        '''
+        Drop the current snapshot, the next `get()` builds a new one
+        '''
+
+        with self._lock:
+            self._generation += 1
+            self._snapshot = None
+
+    def get(self, refresh=False):
+        '''
+        Return the current `SchemaSnapshot`, building it if there isn't one. If `refresh` is
+        `True` the `ModelVersion` stamp is checked straight away rather than at most every
+        `settings.LOCAL_CACHE_CHECK_INTERVAL` seconds
+        '''
+
+        self.check_stamp(force=refresh)
+
+        snapshot = self._snapshot
+
+        if snapshot is None:
+            generation = self._generation
+            snapshot = build_snapshot()
+
+            def store():
+                if self._generation == generation:
+                    self._snapshot = snapshot
+
+            self.store_on_commit(store)
+
+        return snapshot
+
+    def get_containing(self, index_name, keys):
+        '''
+        Return the current `SchemaSnapshot`, checking the stamp again if any of the input `keys`
+        is missing from its `index_name` index, in case it was created since the last check
+        '''
+
+        snapshot = self.get()
+        entries = getattr(snapshot, index_name)
+
+        if any(key not in entries for key in keys):
+            snapshot = self.get(refresh=True)
+
+        return snapshot
+
+
+schema_snapshot = SchemaSnapshotCache()
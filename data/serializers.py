@@ -6,9 +6,105 @@ should be validated and saved to a new model entries
 '''
 
 
+import itertools
+import json
+
+from django.db import IntegrityError, transaction
+from django.db.models import Manager
+
 from rest_framework import serializers
 
-from data import models
+from data import codec, models, schema
+
+
+def project_json_keys(value, keys):
+    '''
+    Return the input json string `value` with only the input `keys` kept. `value` is returned
+    untouched if `keys` is `None` or `value` isn't a json object
+    '''
+
+    if keys is None:
+        return value
+
+    try:
+        data = json.loads(value)
+
+    except (TypeError, ValueError):
+        return value
+
+    if not isinstance(data, dict):
+        return value
+
+    return json.dumps({k: v for k, v in data.items() if k in keys})
+
+
+def get_or_create_all(model, rows, key_fields):
+    '''
+    Return an entry of `model` for each dict of field values in the input `rows`, matched on the
+    input `key_fields` and in the same order. Entries are looked up with a single IN query on the
+    first key field, and any missing entries are created with a single `bulk_create()`
+
+    `bulk_create()` doesn't call `save()` or send signals, so values must already be normalized
+    and the model's `ModelVersion` counter is bumped here
+    '''
+
+    def get_key(values):
+        return tuple(values[field_name] for field_name in key_fields)
+
+    def get_entries():
+        entries = model.objects.filter(**{
+            key_fields[0] + '__in': {row[key_fields[0]] for row in rows}
+        })
+
+        return {tuple(getattr(e, field_name) for field_name in key_fields): e for e in entries}
+
+    entries = get_entries() if rows else {}
+    missing = {get_key(row): row for row in rows if get_key(row) not in entries}
+
+    if missing:
+        model.objects.bulk_create([model(**row) for row in missing.values()])
+        models.ModelVersion.objects.bump(model)
+
+        # Read back the created entries, as not all databases return ids from `bulk_create()`
+        entries = get_entries()
+
+    return [entries[get_key(row)] for row in rows]
+
+
+class DynamicFieldsMixin:
+    '''
+    Mixin for a `ModelSerializer` to limit the serialized output:
+     * `fields` kwarg is a list of field names to keep, all other fields are dropped
+     * `json_keys` kwarg is a dict of json string field name to the keys to keep in its value
+    '''
+
+    def __init__(self, *args, **kwargs):
+        '''
+        Override default `__init__()` to drop any fields not in the input `fields`
+        '''
+
+        fields = kwargs.pop('fields', None)
+        self.json_keys = kwargs.pop('json_keys', None) or {}
+
+        # Default init
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+    def to_representation(self, instance):
+        '''
+        Override default `to_representation()` to only keep the requested json keys
+        '''
+
+        data = super().to_representation(instance)
+
+        for field_name, keys in self.json_keys.items():
+            if field_name in data:
+                data[field_name] = project_json_keys(data[field_name], keys)
+
+        return data
 
 
 class AttributeSerializer(serializers.ModelSerializer):
@@ -31,30 +127,90 @@ class AttributeSerializer(serializers.ModelSerializer):
         # Pop out `value_dtype` to look up the entry
         input_dtype = validated_data.pop('dtype')
 
-        # Get or create `DataType` entry first
-        data_type, _ = models.DataType.objects.get_or_create(
-            name=input_dtype['__str__']
-        )
+        # Get or create `DataType` entry first, names are stored in upper case
+        data_type_id = models.data_type_ids.get_or_create_id(input_dtype['__str__'].upper())
 
         # Then get or create `Attribute`
-        entry, _ = models.Attribute.objects.get_or_create(dtype=data_type, **validated_data)
+        entry, _ = models.Attribute.objects.get_or_create(dtype_id=data_type_id, **validated_data)
 
         return entry
 
 
-class InstanceSerializer(serializers.ModelSerializer):
+class InstanceListSerializer(serializers.ListSerializer):
+    '''
+    List serializer for the `Instance` model, upgrading all the entries written under older
+    `AbstractModel` schema versions together before serializing them
+    '''
+
+    def to_representation(self, data):
+        '''
+        Override default `to_representation()` to upgrade the entries first
+        '''
+
+        iterable = data.all() if isinstance(data, Manager) else data
+
+        return super().to_representation(codec.upgrade_instances(iterable))
+
+
+class InstanceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     '''
     Serializer for the `Instance` model
+
+    Entries written under an older schema version of their `AbstractModel` are upgraded in the
+    output, see `data.codec.upgrade_instances`
     '''
 
     # abm = serializers.HyperlinkedRelatedField(
     #     read_only=True, view_name='data:abstractmodel-detail'
     # )
-    item = serializers.CharField(source='abm.master_item')
+    item = serializers.CharField(source='abm.master_item', read_only=True)
 
     class Meta:
         fields = ['item', 'id', 'abm', 'attribute', 'measure', 'link']
+        list_serializer_class = InstanceListSerializer
         model = models.Instance
+        # `Instance` entries created from csv uploads have no measures or links
+        extra_kwargs = {
+            'measure': {'required': False, 'allow_blank': True},
+            'link': {'required': False, 'allow_empty': True},
+        }
+
+    def to_representation(self, instance):
+        '''
+        Override default `to_representation()` to upgrade a single entry, entries serialized
+        with `many=True` are upgraded together by `InstanceListSerializer`
+        '''
+
+        if not isinstance(self.parent, InstanceListSerializer):
+            codec.upgrade_instances([instance])
+
+        return super().to_representation(instance)
+
+    def validate(self, attrs):
+        '''
+        Convert the `attribute` and `measure` values to the `DataType`s of their columns, with
+        the compiled codec of the `AbstractModel`. Entries are written under the current schema
+        version of the `AbstractModel`, so stored values of an updated entry that aren't
+        replaced are upgraded first
+        '''
+
+        abm = attrs.get('abm', None) or getattr(self.instance, 'abm', None)
+        abm_codec = codec.abm_codecs.get(abm.id) if abm is not None else None
+
+        if abm_codec is not None:
+            for field_name in ['attribute', 'measure']:
+                if field_name in attrs:
+                    if attrs[field_name]:
+                        attrs[field_name] = abm_codec.recode(field_name, attrs[field_name])
+
+                elif self.instance is not None and self.instance.abm_id == abm.id:
+                    attrs[field_name] = abm_codec.upgrade(
+                        field_name, getattr(self.instance, field_name), self.instance.schema_version
+                    )
+
+            attrs['schema_version'] = abm_codec.schema_version
+
+        return attrs
 
 
 class MeasureSerializer(serializers.ModelSerializer):
@@ -78,13 +234,13 @@ class MeasureSerializer(serializers.ModelSerializer):
         # Pop out `value_dtype` to look up the entry
         input_dtype = validated_data.pop('value_dtype')
 
-        # Get or create `DataType` entry first
-        data_type, _ = models.DataType.objects.get_or_create(
-            name=input_dtype['__str__']
-        )
+        # Get or create `DataType` entry first, names are stored in upper case
+        data_type_id = models.data_type_ids.get_or_create_id(input_dtype['__str__'].upper())
 
         # Then get or create `Measure`
-        entry, _ = models.Measure.objects.get_or_create(value_dtype=data_type, **validated_data)
+        entry, _ = models.Measure.objects.get_or_create(
+            value_dtype_id=data_type_id, **validated_data
+        )
 
         return entry
 
@@ -109,16 +265,30 @@ class AMLinkSerializer(serializers.ModelSerializer):
         input_relationship = validated_data.pop('relationship')
 
         # Get or create `Relationship` entry first
-        relationship, _ = models.Relationship.objects.get_or_create(
-            relationship_str=input_relationship['__str__']
-        )
+        relationship_id = models.relationship_ids.get_or_create_id(input_relationship['__str__'])
 
         # Then get or create `AMLink`
-        entry, _ = models.AMLink.objects.get_or_create(relationship=relationship, **validated_data)
+        entry, _ = models.AMLink.objects.get_or_create(
+            relationship_id=relationship_id, **validated_data
+        )
 
         return entry
 
 
+class AbstractModelListSerializer(serializers.ListSerializer): # pylint: disable=abstract-method
+    '''
+    List serializer for the `AbstractModel` model, creating every entry together with
+    `AbstractModelSerializer.create_all()`
+    '''
+
+    def create(self, validated_data):
+        '''
+        create method creates new db entries for the input list of validated data
+        '''
+
+        return self.child.create_all(validated_data)
+
+
 class AbstractModelSerializer(serializers.ModelSerializer):
     '''
     Serializer for the `AbstractModel` model
@@ -130,7 +300,8 @@ class AbstractModelSerializer(serializers.ModelSerializer):
     link = AMLinkSerializer(many=True)
 
     class Meta:
-        fields = ('__all__')
+        exclude = ['fingerprint']
+        list_serializer_class = AbstractModelListSerializer
         model = models.AbstractModel
 
     def create(self, validated_data):
@@ -141,38 +312,476 @@ class AbstractModelSerializer(serializers.ModelSerializer):
          * `Measure`s from input `measure` data
          * `AMLink`s from input `link` data
 
-        It does this by using other serializers to do the work
-        We always call `is_valid()` required before we call `save()`
+        See `create_all()`
         '''
 
-        # Get or create `Item` entry
-        item, _ = models.Item.objects.get_or_create(name=validated_data['master_item']['__str__'])
+        return self.create_all([validated_data])[0]
+
+    @classmethod
+    def create_all(cls, validated_data_list, return_created=False):
+        '''
+        Return an `AbstractModel` entry for each validated data dict in the input list, in the
+        same order. Entries with the same structure as an existing entry, or an earlier entry in
+        the list, aren't created again and the existing entry is returned instead
 
-        # Call `AttributeSerializer` with the data to save to new `Attribute` entries
-        attribute_serializer = AttributeSerializer(data=self.initial_data['attribute'], many=True)
-        attribute_serializer.is_valid()
-        attributes = attribute_serializer.save()
+        If `return_created` is `True` each entry is returned in an `(entry, created)` tuple, like
+        `get_or_create()`, where `created` is only `True` for the first data dict of each new
+        entry
 
-        # Call `MeasureSerializer` with the data to save to new `Measure` entries
-        measure_serializer = MeasureSerializer(data=self.initial_data['measure'], many=True)
-        measure_serializer.is_valid()
-        measures = measure_serializer.save()
+        Existing entries are found by their structural fingerprint in a single indexed query
+        '''
 
-        # Call `AMLink` with the data to save to new `AMLink` entries
-        link_serializer = AMLinkSerializer(data=self.initial_data['link'], many=True)
-        link_serializer.is_valid()
-        links = link_serializer.save()
+        fingerprints = [cls.get_fingerprint(data) for data in validated_data_list]
 
-        # Now create the `AbstractModel` entry with all the created relationships from above
-        entry = models.AbstractModel.objects.create(master_item=item)
+        try:
+            entries, created = cls.create_new(validated_data_list, fingerprints)
 
-        for a in attributes: # pylint: disable=invalid-name
-            entry.attribute.add(a)
+        except IntegrityError:
+            # Another process created an entry with the same fingerprint first, so try again to
+            # pick it up
+            entries, created = cls.create_new(validated_data_list, fingerprints)
 
-        for m in measures: # pylint: disable=invalid-name
-            entry.measure.add(m)
+        results = []
 
-        for l in links: # pylint: disable=invalid-name
-            entry.link.add(l)
+        for fingerprint in fingerprints:
+            results += [(entries[fingerprint], fingerprint in created)]
+            created.discard(fingerprint)
 
-        return entry
+        if return_created:
+            return results
+
+        return [entry for entry, _ in results]
+
+    @staticmethod
+    def get_fingerprint(validated_data):
+        '''
+        Return the structural fingerprint of the input validated data, see
+        `models.get_abm_fingerprint`. Names are normalized the same way they are stored
+        '''
+
+        return models.get_abm_fingerprint(
+            validated_data['master_item']['__str__'].capitalize(),
+            [(a['name'], a['dtype']['__str__'].upper()) for a in validated_data['attribute']],
+            [
+                (m['name'], m['measure_type'], m['unit_of_measurement'], m['statistic_type'],
+                 m['measurement_reference_time'], m['measurement_precision'],
+                 m['value_dtype']['__str__'].upper())
+                for m in validated_data['measure']
+            ],
+            [
+                (l['relationship']['__str__'], l['instances_value_dtype'], l['time_link'],
+                 l['link_criteria'], l['values'])
+                for l in validated_data['link']
+            ],
+        )
+
+    @classmethod
+    def create_new(cls, validated_data_list, fingerprints):
+        '''
+        Return a dict of fingerprint to `AbstractModel` entry for the input validated data dicts
+        and their fingerprints, creating the entries that don't exist yet, and the set of
+        fingerprints created
+
+        Entries of each related table are looked up together and any missing ones created
+        together across the whole list, so the number of queries doesn't grow with the number
+        of attributes, measures or links. All writes happen in a single transaction
+        '''
+
+        with transaction.atomic():
+            entries = models.AbstractModel.objects.in_bulk(
+                set(fingerprints), field_name='fingerprint'
+            )
+
+            # Only create the first of each new fingerprint
+            new_data = {
+                fingerprint: data for fingerprint, data in zip(fingerprints, validated_data_list)
+                if fingerprint not in entries
+            }
+            fingerprints = list(new_data)
+            validated_data_list = list(new_data.values())
+
+            if not validated_data_list:
+                return entries, set()
+
+            # Get or create `Item` entries, names are stored capitalized by `Item.save()`
+            item_ids = [
+                models.item_ids.get_or_create_id(data['master_item']['__str__'].capitalize())
+                for data in validated_data_list
+            ]
+
+            # Get or create every `DataType` used, names are stored upper case by
+            # `DataType.save()`
+            dtype_ids = cls.get_data_type_ids([
+                a['dtype']['__str__'].upper()
+                for data in validated_data_list for a in data['attribute']
+            ] + [
+                m['value_dtype']['__str__'].upper()
+                for data in validated_data_list for m in data['measure']
+            ])
+
+            attributes = get_or_create_all(models.Attribute, [
+                {'name': a['name'], 'dtype_id': dtype_ids[a['dtype']['__str__'].upper()]}
+                for data in validated_data_list for a in data['attribute']
+            ], ['name', 'dtype_id'])
+
+            measures = get_or_create_all(models.Measure, [
+                dict(
+                    {k: v for k, v in m.items() if k != 'value_dtype'},
+                    value_dtype_id=dtype_ids[m['value_dtype']['__str__'].upper()]
+                )
+                for data in validated_data_list for m in data['measure']
+            ], ['name', 'measure_type', 'unit_of_measurement', 'statistic_type',
+                'measurement_reference_time', 'measurement_precision', 'value_dtype_id'])
+
+            links = get_or_create_all(
+                models.AMLink,
+                cls.get_link_rows([link for data in validated_data_list for link in data['link']]),
+                ['relationship_id', 'instances_value_dtype', 'time_link', 'link_criteria', 'values']
+            )
+
+            # Now create the `AbstractModel` entries
+            new_entries = [
+                models.AbstractModel.objects.create(master_item_id=item_id, fingerprint=fingerprint)
+                for item_id, fingerprint in zip(item_ids, fingerprints)
+            ]
+
+            # Add all the related entries from above, one insert per `ManyToMany` field
+            for field_name, related_entries in [('attribute', attributes), ('measure', measures),
+                                                ('link', links)]:
+                field = models.AbstractModel._meta.get_field(field_name) # pylint: disable=protected-access
+                through = field.remote_field.through
+                related_ids = iter([e.id for e in related_entries])
+                rows = []
+
+                for entry, data in zip(new_entries, validated_data_list):
+                    # Take this entry's share of the related entries, without duplicates
+                    for related_id in dict.fromkeys(
+                            itertools.islice(related_ids, len(data[field_name]))
+                    ):
+                        rows += [through(**{
+                            field.m2m_field_name() + '_id': entry.id,
+                            field.m2m_reverse_field_name() + '_id': related_id,
+                        })]
+
+                through.objects.bulk_create(rows)
+
+            # `bulk_create()` doesn't send the `ManyToMany` signals, so bump the version here
+            models.ModelVersion.objects.bump(models.AbstractModel)
+
+        entries.update(zip(fingerprints, new_entries))
+
+        return entries, set(fingerprints)
+
+    @staticmethod
+    def get_data_type_ids(names):
+        '''
+        Return a dict of name to id of the `DataType` entries with the input `names`, creating
+        any that don't exist in a single `bulk_create()`
+        '''
+
+        ids = models.data_type_ids.get_ids(names)
+        missing = sorted(set(names) - set(ids))
+
+        if missing:
+            ids.update({
+                e.name: e.id for e in get_or_create_all(
+                    models.DataType, [{'name': name} for name in missing], ['name']
+                )
+            })
+
+        return ids
+
+    @staticmethod
+    def get_link_rows(link_data):
+        '''
+        Return the `AMLink` field values for the input validated `link` data, with each
+        `relationship` replaced by the id of its `Relationship` entry
+
+        `Relationship` entries are looked up or created together, see
+        `RelationshipQuerySet.register()`
+        '''
+
+        relationships = models.Relationship.objects.register(
+            link['relationship']['__str__'] for link in link_data
+        )
+
+        return [
+            dict(
+                {k: v for k, v in link.items() if k != 'relationship'},
+                relationship_id=relationships[link['relationship']['__str__']]
+            )
+            for link in link_data
+        ]
+
+
+class SchemaChangeAttributeSerializer(AttributeSerializer):
+    '''
+    Serializer for an `Attribute` added to an `AbstractModel` by a schema change, with an
+    optional `default` value for its existing `Instance` entries
+    '''
+
+    default = serializers.JSONField(required=False)
+
+    class Meta(AttributeSerializer.Meta):
+        fields = AttributeSerializer.Meta.fields + ['default']
+
+
+class SchemaChangeMeasureSerializer(MeasureSerializer):
+    '''
+    Serializer for a `Measure` added to an `AbstractModel` by a schema change, with an optional
+    `default` value for its existing `Instance` entries
+    '''
+
+    default = serializers.JSONField(required=False)
+
+    class Meta(MeasureSerializer.Meta):
+        fields = MeasureSerializer.Meta.fields + ['default']
+
+
+class AbstractModelSchemaChangeSerializer(serializers.Serializer): # pylint: disable=abstract-method
+    '''
+    Serializer for a change to the attributes and measures of the existing `AbstractModel` in
+    the `abm` context, e.g.:
+
+    {
+        "add_attribute": [{"attribute_name": "genre", "value_dtype": "VARCHAR", "default": ""}],
+        "remove_attribute": ["rating"],
+        "add_measure": [...],
+        "remove_measure": [...]
+    }
+
+    Saving bumps the `AbstractModel` `schema_version` and records the change, so existing
+    `Instance` entries are upgraded when read rather than rewritten straight away
+    '''
+
+    add_attribute = SchemaChangeAttributeSerializer(many=True, required=False)
+    remove_attribute = serializers.ListField(child=serializers.CharField(), required=False)
+    add_measure = SchemaChangeMeasureSerializer(many=True, required=False)
+    remove_measure = serializers.ListField(child=serializers.CharField(), required=False)
+
+    # (json field name, serializer creating added entries)
+    schema_fields = [('attribute', AttributeSerializer), ('measure', MeasureSerializer)]
+
+    def validate(self, attrs):
+        '''
+        Check that added names aren't already on the `AbstractModel`, removed names are, and
+        that there is at least one change
+        '''
+
+        abm = self.context['abm']
+        errors = {}
+
+        if not any(attrs.values()):
+            raise serializers.ValidationError('No schema changes given.')
+
+        for field_name, _ in self.schema_fields:
+            names = set(getattr(abm, field_name).values_list('name', flat=True))
+
+            added_errors = [
+                '"' + data['name'] + '" is already in the AbstractModel ' + field_name + 's.'
+                for data in attrs.get('add_' + field_name, []) if data['name'] in names
+            ]
+            removed_errors = [
+                '"' + name + '" is not in the AbstractModel ' + field_name + 's.'
+                for name in attrs.get('remove_' + field_name, []) if name not in names
+            ]
+
+            if added_errors:
+                errors['add_' + field_name] = added_errors
+
+            if removed_errors:
+                errors['remove_' + field_name] = removed_errors
+
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        return attrs
+
+    def create(self, validated_data):
+        '''
+        create method applies the change to the `AbstractModel` and records it as the
+        `AbstractModelSchemaChange` of its next schema version, returning the `AbstractModel`
+        '''
+
+        with transaction.atomic():
+            abm = models.AbstractModel.objects.select_for_update().get(pk=self.context['abm'].pk)
+            operations = []
+
+            for field_name, entry_serializer_class in self.schema_fields:
+                related = getattr(abm, field_name)
+                removed = validated_data.get('remove_' + field_name, [])
+
+                if removed:
+                    related.remove(*related.filter(name__in=removed))
+
+                operations += [
+                    {'op': 'remove', 'field': field_name, 'name': name} for name in removed
+                ]
+
+                for data in validated_data.get('add_' + field_name, []):
+                    data = dict(data)
+                    operation = {'op': 'add', 'field': field_name, 'name': data['name']}
+
+                    if 'default' in data:
+                        operation['default'] = data.pop('default')
+
+                    related.add(entry_serializer_class().create(data))
+                    operations += [operation]
+
+            abm.schema_version += 1
+            abm.fingerprint = models.get_entry_fingerprint(abm)
+
+            if models.AbstractModel.objects.filter(
+                    fingerprint=abm.fingerprint
+            ).exclude(pk=abm.pk).exists():
+                raise serializers.ValidationError(
+                    'An AbstractModel with this structure already exists.'
+                )
+
+            abm.save(update_fields=['schema_version', 'fingerprint'])
+            models.AbstractModelSchemaChange.objects.create(
+                abm=abm, version=abm.schema_version, operations=operations
+            )
+
+            # Keep value filters in step with the upgraded json reads return
+            models.InstanceValue.objects.apply_schema_change(abm.id, operations)
+
+        return abm
+
+
+class RankingClusterSerializer(serializers.ModelSerializer):
+    '''
+    Serializer for the `RankingCluster` model
+    '''
+
+    master_item = serializers.CharField(source='master_item.__str__', read_only=True)
+
+    class Meta:
+        fields = ('__all__')
+        model = models.RankingCluster
+
+
+# Fast read-only serialization used by list views. These build the same output as
+# `InstanceSerializer` and `AbstractModelSerializer` from `.values()` rows, avoiding the per row
+# cost of drf field resolution
+
+def _build_mapper(field_sources):
+    '''
+    Return a function mapping a `.values()` row dict to an output dict, using the input list of
+    (output key, row key) pairs
+    '''
+
+    def mapper(row):
+        return {key: row[source] for key, source in field_sources}
+
+    return mapper
+
+
+class FastInstanceSerializer:
+    '''
+    Read-only serializer producing the same output as `InstanceSerializer` from `Instance`
+    `.values()` rows
+    '''
+
+    values_fields = ['id', 'abm__master_item__name', 'abm', 'attribute', 'measure',
+                     'schema_version']
+    map_row = staticmethod(_build_mapper([
+        ('item', 'abm__master_item__name'), ('id', 'id'), ('abm', 'abm'),
+        ('attribute', 'attribute'), ('measure', 'measure'),
+    ]))
+
+    @classmethod
+    def values(cls, queryset):
+        '''
+        Return the input `Instance` queryset as `.values()` rows containing the needed columns
+        '''
+
+        return queryset.select_related(None).prefetch_related(None).values(*cls.values_fields)
+
+    @classmethod
+    def serialize(cls, rows):
+        '''
+        Return a list of serialized `Instance` dicts for the input `.values()` rows. Links are
+        fetched for all rows in a single query, and rows written under older `AbstractModel`
+        schema versions are upgraded together
+        '''
+
+        rows = codec.upgrade_rows(rows)
+        links = {row['id']: [] for row in rows}
+
+        for instance_id, link_id in models.Instance.link.through.objects.filter(
+                instance_id__in=links.keys()
+        ).order_by('instancelink_id').values_list('instance_id', 'instancelink_id'):
+            links[instance_id] += [link_id]
+
+        return [dict(cls.map_row(row), link=links[row['id']]) for row in rows]
+
+
+class FastAbstractModelSerializer:
+    '''
+    Read-only serializer producing the same output as `AbstractModelSerializer` from
+    `AbstractModel` `.values()` rows, with the nested fields read from the schema snapshot
+    '''
+
+    values_fields = ['id']
+
+    # (output field, `AbstractModelSchema` field, (output key, schema object field) pairs)
+    nested_fields = [
+        ('attribute', 'attributes', [
+            ('attribute_name', 'name'), ('value_dtype', 'dtype'),
+        ]),
+        ('measure', 'measures', [
+            ('measure_name', 'name'), ('measure_type', 'measure_type'),
+            ('unit_of_measurement', 'unit_of_measurement'), ('value_dtype', 'value_dtype'),
+            ('statistic_type', 'statistic_type'),
+            ('measurement_reference_time', 'measurement_reference_time'),
+            ('measurement_precision', 'measurement_precision'),
+        ]),
+        ('link', 'links', [
+            ('relationship', 'relationship'),
+            ('instances_value_dtype', 'instances_value_dtype'), ('time_link', 'time_link'),
+            ('link_criteria', 'link_criteria'), ('values', 'values'),
+        ]),
+    ]
+
+    @classmethod
+    def values(cls, queryset):
+        '''
+        Return the input `AbstractModel` queryset as `.values()` rows containing the needed
+        columns
+        '''
+
+        return queryset.select_related(None).prefetch_related(None).values(*cls.values_fields)
+
+    @classmethod
+    def serialize(cls, rows):
+        '''
+        Return a list of serialized `AbstractModel` dicts for the input `.values()` rows, built
+        from the schema snapshot without further queries
+        '''
+
+        rows = list(rows)
+        abstract_models = schema.schema_snapshot.get_containing(
+            'abstract_models', [row['id'] for row in rows]
+        ).abstract_models
+        serialized = []
+
+        for row in rows:
+            abm = abstract_models.get(row['id'], None)
+
+            # Skip entries deleted since the rows were read
+            if abm is None:
+                continue
+
+            entry = {'id': abm.id, 'master_item': abm.master_item}
+
+            for field_name, schema_field, field_sources in cls.nested_fields:
+                entry[field_name] = [
+                    {key: getattr(related, source) for key, source in field_sources}
+                    for related in getattr(abm, schema_field)
+                ]
+
+            entry['schema_version'] = abm.schema_version
+            serialized += [entry]
+
+        return serialized
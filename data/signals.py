@@ -0,0 +1,194 @@
+'''
+Signal receivers for the `data` Django app
+'''
+
+
+from django.apps import apps
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_migrate, post_save, pre_delete
+)
+
+from data import codec, models, schema
+
+
+# Models whose writes don't need to bump a `ModelVersion` counter
+UNVERSIONED_MODELS = [
+    models.ModelVersion, models.InstanceValue, models.ItemInstanceCounter,
+    models.AbstractModelInstanceCounter, models.RelationshipInstanceCounter
+]
+
+
+def bump_model_version(sender, **kwargs): # pylint: disable=unused-argument
+    '''
+    Receiver bumps the `ModelVersion` counter of a model after an entry is saved or deleted
+    '''
+
+    models.ModelVersion.objects.bump(sender)
+
+
+def bump_m2m_model_version(sender, instance, action, reverse, model, **kwargs): # pylint: disable=unused-argument,too-many-arguments
+    '''
+    Receiver bumps the `ModelVersion` counter of a model after one of its `ManyToMany` fields
+    changes. If the field was changed from the reverse side, `model` is the owner of the field
+    '''
+
+    if action in ['post_add', 'post_remove', 'post_clear']:
+        models.ModelVersion.objects.bump(model if reverse else instance.__class__)
+
+
+def connect_version_signals():
+    '''
+    Connect the `ModelVersion` receivers to each versioned model in the `data` app
+
+    Receivers are connected per model, rather than for all senders, so unversioned models keep
+    Django's fast bulk delete
+    '''
+
+    for model in apps.get_app_config('data').get_models():
+        if model in UNVERSIONED_MODELS:
+            continue
+
+        post_save.connect(bump_model_version, sender=model)
+        post_delete.connect(bump_model_version, sender=model)
+
+        for field in model._meta.many_to_many: # pylint: disable=protected-access
+            m2m_changed.connect(bump_m2m_model_version, sender=field.remote_field.through)
+
+
+def uncount_deleted_instance(sender, instance, **kwargs): # pylint: disable=unused-argument
+    '''
+    Receiver removes an `Instance` entry and its links from the instance counters before it is
+    deleted, inside the delete transaction
+    '''
+
+    models.count_instances({instance.abm_id: -1})
+    models.count_instance_links(models.Instance.link.through.objects.filter(instance=instance), -1)
+
+
+def uncount_deleted_instance_link(sender, instance, **kwargs): # pylint: disable=unused-argument
+    '''
+    Receiver removes the links to an `InstanceLink` entry from the instance counters before it
+    is deleted, inside the delete transaction
+    '''
+
+    models.count_instance_links(
+        models.Instance.link.through.objects.filter(instancelink=instance), -1
+    )
+
+
+def count_changed_instance_links(sender, instance, action, reverse, pk_set, **kwargs): # pylint: disable=unused-argument,too-many-arguments
+    '''
+    Receiver updates the `Relationship` instance counters when `Instance.link` changes, inside
+    the transaction making the change
+
+    Added links are counted after they are added, as `pk_set` then only holds new links, while
+    removed links are counted before they are removed
+    '''
+
+    if action not in ['post_add', 'pre_remove', 'pre_clear']:
+        return
+
+    links_qs = sender.objects.filter(**{'instancelink' if reverse else 'instance': instance})
+
+    if pk_set is not None:
+        links_qs = links_qs.filter(**{'instance__in' if reverse else 'instancelink__in': pk_set})
+
+    models.count_instance_links(links_qs, 1 if action == 'post_add' else -1)
+
+
+def connect_counter_signals():
+    '''
+    Connect the receivers keeping the instance counters up to date
+    '''
+
+    pre_delete.connect(uncount_deleted_instance, sender=models.Instance)
+    pre_delete.connect(uncount_deleted_instance_link, sender=models.InstanceLink)
+    m2m_changed.connect(count_changed_instance_links, sender=models.Instance.link.through)
+
+
+# Name caches to clear when their model changes in this process
+NAME_CACHES = {
+    models.DataType: models.data_type_ids,
+    models.Item: models.item_ids,
+    models.Relationship: models.relationship_ids,
+}
+
+
+def clear_name_cache(sender, created=False, **kwargs): # pylint: disable=unused-argument
+    '''
+    Receiver clears the name cache of a model after an entry is renamed or deleted. New entries
+    can't make cached names wrong, so creating an entry keeps the cache
+    '''
+
+    if not created:
+        NAME_CACHES[sender].clear()
+
+
+def clear_all_name_caches(sender, **kwargs): # pylint: disable=unused-argument
+    '''
+    Receiver clears every name cache after a migrate or flush, which change tables without
+    sending signals per entry
+    '''
+
+    for name_cache in NAME_CACHES.values():
+        name_cache.clear()
+
+
+def connect_name_cache_signals():
+    '''
+    Connect the receivers clearing the name caches
+    '''
+
+    for model in NAME_CACHES:
+        post_save.connect(clear_name_cache, sender=model)
+        post_delete.connect(clear_name_cache, sender=model)
+
+    post_migrate.connect(clear_all_name_caches, sender=apps.get_app_config('data'))
+
+
+def clear_codec_cache(sender, **kwargs): # pylint: disable=unused-argument
+    '''
+    Receiver clears the compiled `AbstractModel` codecs after a change to the schema they are
+    compiled from
+    '''
+
+    codec.abm_codecs.clear()
+
+
+def connect_codec_cache_signals():
+    '''
+    Connect the receivers clearing the compiled `AbstractModel` codecs
+    '''
+
+    for model in [models.AbstractModel, models.Attribute, models.Measure, models.DataType,
+                  models.AbstractModelSchemaChange]:
+        post_save.connect(clear_codec_cache, sender=model)
+        post_delete.connect(clear_codec_cache, sender=model)
+
+    for field in models.AbstractModel._meta.many_to_many: # pylint: disable=protected-access
+        m2m_changed.connect(clear_codec_cache, sender=field.remote_field.through)
+
+    post_migrate.connect(clear_codec_cache, sender=apps.get_app_config('data'))
+
+
+def clear_schema_snapshot(sender, **kwargs): # pylint: disable=unused-argument
+    '''
+    Receiver drops the in-memory schema snapshot after a change to a schema table
+    '''
+
+    schema.schema_snapshot.clear()
+
+
+def connect_schema_snapshot_signals():
+    '''
+    Connect the receivers dropping the in-memory schema snapshot
+    '''
+
+    for model in schema.schema_snapshot.watched_models:
+        post_save.connect(clear_schema_snapshot, sender=model)
+        post_delete.connect(clear_schema_snapshot, sender=model)
+
+    for field in models.AbstractModel._meta.many_to_many: # pylint: disable=protected-access
+        m2m_changed.connect(clear_schema_snapshot, sender=field.remote_field.through)
+
+    post_migrate.connect(clear_schema_snapshot, sender=apps.get_app_config('data'))
@@ -0,0 +1,203 @@
+'''
+Tests for `data.coalescing` in the `data` Django web app
+'''
+
+
+import threading
+import time
+
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+
+from data import models
+from data.coalescing import SingleFlight, single_flight
+
+
+class SingleFlightTests(TransactionTestCase):
+    '''
+    TestCase class for the `SingleFlight` class
+
+    `TransactionTestCase` is used as the leader writes its lock to the database cache from
+    another thread, which can't see inside the `TestCase` transaction
+    '''
+
+    def setUp(self):
+        '''
+        Common setup for each test definition
+        '''
+
+        self.single_flight = SingleFlight()
+        self.cache = caches[settings.SINGLE_FLIGHT_CACHE]
+
+    def run_concurrently(self, key, func, count=8):
+        '''
+        Call `single_flight.do` with the input `key` and `func` from `count` threads at once and
+        return their results
+        '''
+
+        results = [None] * count
+
+        def run(index):
+            results[index] = self.single_flight.do(key, func)
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def test_concurrent_calls_with_same_key_compute_once(self):
+        '''
+        Concurrent calls with the same key should call `func` once and all share its result
+        '''
+
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'value': len(calls)}
+
+        results = self.run_concurrently('same', compute)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'value': 1}] * 8)
+
+    def test_calls_after_completion_compute_again(self):
+        '''
+        A call made after the previous call with the same key finished should call `func` again
+        rather than reuse the old result
+        '''
+
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(self.single_flight.do('again', compute), 1)
+        self.assertEqual(self.single_flight.do('again', compute), 2)
+
+    def test_leader_error_is_raised_in_waiters(self):
+        '''
+        An error raised by the leader should be raised in the waiting calls too, and release the
+        lock so later calls can compute
+        '''
+
+        def compute():
+            time.sleep(0.2)
+            raise ValueError('failed')
+
+        errors = []
+
+        def run():
+            try:
+                self.single_flight.do('error', compute)
+            except ValueError as err:
+                errors.append(err)
+
+        threads = [threading.Thread(target=run) for _ in range(4)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(errors), 4)
+        self.assertEqual(self.single_flight.do('error', lambda: 'ok'), 'ok')
+
+    def test_call_shares_result_of_leader_in_other_process(self):
+        '''
+        A call made while another process holds the lock for the key should return the result
+        that process publishes, without calling `func`
+        '''
+
+        # Act as the leader in another process, publishing its result shortly after
+        lock_key = 'single-flight:lock:' + SingleFlight.digest('shared')
+        self.cache.set(lock_key, 'other', 30)
+
+        def publish():
+            time.sleep(0.2)
+            self.cache.set('single-flight:result:other', ['from other process'], 30)
+            self.cache.delete(lock_key)
+
+        thread = threading.Thread(target=publish)
+        thread.start()
+
+        result = self.single_flight.do('shared', lambda: ['computed'])
+        thread.join()
+
+        self.assertEqual(result, ['from other process'])
+
+
+class SingleFlightCacheTableTests(TransactionTestCase):
+    '''
+    TestCase class for the `single_flight` cache table on a database built with `migrate` alone
+    '''
+
+    def test_migrate_creates_cache_table(self):
+        '''
+        `migrate` should create the `single_flight` cache table, so coalesced reads work without
+        running `createcachetable`
+        '''
+
+        table = settings.CACHES[settings.SINGLE_FLIGHT_CACHE]['LOCATION']
+
+        # Drop the table the test runner creates, then apply the migrations again
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE ' + connection.ops.quote_name(table))
+
+        call_command('migrate', 'data', '0008', verbosity=0)
+        call_command('migrate', 'data', verbosity=0)
+
+        self.assertIn(table, connection.introspection.table_names())
+
+        response = self.client.get(reverse('data:instance-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class CoalescedListMixinTests(TestCase):
+    '''
+    TestCase class for the `CoalescedListMixin` viewset mixin
+    '''
+
+    fixtures = [
+        './doc/instanceserializertests.xml'
+    ]
+
+    def test_list_key_includes_etag_versions(self):
+        '''
+        Requests for the same path should only share a `list` computation if their `ETag` was
+        built from the same `ModelVersion` versions, so data read before a write is never
+        returned under an `ETag` from after it
+        '''
+
+        keys = []
+        do = single_flight.do
+
+        def record_key(key, func):
+            keys.append(key)
+            return do(key, func)
+
+        with mock.patch.object(single_flight, 'do', side_effect=record_key):
+            self.client.get(reverse('data:instance-list'))
+            self.client.get(reverse('data:instance-list'))
+            models.Instance.objects.create(abm_id=1, attribute='{}')
+            self.client.get(reverse('data:instance-list'))
+
+        self.assertEqual(keys[0], keys[1])
+        self.assertNotEqual(keys[1], keys[2])
@@ -0,0 +1,164 @@
+'''
+Tests for `data.codec` in the `data` Django web app
+'''
+
+
+import json
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from data import codec, models
+
+
+def create_abstract_model(name='Film'):
+    '''
+    Create an `AbstractModel` with a "Title" VARCHAR and "Year" INT attribute, and a "Rating"
+    FLOAT measure
+    '''
+
+    varchar = models.DataType.objects.create(name='VARCHAR')
+    integer = models.DataType.objects.create(name='INT')
+    floating = models.DataType.objects.create(name='FLOAT')
+
+    abm = models.AbstractModel.objects.create(master_item=models.Item.objects.create(name=name))
+    abm.attribute.add(models.Attribute.objects.create(name='Title', dtype=varchar))
+    abm.attribute.add(models.Attribute.objects.create(name='Year', dtype=integer))
+    abm.measure.add(models.Measure.objects.create(
+        name='Rating', measure_type='score', unit_of_measurement='stars', value_dtype=floating,
+        statistic_type='mean', measurement_reference_time='2020',
+        measurement_precision='0.1'
+    ))
+
+    return abm
+
+
+class AbstractModelCodecTests(TestCase):
+    '''
+    TestCase class for the `AbstractModelCodec` class and `compile_codecs` function
+    '''
+
+    def setUp(self):
+        '''
+        Common setup for each test definition
+        '''
+
+        self.abm = create_abstract_model()
+        self.codec = codec.compile_codecs([self.abm.id])[self.abm.id]
+
+    def test_compile_codecs_reads_columns_in_order(self):
+        '''
+        `compile_codecs` should compile the columns of each `AbstractModel` in the order they
+        were added, and leave out ids that don't exist
+        '''
+
+        self.assertEqual(self.codec.master_item, 'Film')
+        self.assertEqual(self.codec.columns['attribute'], ('Title', 'Year'))
+        self.assertEqual(self.codec.columns['measure'], ('Rating',))
+        self.assertEqual(codec.compile_codecs([self.abm.id + 1]), {})
+
+    def test_encode_converts_values(self):
+        '''
+        `encode` should convert values to their `DataType`, put the columns first and keep
+        values that don't convert as they are
+        '''
+
+        self.assertEqual(
+            self.codec.encode('attribute', {'Other': 'x', 'Year': '1999', 'Title': 'Heat'}),
+            json.dumps({'Title': 'Heat', 'Year': 1999, 'Other': 'x'})
+        )
+        self.assertEqual(
+            self.codec.encode('attribute', {'Year': 'unknown'}), json.dumps({'Year': 'unknown'})
+        )
+        self.assertEqual(
+            self.codec.decode('measure', json.dumps({'Rating': '4.5'})), {'Rating': 4.5}
+        )
+
+    def test_recode_keeps_non_object_json(self):
+        '''
+        `recode` should return input that isn't a json object as it is
+        '''
+
+        self.assertEqual(self.codec.recode('attribute', 'not json'), 'not json')
+        self.assertEqual(self.codec.recode('attribute', '[1, 2]'), '[1, 2]')
+
+    def test_upgrade_applies_later_schema_changes(self):
+        '''
+        `upgrade` should apply the operations of every schema change after the input version,
+        and leave json at the current version as it is
+        '''
+
+        models.AbstractModelSchemaChange.objects.create(abm=self.abm, version=2, operations=[
+            {'op': 'add', 'field': 'attribute', 'name': 'Genre', 'default': 'Drama'},
+        ])
+        models.AbstractModelSchemaChange.objects.create(abm=self.abm, version=3, operations=[
+            {'op': 'remove', 'field': 'attribute', 'name': 'Year'},
+            {'op': 'add', 'field': 'measure', 'name': 'Votes'},
+        ])
+        models.AbstractModel.objects.filter(id=self.abm.id).update(schema_version=3)
+        upgraded = codec.compile_codecs([self.abm.id])[self.abm.id]
+        json_str = json.dumps({'Title': 'Heat', 'Year': 1995})
+
+        self.assertEqual(
+            json.loads(upgraded.upgrade('attribute', json_str, 1)),
+            {'Title': 'Heat', 'Genre': 'Drama'}
+        )
+        self.assertEqual(json.loads(upgraded.upgrade('attribute', json_str, 2)), {'Title': 'Heat'})
+        self.assertIs(upgraded.upgrade('attribute', json_str, 3), json_str)
+        self.assertIs(upgraded.upgrade('measure', '{}', 1), '{}')
+
+    def test_codec_is_immutable(self):
+        '''
+        A compiled codec should not allow its columns or converters to be changed
+        '''
+
+        with self.assertRaises(AttributeError):
+            self.codec.columns = {}
+
+        with self.assertRaises(TypeError):
+            self.codec.converters['attribute']['Year'] = codec.keep
+
+
+class CodecCacheTests(TransactionTestCase):
+    '''
+    TestCase class for the `CodecCache` class
+
+    `TransactionTestCase` is used as codecs are only cached once their transaction commits
+    '''
+
+    def setUp(self):
+        '''
+        Common setup for each test definition
+        '''
+
+        self.cache = codec.CodecCache()
+        self.abm = create_abstract_model()
+
+    def test_get_caches_codecs(self):
+        '''
+        `get` should compile a codec once and serve it from the cache after
+        '''
+
+        compiled = self.cache.get(self.abm.id)
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertIs(self.cache.get(self.abm.id), compiled)
+
+        self.assertEqual(len(captured), 0)
+
+    def test_schema_change_clears_module_cache(self):
+        '''
+        Adding an attribute to an `AbstractModel` should clear the module codec cache, so the
+        next codec includes it
+        '''
+
+        self.assertEqual(codec.abm_codecs.get(self.abm.id).columns['attribute'], ('Title', 'Year'))
+
+        self.abm.attribute.add(models.Attribute.objects.create(
+            name='Genre', dtype=models.DataType.objects.get(name='VARCHAR')
+        ))
+
+        self.assertEqual(
+            codec.abm_codecs.get(self.abm.id).columns['attribute'], ('Title', 'Year', 'Genre')
+        )
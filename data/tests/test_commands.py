@@ -0,0 +1,127 @@
+'''
+Tests for the management commands in the `data` Django web app
+'''
+
+
+import io
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from data import models, serializers
+
+
+class ImportAbstractModelsCommandTests(TestCase):
+    '''
+    TestCase class for the `import_abstract_models` management command
+    '''
+
+    def setUp(self):
+        '''
+        Common setup for each test definition
+        '''
+
+        with open(os.path.join(settings.BASE_DIR, 'doc', 'abm_input.json')) as f: # pylint: disable=invalid-name
+            self.json_blob = json.load(f)
+
+    def import_jsonl(self, records):
+        '''
+        Run the command on a JSONL file of the input `records` and return its output
+        '''
+
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as file:
+            file.write('\n'.join(json.dumps(record) for record in records))
+
+        self.addCleanup(os.remove, file.name)
+
+        stdout = io.StringIO()
+        call_command('import_abstract_models', file.name, stdout=stdout, stderr=io.StringIO())
+
+        return stdout.getvalue()
+
+    def test_command_imports_jsonl(self):
+        '''
+        `import_abstract_models` command should create an `AbstractModel` entry for each record
+        and report the throughput
+        '''
+
+        output = self.import_jsonl([self.json_blob, dict(self.json_blob, master_item='Film')])
+
+        self.assertIn('Imported 2 of 2 AbstractModels', output)
+        self.assertEqual(models.AbstractModel.objects.count(), 2)
+
+    def test_command_duplicate_records_succeed(self):
+        '''
+        `import_abstract_models` command should succeed when records reuse an existing
+        `AbstractModel`, only counting new entries as imported
+        '''
+
+        output = self.import_jsonl([self.json_blob, self.json_blob])
+
+        self.assertIn('Imported 1 of 2 AbstractModels (1 already existed)', output)
+        self.assertEqual(models.AbstractModel.objects.count(), 1)
+
+    def test_command_invalid_record_fails(self):
+        '''
+        `import_abstract_models` command should fail without writing if any record is invalid
+        '''
+
+        with self.assertRaises(CommandError):
+            self.import_jsonl([self.json_blob, {'master_item': 'Film'}])
+
+        self.assertFalse(models.AbstractModel.objects.exists())
+
+
+class MigrateInstanceSchemasCommandTests(TestCase):
+    '''
+    TestCase class for the `migrate_instance_schemas` management command
+    '''
+
+    def test_command_rewrites_older_instances(self):
+        '''
+        Command should rewrite and re-index the `Instance` entries written under an older schema
+        version, in batches, and leave current entries alone
+        '''
+
+        with open(os.path.join(settings.BASE_DIR, 'doc', 'abm_input.json')) as f: # pylint: disable=invalid-name
+            serializer = serializers.AbstractModelSerializer(data=json.load(f))
+
+        serializer.is_valid()
+        abm = serializer.save()
+
+        instances = [
+            models.Instance.objects.create(abm=abm, attribute=json.dumps({'title': title}))
+            for title in ['Emma', 'Dune', 'Ulysses']
+        ]
+
+        change = serializers.AbstractModelSchemaChangeSerializer(data={
+            'add_attribute': [{'attribute_name': 'genre', 'value_dtype': 'VARCHAR',
+                               'default': 'Unknown'}]
+        }, context={'abm': abm})
+        change.is_valid()
+        change.save()
+
+        current = models.Instance.objects.create(
+            abm=abm, attribute=json.dumps({'title': 'Beloved'}), schema_version=2
+        )
+
+        out = io.StringIO()
+        call_command('migrate_instance_schemas', batch_size=2, pause_ms=0, stdout=out)
+
+        self.assertIn('Migrated 3 Instances in 2 batches', out.getvalue())
+
+        for instance in instances:
+            instance.refresh_from_db()
+
+            self.assertEqual(instance.schema_version, 2)
+            self.assertEqual(json.loads(instance.attribute)['genre'], 'Unknown')
+
+        current.refresh_from_db()
+        self.assertEqual(json.loads(current.attribute), {'title': 'Beloved'})
+        self.assertEqual(
+            models.InstanceValue.objects.filter(key='genre', value='Unknown').count(), 3
+        )
@@ -8,7 +8,9 @@ import os
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from data import forms, models
 
@@ -208,6 +210,64 @@ class RetrieveDataFormTests(TestCase):
         # Confirm data is valid
         self.assertTrue(form.is_valid())
 
+    def test_form_raises_all_errors_together(self):
+        '''
+        `RetrieveDataForm` `.is_valid()` method should report every error in the data_request
+        together, including when the "UOA" `Item` doesn't exist
+        '''
+
+        form = forms.RetrieveDataForm({'data_request': json.dumps(
+            {'UOA': 'Junk', 'Book': 'Junk', 'Person': {'Junk': []}, 'Film': {'ATTR': []}}
+        )})
+
+        form.is_valid()
+
+        self.assertEqual(form.errors['data_request'], [
+            '"Junk" Item does not exist.',
+            '"Book" value is not a dictionary.',
+            '"Person" value dictionary doesn''t contain "ATTR", "MEAS" or "LINK" key(s).', # pylint: disable=implicit-str-concat
+        ])
+
+    def test_form_raises_error_data_request_wrong_value_types(self):
+        '''
+        `RetrieveDataForm` `.is_valid()` method should raise an error if the "UOA" value isn't a
+        string, or "ATTR", "MEAS" or "LINK" values aren't lists of strings
+        '''
+
+        form = forms.RetrieveDataForm({'data_request': json.dumps(
+            {'UOA': ['Film'], 'Book': {'ATTR': 'title', 'MEAS': [1], 'LINK': 5}}
+        )})
+
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['data_request'], [
+            '"UOA" value is not a string.',
+            '"Book" value "ATTR" key is not a list of strings.',
+            '"Book" value "MEAS" key is not a list of strings.',
+            '"Book" value "LINK" key is not a list of strings.',
+        ])
+
+
+    def test_form_json_keys_requires_lists_of_strings(self):
+        '''
+        `RetrieveDataForm` should only accept "ATTR" and "MEAS" lists of strings for the UOA
+        `Item`, and return them as tuples from `json_keys`
+        '''
+
+        for uoa_request in [{'ATTR': 'Year'}, {'ATTR': 5}, {'MEAS': {'Rating': 1}}]:
+            form = forms.RetrieveDataForm(
+                {'data_request': json.dumps({'UOA': 'Award', 'Award': uoa_request})}
+            )
+
+            self.assertFalse(form.is_valid())
+            self.assertEqual(len(form.errors['data_request']), 1)
+
+        form = forms.RetrieveDataForm(
+            {'data_request': json.dumps({'UOA': 'Award', 'Award': {'ATTR': ['Year']}})}
+        )
+
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.json_keys, {'attribute': ('Year',), 'measure': None})
+
 
 class UploadCsvFileFormTests(TestCase):
     '''
@@ -318,11 +378,10 @@ class UploadCsvFileFormTests(TestCase):
         # Confirm calling the `.is_valid()` method raises the correct error
         form.is_valid()
 
-        # Data loaded by fixtures should contain a single `AbstractModel` entry only with id=1, so
-        # the additional references to ids should raise an error
+        # None of the referenced ids exist, so each should be listed once in the error
         self.assertEqual(
             form.errors['abm_match_json'],
-            ['Data contains references to AbstractModel entries that do not exist.']
+            ['Data contains references to AbstractModel entries that do not exist: 1, 2, 3.']
         )
 
     def test_form_raises_error_abm_match_data_csv_column_name_not_found(self):
@@ -466,3 +525,61 @@ class UploadCsvFileFormTests(TestCase):
 
         # Confirm 6 `Instance` entries have been created
         self.assertEqual(models.Instance.objects.all().count(), 6)
+
+    def test_form_save_converts_values_to_data_types(self):
+        '''
+        `UploadCsvFileForm` `.save()` method should convert csv values to the `DataType` of the
+        `AbstractModel` attribute they are matched to
+        '''
+
+        # Create an `AbstractModel` with an INT "Year" attribute
+        award = models.AbstractModel.objects.create(
+            master_item=models.Item.objects.create(name='award')
+        )
+        award.attribute.add(models.Attribute.objects.create(
+            name='Year', dtype=models.DataType.objects.create(name='INT')
+        ))
+
+        # Open the test file and attach it as an uploaded file
+        upload_file = open(
+            os.path.join(settings.BASE_DIR, 'doc', 'test_data', 'oscar_winners.csv'),
+            'rb'
+        )
+
+        form = forms.UploadCsvFileForm(
+            {'abm_match_json': json.dumps({'Year': str(award.id)})},
+            {'upload_file': SimpleUploadedFile(upload_file.name, upload_file.read())}
+        )
+
+        form.is_valid()
+        entries = form.save()
+
+        # The "Year" values should be saved as json numbers
+        self.assertEqual(json.loads(entries[0].attribute), {'Year': 1928})
+
+    def test_form_checks_abm_match_data_with_constant_number_of_queries(self):
+        '''
+        `UploadCsvFileForm` `.is_valid()` method should check the `AbstractModel` ids of any
+        number of columns with the same number of queries
+        '''
+
+        def count_validation_queries(number_of_columns):
+            form = forms.UploadCsvFileForm(
+                {'abm_match_json': json.dumps(
+                    {'Column {}'.format(i): str(i) for i in range(number_of_columns)}
+                )},
+                self.empty_csv_file
+            )
+
+            with CaptureQueriesContext(connection) as captured:
+                form.is_valid()
+
+            self.assertEqual(
+                form.errors['abm_match_json'],
+                ['Data contains references to AbstractModel entries that do not exist: ' +
+                 ', '.join(str(i) for i in range(number_of_columns)) + '.']
+            )
+
+            return len(captured)
+
+        self.assertEqual(count_validation_queries(1), count_validation_queries(500))
@@ -0,0 +1,80 @@
+'''
+Tests for `data.group_commit` in the `data` Django web app
+'''
+
+
+import threading
+
+from unittest import mock
+
+from django.test import TransactionTestCase, override_settings
+
+from data.group_commit import GroupCommitter
+
+
+@override_settings(GROUP_COMMIT_WINDOW_MS=200, GROUP_COMMIT_MAX_BATCH=500)
+class GroupCommitterTests(TransactionTestCase):
+    '''
+    TestCase class for the `GroupCommitter` class
+
+    `TransactionTestCase` is used as writes run in the writer thread, which can't see inside the
+    `TestCase` transaction
+    '''
+
+    def setUp(self):
+        '''
+        Common setup for each test definition
+        '''
+
+        self.committer = GroupCommitter()
+
+    def submit_concurrently(self, funcs):
+        '''
+        Submit each of the input `funcs` from its own thread at once and return the result or
+        error of each
+        '''
+
+        outcomes = [None] * len(funcs)
+
+        def run(index):
+            try:
+                outcomes[index] = self.committer.submit(funcs[index])
+            except ValueError as err:
+                outcomes[index] = err
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(len(funcs))]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        return outcomes
+
+    def test_concurrent_writes_commit_in_one_batch(self):
+        '''
+        Writes submitted within the window should be flushed together and each submitter should
+        get its own result
+        '''
+
+        with mock.patch.object(self.committer, '_flush', wraps=self.committer._flush) as flush: # pylint: disable=protected-access
+            outcomes = self.submit_concurrently([lambda i=i: i for i in range(5)])
+
+        self.assertEqual(outcomes, list(range(5)))
+        self.assertEqual(flush.call_count, 1)
+
+    def test_failed_write_only_fails_its_submitter(self):
+        '''
+        A write raising an error should raise it in its submitter only, the rest of the batch
+        should still succeed
+        '''
+
+        def fail():
+            raise ValueError('failed')
+
+        outcomes = self.submit_concurrently([lambda: 'ok', fail, lambda: 'ok'])
+
+        self.assertEqual(outcomes[0], 'ok')
+        self.assertIsInstance(outcomes[1], ValueError)
+        self.assertEqual(outcomes[2], 'ok')
@@ -3,6 +3,8 @@ Tests for `data.helpers` in the `data` Django web app
 '''
 
 
+import json
+
 from django.test import TestCase
 
 from data import helpers, models
@@ -17,6 +19,14 @@ class UpdateRankingClustersTests(TestCase):
         './doc/instanceserializertests.xml'
     ]
 
+    def setUp(self):
+        '''
+        Common setup for each test definition
+        '''
+
+        # Fixtures bypass `Instance.save()`, so count their instances
+        models.rebuild_instance_counters()
+
     def test_method_creates_new_ranking_cluster(self):
         '''
         `update_ranking_clusters` method should update all instances with abm__master_item matching
@@ -128,3 +138,32 @@ class UpdateRankingClustersTests(TestCase):
 
         # should save instances_ranking as serialized instances
         self.assertEqual(entry.instances_ranking, expected_instances_ranking_data)
+
+
+class RankInstancesTests(TestCase):
+    '''
+    TestCase class for the `rank_instances` method
+    '''
+
+    def test_method_orders_by_ranking_feature(self):
+        '''
+        `rank_instances` method should order numbers from highest to lowest, then text values,
+        then entries without the ranking feature
+        '''
+
+        abm = models.AbstractModel.objects.create(
+            master_item=models.Item.objects.create(name='Film')
+        )
+        abm.attribute.add(models.Attribute.objects.create(
+            name='Year', dtype=models.DataType.objects.create(name='INT')
+        ))
+
+        instances = [
+            models.Instance.objects.create(abm=abm, attribute=json.dumps(attribute), measure='')
+            for attribute in [{'Title': 'A'}, {'Year': '1999'}, {'Year': 'unknown'},
+                              {'Year': '2005'}]
+        ]
+
+        ranked = helpers.rank_instances(instances, 'Year')
+
+        self.assertEqual(ranked, [instances[3], instances[1], instances[2], instances[0]])
@@ -0,0 +1,129 @@
+'''
+Tests for `data.inference` in the `data` Django web app
+'''
+
+
+import io
+import random
+
+from django.test import TestCase, override_settings
+
+from data import inference
+from data.tests.test_codec import create_abstract_model
+
+
+def make_csv(rows):
+    '''
+    Return a binary file of a "Title,Year,Rating" csv with the input number of rows
+    '''
+
+    lines = ['Title,Year,Rating'] + [
+        '"Film, {0}",{1},{2}'.format(index, 1900 + index, index / 10) for index in range(rows)
+    ]
+
+    return io.BytesIO(('\r\n'.join(lines) + '\r\n').encode())
+
+
+class InferDataTypeTests(TestCase):
+    '''
+    TestCase class for the `infer_data_type` function
+    '''
+
+    def test_infers_narrowest_type(self):
+        '''
+        `infer_data_type` should return the narrowest type every non blank value converts to
+        '''
+
+        self.assertEqual(inference.infer_data_type(['1', ' 2 ', '']), 'INT')
+        self.assertEqual(inference.infer_data_type(['1', '2.5']), 'FLOAT')
+        self.assertEqual(inference.infer_data_type(['yes', 'No']), 'BOOL')
+        self.assertEqual(inference.infer_data_type(['2020-01-01', '2020-01-02 10:00']), 'TIMESTAMP')
+        self.assertEqual(inference.infer_data_type(['1', 'one']), 'VARCHAR')
+        self.assertEqual(inference.infer_data_type(['', ' ']), 'VARCHAR')
+
+
+@override_settings(SCHEMA_INFERENCE_HEAD_ROWS=10, SCHEMA_INFERENCE_SAMPLE_ROWS=20)
+class SampleCsvTests(TestCase):
+    '''
+    TestCase class for the `sample_csv` function
+    '''
+
+    def test_small_file_is_reservoir_sampled(self):
+        '''
+        `sample_csv` should read a file that fits in the scan budget to the end, keeping the head
+        rows and a sample of at most `SCHEMA_INFERENCE_SAMPLE_ROWS` of the others
+        '''
+
+        header, head, sample, report = inference.sample_csv(make_csv(100), random.Random(0))
+
+        self.assertEqual(header, ['Title', 'Year', 'Rating'])
+        self.assertEqual(head[0], ['Film, 0', '1900', '0.0'])
+        self.assertEqual(len(head), 10)
+        self.assertEqual(len(sample), 20)
+        self.assertEqual(len({row[0] for row in sample} & {row[0] for row in head}), 0)
+        self.assertEqual(report['method'], 'reservoir')
+
+    @override_settings(SCHEMA_INFERENCE_SCAN_BYTES=0, SCHEMA_INFERENCE_MAX_LINE_BYTES=64)
+    def test_large_file_is_sampled_at_random_offsets(self):
+        '''
+        `sample_csv` should sample a file larger than the scan budget at random offsets, reading
+        a bounded number of bytes and keeping only whole rows
+        '''
+
+        file = make_csv(10000)
+        read_sizes = []
+        readline = file.readline
+
+        def counted_readline(size=-1):
+            line = readline(size)
+            read_sizes.append(len(line))
+            return line
+
+        file.readline = counted_readline
+        _, head, sample, report = inference.sample_csv(file, random.Random(0))
+
+        self.assertEqual(report['method'], 'random_offsets')
+        self.assertEqual(len(head), 10)
+        self.assertTrue(0 < len(sample) <= 20)
+        self.assertTrue(all(len(row) == 3 and row[0].startswith('Film, ') for row in sample))
+        self.assertTrue(sum(read_sizes) <= (1 + 10 + 2 * 20) * 64)
+
+
+class InferCsvSchemaTests(TestCase):
+    '''
+    TestCase class for the `infer_csv_schema` function
+    '''
+
+    def test_proposes_new_abstract_model(self):
+        '''
+        `infer_csv_schema` should infer the column types and propose a new `AbstractModel`, with
+        no `abm_match` for columns no `AbstractModel` has
+        '''
+
+        report = inference.infer_csv_schema(make_csv(50), 'film', random.Random(0))
+
+        self.assertEqual(
+            [(c['name'], c['value_dtype']) for c in report['columns']],
+            [('Title', 'VARCHAR'), ('Year', 'INT'), ('Rating', 'FLOAT')]
+        )
+        self.assertEqual(report['abstract_model']['master_item'], 'Film')
+        self.assertEqual(report['abstract_model']['attribute'][1], {
+            'attribute_name': 'Year', 'value_dtype': 'INT'
+        })
+        self.assertIsNone(report['existing_abm'])
+        self.assertEqual(report['abm_match'], {'Title': None, 'Year': None, 'Rating': None})
+
+    def test_matches_existing_abstract_models(self):
+        '''
+        `infer_csv_schema` should map columns to the `AbstractModel` with the most matching
+        attribute names
+        '''
+
+        abm = create_abstract_model()
+
+        report = inference.infer_csv_schema(make_csv(5), 'Film', random.Random(0))
+
+        self.assertIsNone(report['existing_abm'])
+        self.assertEqual(
+            report['abm_match'], {'Title': abm.id, 'Year': abm.id, 'Rating': None}
+        )
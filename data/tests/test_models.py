@@ -3,7 +3,9 @@ Tests for `data.models` in the `data` Django web app
 '''
 
 
-from django.test import TestCase
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 from data import models
 
@@ -114,3 +116,376 @@ class RelationshipModelTests(TestCase):
         '''
 
         self.assertEqual(self.entry.item.all().count(), 2)
+
+    def test_save_method_sets_parsed_columns(self):
+        '''
+        `Relationship` save method should parse the input `relationship_str` into the
+        `left_item`, `right_item`, `label` and `direction` columns
+        '''
+
+        self.assertEqual(self.entry.left_item.name, 'Book')
+        self.assertEqual(self.entry.right_item.name, 'Person')
+        self.assertEqual(self.entry.label, 'WROTE')
+        self.assertEqual(self.entry.direction, models.RelationshipDirection.LEFT)
+
+    def test_queryset_matching_returns_entry(self):
+        '''
+        `Relationship` queryset `matching()` method should find entries using the parsed columns
+        '''
+
+        self.assertEqual(
+            models.Relationship.objects.matching('(Book)<-[WROTE]-(Person)').get(), self.entry
+        )
+
+    def test_queryset_with_label_returns_entry(self):
+        '''
+        `Relationship` queryset `with_label()` method should find entries by their label
+        '''
+
+        models.Relationship.objects.create(relationship_str='(Person)-[BORN]->(Country)')
+
+        self.assertEqual(models.Relationship.objects.with_label('wrote').get(), self.entry)
+
+    def test_queryset_register_matches_save(self):
+        '''
+        `Relationship` queryset `register()` method should return existing entries and create
+        missing ones with the same parsed columns and `Item` links as `save()`
+        '''
+
+        ids = models.Relationship.objects.register([
+            '(Book)<-[WROTE]-(Person)', '(Person)-[BORN]->(Country)', '(Person)-[KNOWS]-(Person)',
+            'no items here'
+        ])
+
+        self.assertEqual(ids['(Book)<-[WROTE]-(Person)'], self.entry.id)
+        self.assertEqual(models.Relationship.objects.count(), 4)
+
+        born = models.Relationship.objects.get(id=ids['(Person)-[BORN]->(Country)'])
+        self.assertEqual(born.left_item.name, 'Person')
+        self.assertEqual(born.right_item.name, 'Country')
+        self.assertEqual(born.label, 'BORN')
+        self.assertEqual(born.direction, models.RelationshipDirection.RIGHT)
+        self.assertEqual(sorted(i.name for i in born.item.all()), ['Country', 'Person'])
+
+        knows = models.Relationship.objects.get(id=ids['(Person)-[KNOWS]-(Person)'])
+        self.assertEqual([i.name for i in knows.item.all()], ['Person'])
+
+        self.assertEqual(models.Relationship.objects.get(id=ids['no items here']).label, '')
+
+    # Keep the name caches from checking for changes part way through, which is timing dependent
+    @override_settings(LOCAL_CACHE_CHECK_INTERVAL=3600)
+    def test_queryset_register_uses_constant_number_of_queries(self):
+        '''
+        `Relationship` queryset `register()` method should create many entries using the same
+        number of queries as one
+        '''
+
+        def count_register_queries(prefix, number_of_relationships):
+            with CaptureQueriesContext(connection) as captured:
+                models.Relationship.objects.register([
+                    '({}{})-[HAS]->(Thing{})'.format(prefix, i, i)
+                    for i in range(number_of_relationships)
+                ])
+
+            return len(captured)
+
+        # Check the name cache stamps first
+        count_register_queries('A', 1)
+
+        self.assertEqual(count_register_queries('B', 1), count_register_queries('C', 50))
+
+
+class ParseRelationshipStrTests(TestCase):
+    '''
+    TestCase class for the `parse_relationship_str` function
+    '''
+
+    def test_function_parses_right_direction(self):
+        '''
+        `parse_relationship_str` should return the `Item` names, label and direction of the input
+        string e.g. (Person)-[BORN]->(Country)
+        '''
+
+        self.assertEqual(
+            models.parse_relationship_str('(Person)-[BORN]->(Country)'),
+            models.ParsedRelationship('Person', 'Country', 'BORN', 'RIGHT')
+        )
+
+    def test_function_falls_back_to_item_names(self):
+        '''
+        `parse_relationship_str` should return just the `Item` names if the string is not fully
+        formed
+        '''
+
+        self.assertEqual(
+            models.parse_relationship_str('(Book) wrote by (Person)'),
+            models.ParsedRelationship('Book', 'Person', '', '')
+        )
+
+    def test_function_returns_none_no_items(self):
+        '''
+        `parse_relationship_str` should return `None` if no `Item` names can be found
+        '''
+
+        self.assertIsNone(models.parse_relationship_str('WROTE'))
+
+
+class InstanceModelTests(TestCase):
+    '''
+    TestCase class for the `Instance` model
+    '''
+
+    fixtures = [
+        './doc/test_data/item.xml',
+        './doc/test_data/abstractmodel.xml'
+    ]
+
+    def test_save_method_indexes_values(self):
+        '''
+        `Instance` save method should create an `InstanceValue` entry for each `attribute` and
+        `measure` json key value pair
+        '''
+
+        entry = models.Instance.objects.create(
+            abm_id=1, attribute='{"title": "Emma", "pages": "474"}', measure=''
+        )
+
+        self.assertEqual(
+            sorted(entry.values.values_list('field', 'key', 'value', 'number')),
+            [('attribute', 'pages', '474', 474.0), ('attribute', 'title', 'Emma', None)]
+        )
+
+    def test_save_method_replaces_values(self):
+        '''
+        `Instance` save method should replace existing `InstanceValue` entries when the json
+        changes
+        '''
+
+        entry = models.Instance.objects.create(abm_id=1, attribute='{"title": "Emma"}')
+        entry.attribute = '{"title": "Persuasion"}'
+        entry.save()
+
+        self.assertEqual(list(entry.values.values_list('value', flat=True)), ['Persuasion'])
+
+
+class ModelVersionModelTests(TestCase):
+    '''
+    TestCase class for the `ModelVersion` model
+    '''
+
+    def test_save_bumps_version(self):
+        '''
+        Saving a model entry should bump the model's `ModelVersion` counter
+        '''
+
+        (version,), _ = models.ModelVersion.objects.get_stamp(models.Item)
+
+        models.Item.objects.create(name='book')
+
+        self.assertEqual(models.ModelVersion.objects.get_stamp(models.Item)[0], (version + 1,))
+
+    def test_m2m_change_bumps_version(self):
+        '''
+        Changing a `ManyToMany` field should bump the model's `ModelVersion` counter
+        '''
+
+        entry = models.Relationship.objects.create(relationship_str='(Book)<-[WROTE]-(Person)')
+        (version,), _ = models.ModelVersion.objects.get_stamp(models.Relationship)
+
+        entry.item.clear()
+
+        self.assertEqual(
+            models.ModelVersion.objects.get_stamp(models.Relationship)[0], (version + 1,)
+        )
+
+    def test_get_stamp_unknown_model_returns_zero(self):
+        '''
+        `get_stamp` should return version 0 for a model that has never been written
+        '''
+
+        self.assertEqual(
+            models.ModelVersion.objects.get_stamp(models.RankingCluster), ((0,), None)
+        )
+
+
+class InstanceCounterTests(TestCase):
+    '''
+    TestCase class for the `ItemInstanceCounter`, `AbstractModelInstanceCounter` and
+    `RelationshipInstanceCounter` models
+    '''
+
+    fixtures = [
+        './doc/test_data/item.xml',
+        './doc/test_data/abstractmodel.xml'
+    ]
+
+    def setUp(self):
+        '''
+        Common setup for each test definition
+        '''
+
+        self.book_abm = models.AbstractModel.objects.get(id=1)
+        self.relationship = models.Relationship.objects.create(
+            relationship_str='(Book)<-[WROTE]-(Person)'
+        )
+        self.links = [
+            models.InstanceLink.objects.create(
+                relationship=self.relationship, landing_instance=landing_instance
+            )
+            for landing_instance in ['a', 'b']
+        ]
+
+    def get_counts(self):
+        '''
+        Return the `Book` `Item`, `Book` `AbstractModel` and `Relationship` counts
+        '''
+
+        return (
+            models.ItemInstanceCounter.objects.get_counts([self.book_abm.master_item_id]),
+            models.AbstractModelInstanceCounter.objects.get_counts([self.book_abm.id]),
+            models.RelationshipInstanceCounter.objects.get_counts([self.relationship.id]),
+        )
+
+    def test_counters_count_saved_instances_and_links(self):
+        '''
+        Creating `Instance` entries and adding links should increment the counters
+        '''
+
+        entries = [models.Instance.objects.create(abm=self.book_abm) for _ in range(3)]
+        entries[0].link.add(*self.links)
+        self.links[0].instance_set.add(entries[1])
+
+        self.assertEqual(self.get_counts(), (
+            {self.book_abm.master_item_id: 3}, {self.book_abm.id: 3}, {self.relationship.id: 3}
+        ))
+
+    def test_counters_uncount_removed_links_and_deleted_instances(self):
+        '''
+        Removing links and deleting `Instance` entries should decrement the counters
+        '''
+
+        entries = [models.Instance.objects.create(abm=self.book_abm) for _ in range(3)]
+
+        for entry in entries:
+            entry.link.add(*self.links)
+
+        entries[0].link.remove(self.links[0])
+        entries[1].link.clear()
+        models.Instance.objects.filter(id=entries[2].id).delete()
+
+        self.assertEqual(self.get_counts(), (
+            {self.book_abm.master_item_id: 2}, {self.book_abm.id: 2}, {self.relationship.id: 1}
+        ))
+
+    def test_counters_move_when_instance_abm_changes(self):
+        '''
+        Changing the `abm` of an `Instance` should move it between counters
+        '''
+
+        entry = models.Instance.objects.create(abm=self.book_abm)
+        entry.abm_id = 2
+        entry.save()
+
+        self.assertEqual(
+            models.AbstractModelInstanceCounter.objects.get_counts([1, 2]), {1: 0, 2: 1}
+        )
+
+    def test_rebuild_instance_counters_matches_counted_writes(self):
+        '''
+        `rebuild_instance_counters` should count the same as the counters kept by writes
+        '''
+
+        for entry in [models.Instance.objects.create(abm_id=abm_id) for abm_id in [1, 1, 2]]:
+            entry.link.add(self.links[0])
+
+        counts = self.get_counts()
+        models.rebuild_instance_counters()
+
+        self.assertEqual(self.get_counts(), counts)
+
+
+@override_settings(LOCAL_CACHE_CHECK_INTERVAL=60)
+class NameCacheTests(TransactionTestCase):
+    '''
+    TestCase class for the `NameCache` class
+
+    `TransactionTestCase` is used as names are only cached once their transaction commits
+    '''
+
+    def setUp(self):
+        '''
+        Common setup for each test definition
+        '''
+
+        self.cache = models.NameCache(models.Item, 'name')
+        self.book = models.Item.objects.create(name='Book')
+
+    def test_get_ids_caches_names(self):
+        '''
+        `get_ids` should look up uncached names in one query and cached names in none, and leave
+        out names that don't exist
+        '''
+
+        self.assertEqual(self.cache.get_ids(['Book', 'Film']), {'Book': self.book.id})
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.cache.get_id('Book'), self.book.id)
+
+        self.assertEqual(len(captured), 0)
+
+    def test_get_or_create_id_in_rolled_back_transaction_is_not_cached(self):
+        '''
+        `get_or_create_id` should not cache the id of an entry created in a transaction that is
+        rolled back
+        '''
+
+        try:
+            with transaction.atomic():
+                self.cache.get_or_create_id('Film')
+                raise ValueError
+
+        except ValueError:
+            pass
+
+        self.assertIsNone(self.cache.get_id('Film'))
+
+    def test_cache_is_bounded(self):
+        '''
+        The cache should drop the least recently used names past `settings.NAME_CACHE_SIZE`
+        '''
+
+        models.Item.objects.create(name='Film')
+
+        with self.settings(NAME_CACHE_SIZE=1):
+            self.cache.get_ids(['Book'])
+            self.cache.get_ids(['Film'])
+
+            with CaptureQueriesContext(connection) as captured:
+                self.cache.get_ids(['Book'])
+
+        self.assertEqual(len(captured), 1)
+
+    def test_cache_cleared_when_version_stamp_changes(self):
+        '''
+        The cache should be cleared when another process changes the model's `ModelVersion`
+        '''
+
+        self.cache.get_ids(['Book'])
+
+        # Rename the entry without signals, as another process would
+        models.Item.objects.filter(id=self.book.id).update(name='Novel')
+        models.ModelVersion.objects.bump(models.Item)
+
+        with self.settings(LOCAL_CACHE_CHECK_INTERVAL=0):
+            self.assertIsNone(self.cache.get_id('Book'))
+
+    def test_module_cache_cleared_when_entry_deleted(self):
+        '''
+        The module level `item_ids` cache should be cleared when an `Item` is deleted in this
+        process
+        '''
+
+        models.item_ids.get_ids(['Book'])
+        self.book.delete()
+
+        self.assertIsNone(models.item_ids.get_id('Book'))
@@ -0,0 +1,51 @@
+'''
+Tests for `data.parsers` in the `data` Django web app
+'''
+
+
+import io
+
+from django.test import SimpleTestCase
+
+from rest_framework.exceptions import ParseError
+
+from data import parsers
+
+
+class IterJsonValuesTests(SimpleTestCase):
+    '''
+    TestCase class for the `iter_json_values` method
+    '''
+
+    def test_method_reads_json_array_across_chunks(self):
+        '''
+        `iter_json_values` method should yield each value of a json array, whatever the size of
+        the chunks the stream is read in
+        '''
+
+        for chunk_size in [1, 3, 1024]:
+            values = parsers.iter_json_values(
+                io.BytesIO('[{"title": "Émma"}, {"pages": [1, 2]} ]'.encode()),
+                chunk_size=chunk_size
+            )
+
+            self.assertEqual(list(values), [{'title': 'Émma'}, {'pages': [1, 2]}])
+
+    def test_method_reads_jsonl(self):
+        '''
+        `iter_json_values` method should yield each value of whitespace separated json, skipping
+        blank lines
+        '''
+
+        values = parsers.iter_json_values(io.BytesIO(b'{"a": 1}\n\n{"b": 2}\n'), chunk_size=4)
+
+        self.assertEqual(list(values), [{'a': 1}, {'b': 2}])
+
+    def test_method_raises_parse_error(self):
+        '''
+        `iter_json_values` method should raise `ParseError` for invalid or unterminated json
+        '''
+
+        for content in [b'[{"a": 1}', b'[{"a": 1} {"b": 2}]', b'{"a": }']:
+            with self.assertRaises(ParseError):
+                list(parsers.iter_json_values(io.BytesIO(content)))
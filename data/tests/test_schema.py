@@ -0,0 +1,140 @@
+'''
+Tests for `data.schema` in the `data` Django web app
+'''
+
+
+import json
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from data import forms, models, schema
+from data.tests.test_codec import create_abstract_model
+
+
+class SchemaSnapshotTests(TestCase):
+    '''
+    TestCase class for the `SchemaSnapshot` class and `build_snapshot` function
+    '''
+
+    def setUp(self):
+        '''
+        Common setup for each test definition
+        '''
+
+        self.abm = create_abstract_model()
+        self.snapshot = schema.build_snapshot()
+
+    def test_build_snapshot_indexes_schema(self):
+        '''
+        `build_snapshot` should index entries by id and name, with the related entries of each
+        `AbstractModel` in id order
+        '''
+
+        abm = self.snapshot.abstract_models[self.abm.id]
+        item_id = self.snapshot.item_ids['Film']
+
+        self.assertEqual(self.snapshot.items[item_id].name, 'Film')
+        self.assertEqual(abm.master_item, 'Film')
+        self.assertEqual([(a.name, a.dtype) for a in abm.attributes],
+                         [('Title', 'VARCHAR'), ('Year', 'INT')])
+        self.assertEqual([m.value_dtype for m in abm.measures], ['FLOAT'])
+        self.assertEqual(abm.links, ())
+        self.assertEqual(self.snapshot.data_types[self.snapshot.data_type_ids['INT']].name, 'INT')
+        self.assertEqual(self.snapshot.abstract_model_ids[abm.fingerprint], self.abm.id)
+
+    def test_snapshot_is_immutable(self):
+        '''
+        A snapshot should not allow its entries or indexes to be changed
+        '''
+
+        with self.assertRaises(AttributeError):
+            self.snapshot.abstract_models[self.abm.id].master_item = 'Book'
+
+        with self.assertRaises(TypeError):
+            self.snapshot.item_ids['Book'] = 1
+
+
+@override_settings(LOCAL_CACHE_CHECK_INTERVAL=3600)
+class SchemaSnapshotCacheTests(TransactionTestCase):
+    '''
+    TestCase class for the `SchemaSnapshotCache` class
+
+    `TransactionTestCase` is used as snapshots are only kept once their transaction commits
+    '''
+
+    def setUp(self):
+        '''
+        Common setup for each test definition
+        '''
+
+        self.abm = create_abstract_model()
+        schema.schema_snapshot.clear()
+
+    def test_get_reads_snapshot_from_memory(self):
+        '''
+        `get` should build a snapshot once and return it after without any queries, so forms
+        check the UOA `Item` in memory
+        '''
+
+        snapshot = schema.schema_snapshot.get()
+        form = forms.RetrieveDataForm(data={'data_request': json.dumps({'UOA': 'Film'})})
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertIs(schema.schema_snapshot.get(), snapshot)
+            self.assertTrue(form.is_valid())
+
+        self.assertEqual(len(captured), 0)
+        self.assertEqual(form.uoa.id, snapshot.item_ids['Film'])
+
+    def test_schema_change_swaps_snapshot(self):
+        '''
+        Adding an attribute should replace the snapshot with one that includes it, leaving the
+        old snapshot as it was
+        '''
+
+        snapshot = schema.schema_snapshot.get()
+
+        self.abm.attribute.add(models.Attribute.objects.create(
+            name='Genre', dtype=models.DataType.objects.get(name='VARCHAR')
+        ))
+        new_snapshot = schema.schema_snapshot.get()
+
+        self.assertEqual(len(snapshot.abstract_models[self.abm.id].attributes), 2)
+        self.assertEqual(len(new_snapshot.abstract_models[self.abm.id].attributes), 3)
+
+    def test_get_containing_refreshes_missing_keys(self):
+        '''
+        `get_containing` should check the stamp again when a key is missing, picking up entries
+        written without signals by another process
+        '''
+
+        schema.schema_snapshot.get()
+
+        models.Item.objects.bulk_create([models.Item(name='Book')])
+        models.ModelVersion.objects.bump(models.Item)
+
+        self.assertIn('Book', schema.schema_snapshot.get_containing('item_ids', ['Book']).item_ids)
+
+    def test_conditional_get_checks_snapshot_against_etag_versions(self):
+        '''
+        A list response should never be built from a snapshot older than its `ETag`, even when
+        another process changed the schema within `settings.LOCAL_CACHE_CHECK_INTERVAL`
+        '''
+
+        url = reverse('data:abstractmodel-list')
+        etag = self.client.get(url)['ETag']
+
+        # Rename an attribute the way another process would, without signals in this one
+        models.Attribute.objects.filter(name='Year').update(name='Released')
+        models.ModelVersion.objects.bump(models.Attribute)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(
+            [a['attribute_name'] for a in response.json()['results'][0]['attribute']],
+            ['Title', 'Released']
+        )
@@ -7,9 +7,11 @@ import json
 import os
 
 from django.conf import settings
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
-from data import models, serializers
+from data import models, serializers, views
 
 
 class AttributeSerializerTests(TestCase):
@@ -541,6 +543,78 @@ class AbstractModelSerializerTests(TestCase):
         # entries m2m
         self.assertEqual(entry.link.all().count(), 2)
 
+    def test_serializer_deserializes_existing_entries_without_duplicates(self):
+        '''
+        `AbstractModelSerializer` should reuse existing `DataType`, `Attribute`, `Measure` and
+        `AMLink` entries rather than create them again
+
+        Saving the same structure again, in any order, should return the existing
+        `AbstractModel` entry
+        '''
+
+        reordered_blob = dict(
+            self.json_blob, attribute=self.json_blob['attribute'][::-1],
+            link=self.json_blob['link'][::-1]
+        )
+        entries = []
+
+        for json_blob in [self.json_blob, reordered_blob]:
+            serializer = serializers.AbstractModelSerializer(data=json_blob)
+            serializer.is_valid()
+            entries += [serializer.save()]
+
+        self.assertEqual(entries[0].id, entries[1].id)
+        self.assertEqual(models.AbstractModel.objects.count(), 1)
+        self.assertEqual(models.Attribute.objects.count(), 2)
+        self.assertEqual(models.Measure.objects.count(), 2)
+        self.assertEqual(models.AMLink.objects.count(), 2)
+
+    def test_serializer_deserializes_different_structure_to_new_entry(self):
+        '''
+        `AbstractModelSerializer` should create a new `AbstractModel` entry for a different
+        structure, with the fingerprint of its saved related entries
+        '''
+
+        entries = []
+
+        for json_blob in [self.json_blob, dict(self.json_blob, measure=[])]:
+            serializer = serializers.AbstractModelSerializer(data=json_blob)
+            serializer.is_valid()
+            entries += [serializer.save()]
+
+        self.assertNotEqual(entries[0].id, entries[1].id)
+
+        for entry in entries:
+            self.assertEqual(entry.fingerprint, models.get_entry_fingerprint(entry))
+
+    # Keep the process-local caches from checking for changes part way through, which is timing
+    # dependent
+    @override_settings(LOCAL_CACHE_CHECK_INTERVAL=3600)
+    def test_serializer_deserializes_with_constant_number_of_queries(self):
+        '''
+        `AbstractModelSerializer` should save an `AbstractModel` with many attributes using the
+        same number of queries as one with few
+        '''
+
+        def count_save_queries(number_of_attributes):
+            json_blob = dict(self.json_blob, attribute=[
+                {'attribute_name': 'attribute_{}_{}'.format(number_of_attributes, i),
+                 'value_dtype': 'VARCHAR'}
+                for i in range(number_of_attributes)
+            ])
+            serializer = serializers.AbstractModelSerializer(data=json_blob)
+            serializer.is_valid()
+
+            with CaptureQueriesContext(connection) as captured:
+                serializer.save()
+
+            return len(captured)
+
+        # Create the shared `Item`, `DataType` and `Relationship` entries first
+        count_save_queries(1)
+
+        self.assertEqual(count_save_queries(2), count_save_queries(50))
+
 
 class InstanceSerializerTests(TestCase):
     '''
@@ -584,3 +658,75 @@ class InstanceSerializerTests(TestCase):
         serializer = serializers.InstanceSerializer(models.Instance.objects.get(id=1))
 
         self.assertEqual(serializer.data, expected_json)
+
+
+class FastInstanceSerializerTests(TestCase):
+    '''
+    TestCase class for the `FastInstanceSerializer` serializer
+    '''
+
+    fixtures = [
+        './doc/instanceserializertests.xml'
+    ]
+
+    def test_serializer_output_matches_instance_serializer(self):
+        '''
+        `FastInstanceSerializer` should serialize `Instance` entries to exactly the same data as
+        `InstanceSerializer`
+        '''
+
+        # Give some `Instance` entries links so the `link` field has data to compare
+        relationship = models.Relationship.objects.create(
+            relationship_str='(Award)<-[WON]-(Person)'
+        )
+
+        for instance in models.Instance.objects.filter(id__in=[1, 2]):
+            instance.link.add(*[
+                models.InstanceLink.objects.create(relationship=relationship, landing_instance=l)
+                for l in ['a', 'b']
+            ])
+
+        queryset = views.InstanceViewSet.queryset.order_by('id')
+
+        fast_data = serializers.FastInstanceSerializer.serialize(
+            serializers.FastInstanceSerializer.values(queryset)
+        )
+
+        self.assertEqual(
+            json.dumps(fast_data),
+            json.dumps(serializers.InstanceSerializer(queryset, many=True).data)
+        )
+
+
+class FastAbstractModelSerializerTests(TestCase):
+    '''
+    TestCase class for the `FastAbstractModelSerializer` serializer
+    '''
+
+    def test_serializer_output_matches_abstract_model_serializer(self):
+        '''
+        `FastAbstractModelSerializer` should serialize `AbstractModel` entries to exactly the
+        same data as `AbstractModelSerializer`
+        '''
+
+        with open(os.path.join(settings.BASE_DIR, 'doc', 'abm_input.json')) as f: # pylint: disable=invalid-name
+            json_blob = json.load(f)
+
+        # Create two `AbstractModel` entries sharing some nested entries
+        for master_item in ['Book', 'Film']:
+            serializer = serializers.AbstractModelSerializer(
+                data=dict(json_blob, master_item=master_item)
+            )
+            serializer.is_valid()
+            serializer.save()
+
+        queryset = views.AbstractModelViewSet.queryset.order_by('id')
+
+        fast_data = serializers.FastAbstractModelSerializer.serialize(
+            serializers.FastAbstractModelSerializer.values(queryset)
+        )
+
+        self.assertEqual(
+            json.dumps(fast_data),
+            json.dumps(serializers.AbstractModelSerializer(queryset, many=True).data)
+        )
@@ -0,0 +1,40 @@
+'''
+Tests for `data.validators` in the `data` Django web app
+'''
+
+
+from django.test import TestCase
+
+from data import validators
+
+
+class ToIdTests(TestCase):
+    '''
+    TestCase class for the `to_id` function
+    '''
+
+    def test_function_returns_int_ids(self):
+        '''
+        `to_id` should return ints and json string ints as ints, and `None` for anything else
+        '''
+
+        self.assertEqual(
+            [validators.to_id(value) for value in [1, '2', 'junk', [3], True, None]],
+            [1, 2, None, None, None, None]
+        )
+
+
+class IsStringListTests(TestCase):
+    '''
+    TestCase class for the `is_string_list` function
+    '''
+
+    def test_function_only_accepts_lists_of_strings(self):
+        '''
+        `is_string_list` should be `True` for lists of strings only
+        '''
+
+        self.assertEqual(
+            [validators.is_string_list(value) for value in [[], ['a'], 'a', ['a', 1], ('a',)]],
+            [True, True, False, False, False]
+        )
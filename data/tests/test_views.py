@@ -6,80 +6,842 @@ Tests for `data.views` in the `data` Django web app
 import json
 import os
 
+from unittest import mock
+
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
 
-from data import models, serializers
+from data import forms, helpers, models, pagination, serializers
+
+
+class AbstractModelViewSetTests(TestCase):
+    '''
+    TestCase class for the `AbstractModelViewSet` drf viewset
+    '''
+
+    def setUp(self):
+        '''
+        Common setup for each test definition
+        '''
+
+        # Load the json blob defined at
+        # https://github.com/mister-one/onesto/blob/master/ABM/Book
+        with open(os.path.join(settings.BASE_DIR, 'doc', 'abm_input.json')) as f: # pylint: disable=invalid-name
+            self.json_blob = json.load(f)
+
+    def test_viewset_list_get_method_all(self):
+        '''
+        `AbstractModelViewSet` viewset `list` view should return all `AbstractModel` entries
+
+        Response should return 200
+        '''
+
+        # First deserialize the data using `AbstractModelSerializer` to create the new entries
+        serializer = serializers.AbstractModelSerializer(data=self.json_blob)
+        serializer.is_valid()
+        serializer.save()
+
+        response = self.client.get(reverse('data:abstractmodel-list'))
+
+        # Confirm the response is 200 (OK)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_viewset_detail_get_method_returns_ok(self):
+        '''
+        `AbstractModelViewSet` viewset `retrieve` view should return a single `AbstractModel` entry
+
+        Response should return 200
+        '''
+
+        # First deserialize the data using `AbstractModelSerializer` to create the new entries
+        serializer = serializers.AbstractModelSerializer(data=self.json_blob)
+        serializer.is_valid()
+        serializer.save()
+
+        # Serializer should have created new `AbstractModel` entry, pk should be 1
+        response = self.client.get(reverse('data:abstractmodel-detail', args=[1]))
+
+        # Confirm the response is 200 (OK)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_viewset_list_runs_constant_number_of_queries(self):
+        '''
+        `AbstractModelViewSet` viewset `list` view should run the same number of queries however
+        many `AbstractModel` entries there are
+        '''
+
+        query_counts = []
+
+        for master_item in ['Book', 'Film', 'Album']:
+            # Add another `AbstractModel` entry with its attributes, measures and links
+            serializer = serializers.AbstractModelSerializer(
+                data=dict(self.json_blob, master_item=master_item)
+            )
+            serializer.is_valid()
+            serializer.save()
+
+            with CaptureQueriesContext(connection) as captured:
+                self.client.get(reverse('data:abstractmodel-list'))
+
+            query_counts += [len(captured)]
+
+        self.assertEqual(len(set(query_counts)), 1)
+
+    def test_viewset_create_post_returns_created(self):
+        '''
+        `AbstractModelViewSet` viewset `create` view should create a single `AbstractModel` entry
+
+        Response should return 201 (created)
+        '''
+
+        response = self.client.post(
+            reverse('data:abstractmodel-list'), json.dumps(self.json_blob),
+            content_type='application/json'
+        )
+
+        # Confirm the response is 201 (created)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_viewset_bulk_post_creates_entries(self):
+        '''
+        `AbstractModelViewSet` viewset `bulk` view should create an `AbstractModel` entry for
+        each object in the input json array
+
+        Response should return 201 (created) with a result for each object
+        '''
+
+        response = self.client.post(
+            reverse('data:abstractmodel-bulk'),
+            json.dumps([self.json_blob, dict(self.json_blob, master_item='Film')]),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([r['status'] for r in response.json()], [201, 201])
+        self.assertEqual(models.AbstractModel.objects.count(), 2)
+
+    def test_viewset_import_post_json_array_creates_entries(self):
+        '''
+        `AbstractModelViewSet` viewset `import` view should create an `AbstractModel` entry for
+        each object in the input json array, with its related entries
+
+        Response should return 201 (created) with a result for each object and the throughput
+        '''
+
+        response = self.client.post(
+            reverse('data:abstractmodel-import'),
+            json.dumps([self.json_blob, dict(self.json_blob, master_item='Film')]),
+            content_type='application/json'
+        )
+
+        report = response.json()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((report['records'], report['created']), (2, 2))
+        self.assertIn('records_per_second', report)
+        self.assertEqual(
+            [e.master_item.name for e in models.AbstractModel.objects.order_by('id')],
+            ['Book', 'Film']
+        )
+        self.assertEqual(
+            [e.attribute.count() for e in models.AbstractModel.objects.all()], [2, 2]
+        )
+
+    def test_viewset_import_post_duplicate_records_reuse_entries(self):
+        '''
+        `AbstractModelViewSet` viewset `import` view should only count newly inserted entries as
+        created, reporting records that reuse an existing `AbstractModel` with a 200 status
+        '''
+
+        response = self.client.post(
+            reverse('data:abstractmodel-import'), json.dumps([self.json_blob, self.json_blob]),
+            content_type='application/json'
+        )
+
+        report = response.json()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((report['created'], report['existing']), (1, 1))
+        self.assertEqual([r['status'] for r in report['results']], [201, 200])
+        self.assertEqual(report['results'][0]['id'], report['results'][1]['id'])
+        self.assertTrue(report['results'][1]['existing'])
+
+        # Importing it again creates nothing
+        response = self.client.post(
+            reverse('data:abstractmodel-import'), json.dumps([self.json_blob]),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.json()['created'], response.json()['existing']), (0, 1))
+        self.assertEqual(models.AbstractModel.objects.count(), 1)
+
+    def test_viewset_import_post_ndjson_creates_entries(self):
+        '''
+        `AbstractModelViewSet` viewset `import` view should create an `AbstractModel` entry for
+        each line of the input NDJSON
+        '''
+
+        ndjson = '\n'.join(
+            json.dumps(blob) for blob in [self.json_blob, dict(self.json_blob, master_item='Film')]
+        )
+
+        response = self.client.post(
+            reverse('data:abstractmodel-import'), ndjson, content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(models.AbstractModel.objects.count(), 2)
+
+    def test_viewset_import_post_empty_body_returns_bad_request(self):
+        '''
+        `AbstractModelViewSet` viewset `import` view should return 400 if there is no body
+        '''
+
+        response = self.client.post(
+            reverse('data:abstractmodel-import'), '', content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_viewset_import_post_invalid_writes_nothing(self):
+        '''
+        `AbstractModelViewSet` viewset `import` view should write nothing if any object is
+        invalid, and return the errors of each invalid object
+
+        Response should return 400 (bad request)
+        '''
+
+        response = self.client.post(
+            reverse('data:abstractmodel-import'),
+            json.dumps([self.json_blob, {'master_item': 'Film'}]),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [sorted(r['errors']) for r in response.json()['results'] if 'errors' in r],
+            [['attribute', 'link', 'measure']]
+        )
+        self.assertFalse(models.AbstractModel.objects.exists())
+
+    def test_viewset_bulk_patch_not_allowed(self):
+        '''
+        `AbstractModelViewSet` viewset `bulk` view should not allow updates
+
+        Response should return 405 (method not allowed)
+        '''
+
+        response = self.client.patch(
+            reverse('data:abstractmodel-bulk'), json.dumps([]), content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_viewset_evolve_upgrades_instances_on_read(self):
+        '''
+        `AbstractModelViewSet` viewset `evolve` view should change the `AbstractModel` schema in
+        place, and existing `Instance` entries should be returned upgraded without being rewritten
+        '''
+
+        serializer = serializers.AbstractModelSerializer(data=self.json_blob)
+        serializer.is_valid()
+        abm = serializer.save()
+
+        instance = models.Instance.objects.create(
+            abm=abm, attribute=json.dumps({'title': 'Emma', 'category': 'Novel'}), measure='{}'
+        )
+
+        response = self.client.post(
+            reverse('data:abstractmodel-evolve', args=[abm.id]),
+            json.dumps({
+                'add_attribute': [
+                    {'attribute_name': 'genre', 'value_dtype': 'VARCHAR', 'default': 'Unknown'}
+                ],
+                'remove_attribute': ['category'],
+            }),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['schema_version'], 2)
+        self.assertEqual(
+            [a['attribute_name'] for a in response.json()['attribute']], ['title', 'genre']
+        )
+
+        upgraded = {'title': 'Emma', 'genre': 'Unknown'}
+
+        for url in [reverse('data:instance-list'),
+                    reverse('data:instance-detail', args=[instance.id])]:
+            data = self.client.get(url).json()
+            data = data['results'][0] if 'results' in data else data
+
+            self.assertEqual(json.loads(data['attribute']), upgraded)
+
+        # The stored entry is left for the background migrator
+        instance.refresh_from_db()
+        self.assertEqual(instance.schema_version, 1)
+
+        # But value filters match the upgraded json straight away
+        for params, ids in [({'attribute.genre': 'Unknown'}, [instance.id]),
+                            ({'attribute.category': 'Novel'}, [])]:
+            response = self.client.get(reverse('data:instance-list'), params)
+
+            self.assertEqual([e['id'] for e in response.json()['results']], ids)
+
+    def test_viewset_update_after_evolve_keeps_new_values(self):
+        '''
+        Updating an `Instance` written under an older schema version should store it under the
+        current version, so the new values aren't overwritten by upgrades when read
+        '''
+
+        serializer = serializers.AbstractModelSerializer(data=self.json_blob)
+        serializer.is_valid()
+        abm = serializer.save()
+
+        instance = models.Instance.objects.create(
+            abm=abm, attribute=json.dumps({'title': 'Emma', 'category': 'Novel'}), measure='{}'
+        )
+
+        for changes in [
+                {'remove_attribute': ['category']},
+                {'add_attribute': [
+                    {'attribute_name': 'category', 'value_dtype': 'VARCHAR', 'default': 'Unknown'}
+                ]},
+        ]:
+            self.client.post(
+                reverse('data:abstractmodel-evolve', args=[abm.id]), json.dumps(changes),
+                content_type='application/json'
+            )
+
+        url = reverse('data:instance-detail', args=[instance.id])
+        response = self.client.patch(
+            url, json.dumps({'attribute': json.dumps({'title': 'Emma', 'category': 'Romance'})}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            json.loads(self.client.get(url).json()['attribute'])['category'], 'Romance'
+        )
+
+        instance.refresh_from_db()
+        self.assertEqual(instance.schema_version, 3)
+
+    def test_viewset_evolve_lowercase_dtype_uses_existing_data_type(self):
+        '''
+        `AbstractModelViewSet` viewset `evolve` view should match `value_dtype` names to
+        `DataType` entries case insensitively, the same as creating an `AbstractModel`
+        '''
+
+        serializer = serializers.AbstractModelSerializer(data=self.json_blob)
+        serializer.is_valid()
+        abm = serializer.save()
+        data_type_count = models.DataType.objects.count()
+
+        response = self.client.post(
+            reverse('data:abstractmodel-evolve', args=[abm.id]),
+            json.dumps({
+                'add_attribute': [{'attribute_name': 'genre', 'value_dtype': 'varchar'}],
+                'add_measure': [dict(
+                    self.json_blob['measure'][0], measure_name='words', value_dtype='int'
+                )],
+            }),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['attribute'][-1]['value_dtype'], 'VARCHAR')
+        self.assertEqual(models.DataType.objects.count(), data_type_count)
+
+    def test_viewset_evolve_invalid_names_returns_bad_request(self):
+        '''
+        `AbstractModelViewSet` viewset `evolve` view should return 400 with every invalid name if
+        added names already exist or removed names don't
+        '''
+
+        serializer = serializers.AbstractModelSerializer(data=self.json_blob)
+        serializer.is_valid()
+        abm = serializer.save()
+
+        response = self.client.post(
+            reverse('data:abstractmodel-evolve', args=[abm.id]),
+            json.dumps({
+                'add_attribute': [{'attribute_name': 'title', 'value_dtype': 'VARCHAR'}],
+                'remove_measure': ['junk'],
+            }),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {
+            'add_attribute': ['"title" is already in the AbstractModel attributes.'],
+            'remove_measure': ['"junk" is not in the AbstractModel measures.'],
+        })
+        self.assertFalse(models.AbstractModelSchemaChange.objects.exists())
+
+
+class InstanceViewSetTests(TestCase):
+    '''
+    TestCase class for the `InstanceViewSet` drf viewset
+    '''
+
+    fixtures = [
+        './doc/instanceserializertests.xml'
+    ]
+
+    def setUp(self):
+        '''
+        Common setup for each test definition
+        '''
+
+        # Fixtures don't call `Instance.save()`, so index the `Instance` values here
+        models.InstanceValue.objects.index_instances(models.Instance.objects.all())
+
+    def get_filtered_ids(self, params):
+        '''
+        Return the ids of the `Instance` entries returned by the `list` view filtered by the
+        input query `params`
+        '''
+
+        response = self.client.get(reverse('data:instance-list'), params)
+
+        return [e['id'] for e in response.json()['results']]
+
+    def test_viewset_list_filters_by_item(self):
+        '''
+        `InstanceViewSet` viewset `list` view should filter by master `Item` name
+        '''
+
+        self.assertEqual(self.get_filtered_ids({'item': 'Film'}), [3, 6])
+
+    def test_viewset_list_filters_by_abm(self):
+        '''
+        `InstanceViewSet` viewset `list` view should filter by `AbstractModel` id
+        '''
+
+        self.assertEqual(self.get_filtered_ids({'abm': 1}), [1, 4])
+
+    def test_viewset_list_filters_by_attribute_value(self):
+        '''
+        `InstanceViewSet` viewset `list` view should filter by an exact attribute value
+        '''
+
+        self.assertEqual(self.get_filtered_ids({'attribute.Name': 'Warner Baxter'}), [5])
+
+    def test_viewset_list_filters_by_attribute_range(self):
+        '''
+        `InstanceViewSet` viewset `list` view should filter by a numeric range on an attribute
+        value, comparing numbers rather than strings
+        '''
+
+        self.assertEqual(self.get_filtered_ids({'attribute.Age__gte': '42'}), [2])
+        self.assertEqual(self.get_filtered_ids({'attribute.Age__lt': '100'}), [2, 5])
+
+    def test_viewset_list_filters_by_attribute_prefix(self):
+        '''
+        `InstanceViewSet` viewset `list` view should filter by an attribute value prefix
+        '''
+
+        self.assertEqual(self.get_filtered_ids({'attribute.Movie__startswith': 'In '}), [6])
+
+    def test_viewset_list_combines_filters(self):
+        '''
+        `InstanceViewSet` viewset `list` view should combine filters on different keys
+        '''
+
+        self.assertEqual(
+            self.get_filtered_ids({'attribute.Age__gt': '40', 'attribute.Name__startswith': 'E'}),
+            [2]
+        )
+
+    def test_viewset_list_filter_invalid_lookup_returns_bad_request(self):
+        '''
+        `InstanceViewSet` viewset `list` view should return 400 for an unknown lookup
+        '''
+
+        response = self.client.get(reverse('data:instance-list'), {'attribute.Age__near': '40'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_viewset_detail_fields_param_limits_fields(self):
+        '''
+        `InstanceViewSet` viewset should only return the fields given in the `?fields=` query
+        parameter
+        '''
+
+        response = self.client.get(
+            reverse('data:instance-detail', args=[2]), {'fields': 'id,item'}
+        )
+
+        self.assertEqual(response.json(), {'id': 2, 'item': 'Person'})
+
+    def test_viewset_detail_fields_param_limits_json_keys(self):
+        '''
+        `InstanceViewSet` viewset should only return the json keys given in the `?fields=` query
+        parameter e.g. `attribute.Name`
+        '''
+
+        response = self.client.get(
+            reverse('data:instance-detail', args=[2]), {'fields': 'id,attribute.Name'}
+        )
+
+        self.assertEqual(response.json(), {'id': 2, 'attribute': '{"Name": "Emil Jannings"}'})
+
+    def test_viewset_create_ignores_fields_param(self):
+        '''
+        `InstanceViewSet` viewset should validate and return every field on writes, whatever the
+        `?fields=` query parameter
+        '''
+
+        response = self.client.post(
+            reverse('data:instance-list') + '?fields=id',
+            json.dumps({'abm': 1, 'attribute': '{"Name": "Jane"}'}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['abm'], 1)
+
+    def test_viewset_list_fields_param_selects_only_columns(self):
+        '''
+        `InstanceViewSet` viewset should only select the columns needed by the `?fields=` query
+        parameter from the database
+        '''
+
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(reverse('data:instance-list'), {'fields': 'id,abm'})
+
+        self.assertNotIn('"data_instance"."attribute"', captured.captured_queries[-1]['sql'])
+
+    def test_viewset_list_runs_constant_number_of_queries(self):
+        '''
+        `InstanceViewSet` viewset `list` view should run the same number of queries however many
+        `Instance` entries there are, with or without a `?fields=` projection
+        '''
+
+        relationship = models.Relationship.objects.create(
+            relationship_str='(Award)<-[WON]-(Person)'
+        )
+        projections = [{}, {'fields': 'id'}, {'fields': 'item'}, {'fields': 'link'},
+                       {'fields': 'id,attribute'}]
+        query_counts = {index: [] for index in range(len(projections))}
+
+        for abm_id in [1, 2, 3]:
+            # Add another `Instance` entry with a link so the `link` field has data to fetch
+            instance = models.Instance.objects.create(abm_id=abm_id, attribute='{}')
+            instance.link.add(
+                models.InstanceLink.objects.create(relationship=relationship, landing_instance='')
+            )
+
+            for index, params in enumerate(projections):
+                with CaptureQueriesContext(connection) as captured:
+                    self.client.get(reverse('data:instance-list'), params)
+
+                query_counts[index] += [len(captured)]
+
+        for counts in query_counts.values():
+            self.assertEqual(len(set(counts)), 1)
+
+    def test_viewset_list_returns_etag(self):
+        '''
+        `InstanceViewSet` viewset `list` view should return `ETag` and `Last-Modified` headers
+        '''
+
+        response = self.client.get(reverse('data:instance-list'))
+
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_viewset_list_matching_etag_returns_not_modified(self):
+        '''
+        `InstanceViewSet` viewset `list` view should return 304 without serializing anything if
+        the `If-None-Match` header matches the current `ETag`
+        '''
+
+        first = self.client.get(reverse('data:instance-list'))
+        etag = first['ETag']
+
+        with mock.patch.object(serializers.InstanceSerializer, 'to_representation') as mocked:
+            response = self.client.get(reverse('data:instance-list'), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        mocked.assert_not_called()
+
+        # The 304 carries the same validators as the 200
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response['Last-Modified'], first['Last-Modified'])
+
+    def test_viewset_list_etag_changes_after_write(self):
+        '''
+        `InstanceViewSet` viewset `list` view should return 200 with a new `ETag` after an
+        `Instance` entry is created
+        '''
+
+        etag = self.client.get(reverse('data:instance-list'))['ETag']
+
+        models.Instance.objects.create(abm_id=1, attribute='{"Year": "1930"}')
+
+        response = self.client.get(reverse('data:instance-list'), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_viewset_detail_matching_etag_returns_not_modified(self):
+        '''
+        `InstanceViewSet` viewset `retrieve` view should return 304 if the `If-None-Match`
+        header matches the current `ETag`
+        '''
+
+        etag = self.client.get(reverse('data:instance-detail', args=[1]))['ETag']
+
+        response = self.client.get(
+            reverse('data:instance-detail', args=[1]), HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_viewset_create_post_returns_created(self):
+        '''
+        `InstanceViewSet` viewset `create` view should create a single `Instance` entry
+
+        Response should return 201 (created)
+        '''
+
+        response = self.client.post(
+            reverse('data:instance-list'), json.dumps({'abm': 1, 'attribute': '{"Year": "1930"}'}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['item'], 'Award')
+
+    def test_viewset_bulk_post_ndjson_creates_entries(self):
+        '''
+        `InstanceViewSet` viewset `bulk` view should create an `Instance` entry for each line of
+        input NDJSON
+        '''
+
+        body = '{"abm": 1, "attribute": "{}"}\n\n{"abm": 2, "attribute": "{}"}\n'
+
+        response = self.client.post(
+            reverse('data:instance-bulk'), body, content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([r['id'] for r in response.json()], [7, 8])
+
+    def test_viewset_bulk_post_invalid_writes_nothing(self):
+        '''
+        `InstanceViewSet` viewset `bulk` view should not create anything if any object is
+        invalid, and return the errors of each invalid object
+
+        Response should return 400 (bad request)
+        '''
+
+        response = self.client.post(
+            reverse('data:instance-bulk'),
+            json.dumps([{'abm': 1, 'attribute': '{}'}, {'abm': 99, 'attribute': '{}'}]),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(['errors' in r for r in response.json()], [False, True])
+        self.assertEqual(models.Instance.objects.count(), 6)
+
+    def test_viewset_bulk_patch_updates_entries(self):
+        '''
+        `InstanceViewSet` viewset `bulk` view should update the `Instance` entry with the id of
+        each input object
+
+        Response should return 200 (ok)
+        '''
+
+        response = self.client.patch(
+            reverse('data:instance-bulk'),
+            json.dumps([{'id': 1, 'attribute': '{"Year": "1927"}'}, {'id': 4, 'measure': '{}'}]),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(models.Instance.objects.get(id=1).attribute, '{"Year": "1927"}')
+        self.assertEqual(models.Instance.objects.get(id=4).measure, '{}')
+
+    def test_viewset_bulk_patch_unknown_id_returns_bad_request(self):
+        '''
+        `InstanceViewSet` viewset `bulk` view should return 400 if an object's id doesn't exist
+        '''
+
+        response = self.client.patch(
+            reverse('data:instance-bulk'), json.dumps([{'id': 99, 'measure': '{}'}]),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_viewset_list_ndjson_format_streams_lines(self):
+        '''
+        `InstanceViewSet` viewset `list` view should stream every `Instance` entry as a line of
+        json if `?format=ndjson`
+        '''
+
+        response = self.client.get(reverse('data:instance-list'), {'format': 'ndjson'})
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(line)['id'] for line in lines], [1, 2, 3, 4, 5, 6])
+
+    def test_viewset_list_csv_format_round_trips_through_upload(self):
+        '''
+        `InstanceViewSet` viewset `list` view should stream csv if `?format=csv`, which can be
+        uploaded again with `UploadCsvFileForm` to create the same `attribute` data
+        '''
+
+        response = self.client.get(
+            reverse('data:instance-list'), {'format': 'csv', 'abm': 2}
+        )
+
+        csv_content = b''.join(response.streaming_content)
+
+        self.assertEqual(csv_content.decode().splitlines()[0], 'id,abm,Age,Name')
+
+        form = forms.UploadCsvFileForm(
+            {'abm_match_json': '{"Age": "2", "Name": "2"}'},
+            {'upload_file': SimpleUploadedFile('export.csv', csv_content)}
+        )
+        form.is_valid()
+
+        self.assertEqual(
+            [e.attribute for e in form.save()],
+            [e.attribute for e in models.Instance.objects.filter(id__in=[2, 5]).order_by('id')]
+        )
+
+    def test_viewset_list_paginates_with_cursor(self):
+        '''
+        `InstanceViewSet` viewset `list` view should return pages of `Instance` entries ordered
+        by id, with a cursor link to the next page
+        '''
+
+        response = self.client.get(reverse('data:instance-list'), {'page_size': 4})
+        next_response = self.client.get(response.json()['next'])
+
+        self.assertEqual([e['id'] for e in response.json()['results']], [1, 2, 3, 4])
+        self.assertEqual([e['id'] for e in next_response.json()['results']], [5, 6])
+        self.assertIsNone(next_response.json()['next'])
+
+    def test_viewset_list_page_size_capped(self):
+        '''
+        `InstanceViewSet` viewset `list` view should not return more entries than the
+        `max_page_size` of the pagination class
+        '''
+
+        with mock.patch.object(pagination.IdCursorPagination, 'max_page_size', 2):
+            response = self.client.get(reverse('data:instance-list'), {'page_size': 100})
+
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_viewset_list_invalid_abm_returns_bad_request(self):
+        '''
+        `InstanceViewSet` viewset `list` view should return 400 if the `abm` filter isn't an id
+        '''
+
+        response = self.client.get(reverse('data:instance-list'), {'abm': 'foo'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'abm': ['"foo" is not a valid id.']})
+
+    def test_viewset_list_fields_param_invalid_returns_bad_request(self):
+        '''
+        `InstanceViewSet` viewset should return 400 if the `?fields=` query parameter contains
+        an unknown field
+        '''
+
+        response = self.client.get(reverse('data:instance-list'), {'fields': 'id,colour'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
-class AbstractModelViewSetTests(TestCase):
+@override_settings(GROUP_COMMIT_WINDOW_MS=5)
+class InstanceViewSetGroupCommitTests(TransactionTestCase):
     '''
-    TestCase class for the `AbstractModelViewSet` drf viewset
+    TestCase class for the `InstanceViewSet` drf viewset `create` view in group commit mode
+
+    `TransactionTestCase` is used as writes run in the group commit writer thread, which can't
+    see data inside the `TestCase` transaction
     '''
 
-    def setUp(self):
+    fixtures = [
+        './doc/test_data/item.xml',
+        './doc/test_data/abstractmodel.xml'
+    ]
+
+    def test_viewset_create_post_returns_created_after_commit(self):
         '''
-        Common setup for each test definition
+        `InstanceViewSet` viewset `create` view should return 201 (created) with the committed
+        `Instance` entry
         '''
 
-        # Load the json blob defined at
-        # https://github.com/mister-one/onesto/blob/master/ABM/Book
-        with open(os.path.join(settings.BASE_DIR, 'doc', 'abm_input.json')) as f: # pylint: disable=invalid-name
-            self.json_blob = json.load(f)
+        response = self.client.post(
+            reverse('data:instance-list'), json.dumps({'abm': 1, 'attribute': '{"title": "Emma"}'}),
+            content_type='application/json'
+        )
 
-    def test_viewset_list_get_method_all(self):
-        '''
-        `AbstractModelViewSet` viewset `list` view should return all `AbstractModel` entries
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            models.Instance.objects.get(id=response.json()['id']).attribute, '{"title": "Emma"}'
+        )
 
-        Response should return 200
-        '''
 
-        # First deserialize the data using `AbstractModelSerializer` to create the new entries
-        serializer = serializers.AbstractModelSerializer(data=self.json_blob)
-        serializer.is_valid()
-        serializer.save()
+class RankingClusterViewSetTests(TestCase):
+    '''
+    TestCase class for the `RankingClusterViewSet` drf viewset
+    '''
 
-        response = self.client.get(reverse('data:abstractmodel-list'))
+    fixtures = [
+        './doc/instanceserializertests.xml'
+    ]
 
-        # Confirm the response is 200 (OK)
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    def setUp(self):
+        '''
+        Common setup for each test definition
+        '''
+
+        helpers.update_ranking_clusters(models.Item.objects.filter(name='Award'))
+
+        self.entry = models.RankingCluster.objects.get()
 
     def test_viewset_detail_get_method_returns_ok(self):
         '''
-        `AbstractModelViewSet` viewset `retrieve` view should return a single `AbstractModel` entry
-
-        Response should return 200
+        `RankingClusterViewSet` viewset `retrieve` view should return a single `RankingCluster`
+        entry
         '''
 
-        # First deserialize the data using `AbstractModelSerializer` to create the new entries
-        serializer = serializers.AbstractModelSerializer(data=self.json_blob)
-        serializer.is_valid()
-        serializer.save()
-
-        # Serializer should have created new `AbstractModel` entry, pk should be 1
-        response = self.client.get(reverse('data:abstractmodel-detail', args=[1]))
+        response = self.client.get(reverse('data:rankingcluster-detail', args=[self.entry.id]))
 
-        # Confirm the response is 200 (OK)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['master_item'], 'Award')
 
-    def test_viewset_create_post_returns_created(self):
+    def test_viewset_instances_csv_format(self):
         '''
-        `AbstractModelViewSet` viewset `create` view should create a single `AbstractModel` entry
-
-        Response should return 201 (created)
+        `RankingClusterViewSet` viewset `instances` view should stream the ranked `Instance`
+        data as csv if `?format=csv`
         '''
 
-        response = self.client.post(
-            reverse('data:abstractmodel-list'), json.dumps(self.json_blob),
-            content_type='application/json'
+        response = self.client.get(
+            reverse('data:rankingcluster-instances', args=[self.entry.id]), {'format': 'csv'}
         )
 
-        # Confirm the response is 201 (created)
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().splitlines(),
+            ['id,abm,Year', '1,1,1928', '4,1,1929']
+        )
 
 
 class RetrieveDataViewTests(TestCase):
@@ -124,10 +886,330 @@ class RetrieveDataViewTests(TestCase):
         with open(os.path.join(settings.BASE_DIR, 'doc', 'data_request.json')) as f: # pylint: disable=invalid-name
             data_request = json.load(f)
 
-        response = self.client.post(self.request_url, {'data_request': data_request})
+        response = self.client.post(
+            self.request_url, {'data_request': json.dumps(data_request)}
+        )
+
+        # Valid data should return 204 as the new Book `Item` has no `Instance` entries
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+    def test_view_post_valid_data_request_returns_instances(self):
+        '''
+        `RetreiveDataView` view should return serialized `Instance` entries of the UOA `Item`
+        '''
+
+        response = self.client.post(
+            self.request_url, {'data_request': json.dumps({'UOA': 'Award', 'Award': {}})}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([e['id'] for e in response.json()], [1, 4])
+
+    def test_view_post_attr_list_limits_json_keys(self):
+        '''
+        `RetreiveDataView` view should only return the attribute json keys given in the UOA
+        "ATTR" list
+        '''
+
+        response = self.client.post(
+            self.request_url,
+            {'data_request': json.dumps({'UOA': 'Person', 'Person': {'ATTR': ['Age']}})}
+        )
+
+        self.assertEqual(
+            [e['attribute'] for e in response.json()], ['{"Age": "44"}', '{"Age": "41"}']
+        )
+
+    @override_settings(DATA_REQUEST_EXPLAIN=True)
+    def test_view_post_explain_returns_stage_report(self):
+        '''
+        `RetreiveDataView` view should return the plan, sql statements with query plans and
+        per-stage timings if posted with `?explain=1`
+        '''
+
+        response = self.client.post(
+            self.request_url + '?explain=1',
+            {'data_request': json.dumps({'UOA': 'Award', 'Award': {}})}
+        )
+
+        report = response.json()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(report['plan']['uoa'], 'Award')
+        self.assertEqual(
+            [stage['stage'] for stage in report['stages']], ['validate', 'retrieve', 'serialize']
+        )
+        self.assertEqual(report['stages'][1]['rows'], 2)
+        self.assertIsNotNone(report['stages'][1]['queries'][0]['plan'])
+
+    @override_settings(DATA_REQUEST_EXPLAIN=True)
+    def test_view_post_explain_invalid_returns_errors(self):
+        '''
+        `RetreiveDataView` view should return the form errors with 400 if posted with
+        `?explain=1` and invalid data
+        '''
+
+        response = self.client.post(
+            self.request_url + '?explain=1', {'data_request': json.dumps({'UOA': 'Spaceship'})}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('data_request', response.json()['errors'])
+
+
+    def test_view_post_explain_requires_permission(self):
+        '''
+        `RetreiveDataView` view should return 403 for `?explain=1` from callers that aren't
+        allowed to explain requests, and the data for other `explain` values
+        '''
+
+        data = {'data_request': json.dumps({'UOA': 'Award', 'Award': {}})}
+
+        response = self.client.post(self.request_url + '?explain=1', data)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.post(self.request_url + '?explain=0', data)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_view_post_wrong_value_types_returns_bad_request(self):
+        '''
+        `RetreiveDataView` view should return 400 with a `data_request` error for well-formed
+        json with values of the wrong type
+        '''
+
+        for data_request in [{'UOA': 5}, {'UOA': ['Award']},
+                             {'UOA': 'Award', 'Award': {'LINK': 5}},
+                             {'UOA': 'Award', 'Award': {'ATTR': 'Year'}},
+                             {'UOA': 'Award', 'Award': {'MEAS': [1]}}]:
+            response = self.client.post(
+                self.request_url, {'data_request': json.dumps(data_request)}
+            )
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertTrue(response.context['form'].has_error('data_request'))
+
+class SummaryViewTests(TestCase):
+    '''
+    TestCase class for the `SummaryView` view
+    '''
+
+    fixtures = [
+        './doc/test_data/item.xml',
+        './doc/test_data/abstractmodel.xml'
+    ]
+
+    def test_view_get_returns_counts(self):
+        '''
+        `SummaryView` view should return the instance counts per `Item`, `AbstractModel` and
+        `Relationship` from the counters, without counting `Instance` entries
+        '''
+
+        relationship = models.Relationship.objects.create(
+            relationship_str='(Book)<-[WROTE]-(Person)'
+        )
+        link = models.InstanceLink.objects.create(relationship=relationship, landing_instance='a')
+
+        for abm_id in [1, 1, 2]:
+            models.Instance.objects.create(abm_id=abm_id).link.add(link)
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('data:summary'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {
+            'items': [{'id': 1, 'name': 'Book', 'instances': 2},
+                      {'id': 2, 'name': 'Person', 'instances': 1}],
+            'abstract_models': [{'id': 1, 'master_item': 'Book', 'instances': 2},
+                                {'id': 2, 'master_item': 'Person', 'instances': 1}],
+            'relationships': [{'id': relationship.id,
+                               'relationship_str': '(Book)<-[WROTE]-(Person)',
+                               'instance_links': 3}],
+        })
+        self.assertFalse(any('"data_instance"' in query['sql'] for query in captured))
+
+
+class RetrieveDataBatchViewTests(TestCase):
+    '''
+    TestCase class for the `RetrieveDataBatchView` view
+    '''
+
+    fixtures = [
+        './doc/instanceserializertests.xml'
+    ]
+
+    def setUp(self):
+        '''
+        Common setup for each test definition
+        '''
+
+        self.request_url = reverse('data:retrieve-data-batch')
+
+    def test_view_post_returns_results_in_order(self):
+        '''
+        `RetrieveDataBatchView` view should return the serialized `Instance` entries for each
+        input `data_request` in the same order
+        '''
+
+        data_requests = [
+            {'UOA': 'Award', 'Award': {'ATTR': ['Year']}},
+            {'UOA': 'Person', 'Person': {}},
+            {'UOA': 'Award', 'Award': {'ATTR': ['Year']}},
+        ]
+
+        response = self.client.post(
+            self.request_url, json.dumps(data_requests), content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [[e['id'] for e in result] for result in response.json()], [[1, 4], [2, 5], [1, 4]]
+        )
+
+    def test_view_post_matches_single_retrieval(self):
+        '''
+        `RetrieveDataBatchView` view should return the same data as `RetrieveDataView` for a
+        single `data_request`
+        '''
+
+        data_request = {'UOA': 'Film', 'Film': {}}
+
+        single_response = self.client.post(
+            reverse('data:retrieve-data'), {'data_request': json.dumps(data_request)}
+        )
+        batch_response = self.client.post(
+            self.request_url, json.dumps([data_request]), content_type='application/json'
+        )
+
+        self.assertEqual(batch_response.json(), [single_response.json()])
+
+    def test_view_post_invalid_data_request_returns_bad_request(self):
+        '''
+        `RetrieveDataBatchView` view should return 400 with the errors of each invalid
+        `data_request` keyed by its position in the list
+        '''
+
+        data_requests = [{'UOA': 'Award'}, {'UOA': 'Spaceship'}]
+
+        response = self.client.post(
+            self.request_url, json.dumps(data_requests), content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.json().keys()), ['1'])
+
+    def test_view_post_wrong_value_types_returns_bad_request(self):
+        '''
+        `RetrieveDataBatchView` view should return 400 with a `data_request` error for each
+        `data_request` with values of the wrong type
+        '''
+
+        data_requests = [{'UOA': 5}, {'UOA': ['Award']}, {'UOA': 'Award', 'Award': {'LINK': 5}},
+                         {'UOA': 'Award', 'Award': {}}]
+
+        response = self.client.post(
+            self.request_url, json.dumps(data_requests), content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.json().keys()), ['0', '1', '2'])
+        self.assertTrue(all('data_request' in errors for errors in response.json().values()))
+
+
+class AsyncViewTests(TransactionTestCase):
+    '''
+    TestCase class for the `async_retrieve_data_view` and `async_read_only_view` views
+
+    `TransactionTestCase` is used as the views run database work in other threads, which can't
+    see data inside the `TestCase` transaction. The test client runs the async views through
+    Django's sync handler
+    '''
+
+    fixtures = [
+        './doc/test_data/item.xml',
+        './doc/test_data/abstractmodel.xml'
+    ]
+
+    def setUp(self):
+        '''
+        Common setup for each test definition
+        '''
+
+        # Create two `Book` and one `Person` `Instance` entries
+        self.instances = [
+            models.Instance.objects.create(abm_id=abm_id, attribute=attribute)
+            for abm_id, attribute in [(1, '{"title": "Emma"}'), (2, '{"name": "Jane"}'),
+                                      (1, '{"title": "Persuasion"}')]
+        ]
+
+    def test_view_post_valid_data_request_returns_instances(self):
+        '''
+        `async_retrieve_data_view` view should return the same serialized `Instance` entries as
+        `RetrieveDataView`
+        '''
+
+        response = self.client.post(
+            reverse('data:async-retrieve-data'),
+            {'data_request': json.dumps({'UOA': 'Book', 'Book': {}})}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [e['id'] for e in response.json()], [self.instances[0].id, self.instances[2].id]
+        )
+
+    def test_view_list_returns_ok(self):
+        '''
+        `async_read_only_view` view should return the viewset `list` action response
+        '''
+
+        response = self.client.get(reverse('data:async-instance-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), 3)
+
+    def test_view_detail_returns_ok(self):
+        '''
+        `async_read_only_view` view should return the viewset `retrieve` action response
+        '''
+
+        response = self.client.get(
+            reverse('data:async-instance-detail', args=[self.instances[1].id])
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['id'], self.instances[1].id)
+
+
+    def test_view_list_streams_exports(self):
+        '''
+        `async_read_only_view` view should return streamed NDJSON exports of the viewset `list`
+        action
+        '''
+
+        response = self.client.get(reverse('data:async-instance-list'), {'format': 'ndjson'})
 
-        # Valid data should return serialized `Instance` data and 200 code to indicate ok
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [json.loads(line)['id'] for line in b''.join(response.streaming_content).splitlines()],
+            [instance.id for instance in self.instances]
+        )
+
+    def test_view_list_returns_not_modified(self):
+        '''
+        `async_read_only_view` view should return 304 when the `If-None-Match` header matches the
+        current ETag
+        '''
+
+        url = reverse('data:async-instance-list')
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
 
 
 class UploadCsvFileViewTests(TestCase):
@@ -204,3 +1286,52 @@ class UploadCsvFileViewTests(TestCase):
         # Successful upload of file should create three new ranking clusters with
         # `ranking_feature` == `NULL`
         self.assertTrue(models.RankingCluster.objects.filter(ranking_feature='NULL').count(), 3)
+
+
+class InferCsvSchemaViewTests(TestCase):
+    '''
+    TestCase class for the `InferCsvSchemaView` view
+    '''
+
+    def setUp(self):
+        '''
+        Common setup for each test definition
+        '''
+
+        self.request_url = reverse('data:upload-csv-infer')
+
+    def test_view_post_returns_inferred_schema(self):
+        '''
+        `InferCsvSchemaView` view should return the schema inferred from the uploaded csv, with a
+        proposed `AbstractModel` named after the file
+        '''
+
+        upload_file = open(
+            os.path.join(settings.BASE_DIR, 'doc', 'test_data', 'oscar_winners.csv'), 'rb'
+        )
+
+        response = self.client.post(self.request_url, {
+            'upload_file': SimpleUploadedFile('oscar_winners.csv', upload_file.read())
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(c['name'], c['value_dtype']) for c in response.data['columns']],
+            [('Index', 'INT'), ('Year', 'INT'), ('Age', 'INT'), ('Name', 'VARCHAR'),
+             ('Movie', 'VARCHAR')]
+        )
+        self.assertEqual(response.data['abstract_model']['master_item'], 'Oscar_winners')
+        self.assertEqual(response.data['sample']['method'], 'reservoir')
+
+    def test_view_post_rejects_invalid_files(self):
+        '''
+        `InferCsvSchemaView` view should return 400 for files that aren't csvs or are empty
+        '''
+
+        for name, content in [('data.txt', b'a,b\r\n1,2\r\n'), ('empty.csv', b'')]:
+            response = self.client.post(self.request_url, {
+                'upload_file': SimpleUploadedFile(name, content)
+            })
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('upload_file', response.data)
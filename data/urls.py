@@ -19,9 +19,31 @@ router.register('amlink', views.AMLinkViewSet)
 router.register('attribute', views.AttributeViewSet)
 router.register('instance', views.InstanceViewSet)
 router.register('measure', views.MeasureViewSet)
+router.register('rankingcluster', views.RankingClusterViewSet)
+
+# Async versions of the read-only viewset actions for ASGI deployments
+async_urlpatterns = []
+
+for prefix, viewset, basename in router.registry:
+    async_urlpatterns += [
+        path(
+            'async/' + prefix + '/',
+            views.async_read_only_view(viewset, 'list'),
+            name='async-' + basename + '-list'
+        ),
+        path(
+            'async/' + prefix + '/<int:pk>/',
+            views.async_read_only_view(viewset, 'retrieve'),
+            name='async-' + basename + '-detail'
+        ),
+    ]
 
 urlpatterns = [
 	path('retrieve-data', views.RetrieveDataView.as_view(), name='retrieve-data'),
+	path('retrieve-data/batch', views.RetrieveDataBatchView.as_view(), name='retrieve-data-batch'),
+    path('summary/', views.SummaryView.as_view(), name='summary'),
 	path('upload-csv/', views.UploadCsvFileView.as_view(), name='upload-csv'),
+    path('upload-csv/infer', views.InferCsvSchemaView.as_view(), name='upload-csv-infer'),
+    path('async/retrieve-data', views.async_retrieve_data_view, name='async-retrieve-data'),
     path('', include(router.urls)),
-]
+] + async_urlpatterns
@@ -0,0 +1,29 @@
+'''
+Validation of the values in input data for the `data` Django app
+
+References to db entries are checked together against the schema snapshot, see `data.schema`,
+after their values are checked here
+'''
+
+
+def to_id(value):
+    '''
+    Return the input value as an int id, or `None` if it isn't an int or a string of one
+    '''
+
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        return None
+
+    try:
+        return int(value)
+
+    except ValueError:
+        return None
+
+
+def is_string_list(value):
+    '''
+    Return `True` if the input value is a list of strings
+    '''
+
+    return isinstance(value, list) and all(isinstance(entry, str) for entry in value)
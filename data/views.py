@@ -3,72 +3,595 @@ Defines all views for the `data` django app
 '''
 
 
+import hashlib
+import itertools
+import json
+
+from django.conf import settings
 from django.contrib import messages
-from django.http import HttpResponseRedirect, JsonResponse
+from django.db import DatabaseError, transaction
+from django.db.models import Prefetch
+from django.http import HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.template.response import SimpleTemplateResponse
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from django.views.generic.base import ContextMixin, View
 
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import MethodNotAllowed, ParseError, ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from data import codec, filters, forms, helpers, models, parsers, renderers, schema, serializers
+from data.coalescing import single_flight
+from data.group_commit import instance_group_commit
+
+
+# Renderers for `Instance` data, adding line oriented exports to the default renderers
+INSTANCE_RENDERER_CLASSES = api_settings.DEFAULT_RENDERER_CLASSES + [
+    renderers.NDJSONRenderer, renderers.InstanceCSVRenderer
+]
+
+
+class ConditionalGetMixin:
+    '''
+    Mixin for a drf viewset adding `ETag` and `Last-Modified` headers to `list` and `retrieve`
+    responses, built from the `ModelVersion` counters of the `etag_models` the serializer reads
+
+    Requests with a matching `If-None-Match` or `If-Modified-Since` header get a 304 response
+    without the queryset being evaluated or serialized
+
+    The models watched by the process-local `stamped_caches` the serializer reads are part of the
+    stamp too, and the caches are checked against the same versions, so a response is never
+    built from cached data older than its `ETag`
+    '''
+
+    etag_models = []
+    stamped_caches = []
+
+    # `ModelVersion` versions the current request's `ETag` was built from
+    stamp_versions = None
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        '''
+        Return a 304 response if the client's copy is up to date, otherwise call `handler` and
+        add the `ETag` and `Last-Modified` headers to its response
+        '''
+
+        stamp_models = list(dict.fromkeys([self.model, *self.etag_models] + [
+            model for cache in self.stamped_caches for model in cache.watched_models
+        ]))
+        versions, last_modified = models.ModelVersion.objects.get_stamp(*stamp_models)
+        self.stamp_versions = versions
+
+        for cache in self.stamped_caches:
+            cache.check_versions(dict(zip(stamp_models, versions)))
+
+        # The same path can be rendered differently so include the `Accept` header
+        etag = quote_etag(hashlib.md5(
+            (repr(versions) + request.get_full_path() + request.META.get('HTTP_ACCEPT', ''))
+            .encode()
+        ).hexdigest())
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+        if response is None:
+            response = handler(request, *args, **kwargs)
+
+        # 304 responses must carry the same validators as the 200 they stand for
+        if response.status_code in [status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED]:
+            response['ETag'] = etag
+
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        '''
+        Override default `list()` to answer conditional requests
+        '''
+
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        '''
+        Override default `retrieve()` to answer conditional requests
+        '''
+
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+
+class BulkWriteMixin:
+    '''
+    Mixin for a drf viewset adding a `bulk` action, which takes a json array or NDJSON of
+    objects:
+     * `POST` creates an entry for each object
+     * `PATCH` partially updates the entry with each object's `id`, if `bulk_update_allowed`
+
+    Every object is validated before anything is written, and if any are invalid nothing is
+    written. Entries are then written in transactions of `settings.BULK_BATCH_SIZE` objects, and
+    the response contains a result for each object in input order
+    '''
+
+    bulk_update_allowed = False
+
+    @action(detail=False, methods=['post', 'patch'], url_path='bulk',
+            parser_classes=[JSONParser, parsers.NDJSONParser])
+    def bulk(self, request):
+        '''
+        Validate and write the input list of objects, returning a result for each
+        '''
+
+        if not isinstance(request.data, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of objects.']})
+
+        if request.method == 'PATCH':
+            if not self.bulk_update_allowed:
+                raise MethodNotAllowed(request.method)
+
+            bound_serializers, results = self.get_bulk_update_serializers(request.data)
+
+        else:
+            bound_serializers = [self.get_serializer(data=item) for item in request.data]
+            results = [{'index': index} for index in range(len(request.data))]
+
+        # Validate the whole set first
+        for serializer, result in zip(bound_serializers, results):
+            if serializer is not None and not serializer.is_valid():
+                result.update(status=status.HTTP_400_BAD_REQUEST, errors=serializer.errors)
+
+        if any('errors' in result for result in results):
+            return Response(results, status=status.HTTP_400_BAD_REQUEST)
+
+        success_status = status.HTTP_200_OK if request.method == 'PATCH' else \
+            status.HTTP_201_CREATED
+
+        # Write in batches, one transaction per batch with a savepoint per object so a
+        # database error only fails its own object
+        for start in range(0, len(bound_serializers), settings.BULK_BATCH_SIZE):
+            end = start + settings.BULK_BATCH_SIZE
+
+            with transaction.atomic():
+                for serializer, result in zip(bound_serializers[start:end], results[start:end]):
+                    try:
+                        with transaction.atomic():
+                            entry = serializer.save()
+
+                        result.update(status=success_status, id=entry.id)
 
-from data import forms, helpers, models, serializers
+                    except DatabaseError as err:
+                        result.update(status=status.HTTP_409_CONFLICT, errors=[str(err)])
 
+        return Response(
+            results,
+            status=success_status if all(r['status'] == success_status for r in results) else
+            status.HTTP_207_MULTI_STATUS
+        )
 
-class AbstractModelViewSet(viewsets.ModelViewSet): # pylint: disable=too-many-ancestors
+    def get_bulk_update_serializers(self, data):
+        '''
+        Return a bound serializer for each object in the input `data` list, with the entries to
+        update fetched in a single query, and a result for each. Objects with a missing or
+        unknown `id` get a `None` serializer and an error result
+        '''
+
+        ids = [item.get('id', None) if isinstance(item, dict) else None for item in data]
+        entries = self.get_queryset().in_bulk([i for i in ids if isinstance(i, int)])
+
+        bound_serializers = []
+        results = []
+
+        for index, (item, entry_id) in enumerate(zip(data, ids)):
+            if entry_id in entries and ids.count(entry_id) == 1:
+                bound_serializers += [self.get_serializer(entries[entry_id], data=item,
+                                                          partial=True)]
+                results += [{'index': index}]
+
+            else:
+                bound_serializers += [None]
+                results += [{
+                    'index': index, 'status': status.HTTP_400_BAD_REQUEST,
+                    'errors': {'id': ['Expected a unique id of an existing entry.']}
+                }]
+
+        return bound_serializers, results
+
+
+class FastListMixin:
+    '''
+    Mixin for a drf viewset serving `list` with a `fast_serializer_class` built from `.values()`
+    rows, which produces the same output as `serializer_class` at a lower cost per row
+    '''
+
+    fast_serializer_class = None
+
+    def use_fast_serializer(self):
+        '''
+        Return `True` if the request can be served by the `fast_serializer_class`
+        '''
+
+        return self.fast_serializer_class is not None
+
+    def list(self, request, *args, **kwargs):
+        '''
+        Override default `list()` to use the `fast_serializer_class` if possible
+        '''
+
+        if not self.use_fast_serializer():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.fast_serializer_class.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+
+        if page is not None:
+            return self.get_paginated_response(self.fast_serializer_class.serialize(page))
+
+        return Response(self.fast_serializer_class.serialize(queryset))
+
+
+class CoalescedListMixin:
+    '''
+    Mixin for a drf viewset coalescing identical concurrent `list` requests, keyed by their full
+    path, so that only one of them reads from the database and the others share its data
+
+    Listed after `ConditionalGetMixin`, the `ModelVersion` versions of the request's `ETag` are
+    part of the key too, so a request started after a write never shares data read before it
+    '''
+
+    def list(self, request, *args, **kwargs):
+        '''
+        Override default `list()` to share the data of an identical in-flight request
+        '''
+
+        def compute():
+            return super(CoalescedListMixin, self).list(request, *args, **kwargs).data
+
+        data = single_flight.do(
+            'list:{}:{}:{!r}'.format(
+                self.basename, request.get_full_path(), getattr(self, 'stamp_versions', None)
+            ),
+            compute
+        )
+
+        return Response(data)
+
+
+class StreamingExportMixin:
+    '''
+    Mixin for a drf viewset streaming `list` as NDJSON or csv when selected with `?format=ndjson`
+    or `?format=csv`
+
+    Rows are read from the database in chunks with `.iterator()` and written as they are read,
+    so exports aren't paginated and run in constant memory however many rows there are
+    '''
+
+    export_formats = ['ndjson', 'csv']
+
+    @staticmethod
+    def read_chunks(queryset):
+        '''
+        Generator yields lists of `settings.EXPORT_CHUNK_SIZE` rows read from the input
+        `queryset` with `.iterator()`
+        '''
+
+        rows = queryset.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+        while True:
+            chunk = list(itertools.islice(rows, settings.EXPORT_CHUNK_SIZE))
+
+            if not chunk:
+                break
+
+            yield chunk
+
+    def export_rows(self, queryset):
+        '''
+        Generator yields a serialized dict for each entry in the input `queryset`, reading and
+        serializing `settings.EXPORT_CHUNK_SIZE` entries at a time
+        '''
+
+        for chunk in self.read_chunks(self.fast_serializer_class.values(queryset).order_by('id')):
+            yield from self.fast_serializer_class.serialize(chunk)
+
+    def list(self, request, *args, **kwargs):
+        '''
+        Override default `list()` to stream NDJSON or csv exports
+        '''
+
+        renderer = getattr(request, 'accepted_renderer', None)
+
+        if renderer is None or renderer.format not in self.export_formats:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+
+        if renderer.format == 'csv':
+            # Read the upgraded `attribute` keys first so the csv header can be written up front
+            keys = renderers.attribute_keys(
+                row['attribute']
+                for chunk in self.read_chunks(queryset.values('abm', 'schema_version', 'attribute'))
+                for row in codec.upgrade_rows(chunk)
+            )
+            content = renderers.stream_csv(self.export_rows(queryset), keys)
+
+        else:
+            content = renderers.stream_ndjson(self.export_rows(queryset))
+
+        return StreamingHttpResponse(content, content_type=renderer.media_type)
+
+
+class AbstractModelViewSet(BulkWriteMixin, ConditionalGetMixin, CoalescedListMixin, FastListMixin, viewsets.ModelViewSet): # pylint: disable=too-many-ancestors,line-too-long
     '''
     This viewset automatically provides `list`, `create`, `retrieve`,
-    `update` and `destroy` actions for `AbstractModel` entries
+    `update` and `destroy` actions for `AbstractModel` entries, plus `bulk` create,
+    streaming `import` and schema `evolve` actions
     '''
 
     model = models.AbstractModel
-    queryset = models.AbstractModel.objects.all()
+    etag_models = [models.Item, models.Attribute, models.Measure, models.AMLink, models.DataType,
+                   models.Relationship]
+    queryset = models.AbstractModel.objects.select_related('master_item').prefetch_related(
+        Prefetch('attribute',
+                 queryset=models.Attribute.objects.select_related('dtype').order_by('id')),
+        Prefetch('measure',
+                 queryset=models.Measure.objects.select_related('value_dtype').order_by('id')),
+        Prefetch('link',
+                 queryset=models.AMLink.objects.select_related('relationship').order_by('id')),
+    )
+    stamped_caches = [schema.schema_snapshot]
     serializer_class = serializers.AbstractModelSerializer
+    fast_serializer_class = serializers.FastAbstractModelSerializer
+
+    @action(detail=True, methods=['post'], url_path='evolve', url_name='evolve')
+    def evolve(self, request, pk=None): # pylint: disable=invalid-name,unused-argument
+        '''
+        Add or remove attributes and measures of the `AbstractModel` entry in place, see
+        `serializers.AbstractModelSchemaChangeSerializer`
+
+        Existing `Instance` entries keep their schema version and are upgraded when read, or in
+        the background by the `migrate_instance_schemas` command
+        '''
+
+        serializer = serializers.AbstractModelSchemaChangeSerializer(
+            data=request.data, context={'abm': self.get_object()}
+        )
+        serializer.is_valid(raise_exception=True)
+
+        return Response(self.get_serializer(serializer.save()).data)
+
+    @action(detail=False, methods=['post'], url_path='import', url_name='import')
+    def import_models(self, request):
+        '''
+        Import a json array or NDJSON of `AbstractModel` objects, read incrementally from the
+        request body rather than parsed by drf parsers. Every object is validated before anything
+        is written, then all are created with set-based writes
+
+        Returns the import report from `helpers.import_abstract_models()`
+        '''
+
+        if request.stream is None:
+            raise ParseError('Expected a json array or NDJSON of AbstractModel objects.')
+
+        report = helpers.import_abstract_models(parsers.iter_json_values(request.stream))
+        statuses = {result.get('status', None) for result in report['results']}
+
+        if status.HTTP_400_BAD_REQUEST in statuses:
+            status_code = status.HTTP_400_BAD_REQUEST
+
+        elif statuses - {status.HTTP_201_CREATED, status.HTTP_200_OK}:
+            status_code = status.HTTP_207_MULTI_STATUS
+
+        elif status.HTTP_201_CREATED in statuses:
+            status_code = status.HTTP_201_CREATED
+
+        else:
+            status_code = status.HTTP_200_OK
+
+        return Response(report, status=status_code)
 
 
-class AMLinkViewSet(viewsets.ModelViewSet): # pylint: disable=too-many-ancestors
+class AMLinkViewSet(ConditionalGetMixin, viewsets.ModelViewSet): # pylint: disable=too-many-ancestors,line-too-long
     '''
     This viewset automatically provides `list`, `create`, `retrieve`,
     `update` and `destroy` actions for `AMLink` entries
     '''
 
     model = models.AMLink
-    queryset = models.AMLink.objects.all()
+    etag_models = [models.Relationship]
+    queryset = models.AMLink.objects.select_related('relationship')
     serializer_class = serializers.AMLinkSerializer
 
 
-class AttributeViewSet(viewsets.ModelViewSet): # pylint: disable=too-many-ancestors
+class AttributeViewSet(ConditionalGetMixin, viewsets.ModelViewSet): # pylint: disable=too-many-ancestors,line-too-long
     '''
     This viewset automatically provides `list`, `create`, `retrieve`,
     `update` and `destroy` actions for `Attribute` entries
     '''
 
     model = models.Attribute
-    queryset = models.Attribute.objects.all()
+    etag_models = [models.DataType]
+    queryset = models.Attribute.objects.select_related('dtype')
     serializer_class = serializers.AttributeSerializer
 
 
-class InstanceViewSet(viewsets.ModelViewSet): # pylint: disable=too-many-ancestors
+class InstanceViewSet(BulkWriteMixin, ConditionalGetMixin, StreamingExportMixin, CoalescedListMixin, FastListMixin, viewsets.ModelViewSet): # pylint: disable=too-many-ancestors,line-too-long
     '''
     This viewset automatically provides `list`, `create`, `retrieve`,
-    `update` and `destroy` actions for `Instance` entries
+    `update` and `destroy` actions for `Instance` entries, plus `bulk` create and update actions
+
+    See `filters.InstanceFilterBackend` for the query parameters `list` can be filtered by, and
+    `list` can be exported with `?format=ndjson` or `?format=csv`
     '''
 
     model = models.Instance
-    queryset = models.Instance.objects.all()
+    bulk_update_allowed = True
+    etag_models = [models.AbstractModel, models.Item, models.InstanceLink]
+    stamped_caches = [codec.abm_codecs]
+    queryset = models.Instance.objects.select_related('abm__master_item').prefetch_related(
+        Prefetch('link', queryset=models.InstanceLink.objects.order_by('id'))
+    )
+    filter_backends = [filters.InstanceFilterBackend]
+    renderer_classes = INSTANCE_RENDERER_CLASSES
     serializer_class = serializers.InstanceSerializer
+    fast_serializer_class = serializers.FastInstanceSerializer
+
+    # Model columns needed to serialize each `InstanceSerializer` field, on top of the `id`, `abm`
+    # and `schema_version` columns `codec.upgrade_instances` reads from every entry
+    field_columns = {
+        'item': ['abm', 'abm__master_item', 'abm__master_item__name'],
+        'id': ['id'],
+        'abm': ['abm'],
+        'attribute': ['abm', 'attribute', 'schema_version'],
+        'measure': ['abm', 'measure', 'schema_version'],
+        'link': [],
+    }
+
+    def get_requested_fields(self):
+        '''
+        Parse the `?fields=` query parameter e.g. `?fields=id,attribute.title` into a list of
+        field names and a dict of json keys to keep for each json field. Returns `None, None` if
+        no fields were requested, or for writes which validate and return every field
+        '''
+
+        fields_param = self.request.query_params.get('fields', None)
+
+        if not fields_param or self.request.method not in SAFE_METHODS:
+            return None, None
+
+        fields = []
+        json_keys = {}
+
+        for name in fields_param.split(','):
+            field_name, _, key = name.strip().partition('.')
+
+            if field_name not in self.field_columns or (key and field_name not in
+                                                        ['attribute', 'measure']):
+                raise ValidationError({'fields': ['"' + name + '" is not a valid field.']})
+
+            if field_name not in fields:
+                fields += [field_name]
+
+            if key:
+                json_keys[field_name] = json_keys.get(field_name, ()) + (key,)
+
+        return fields, json_keys
+
+    def use_fast_serializer(self):
+        '''
+        Override default `use_fast_serializer()` as the fast serializer doesn't support
+        `?fields=`
+        '''
+
+        return super().use_fast_serializer() and not self.request.query_params.get('fields')
+
+    def get_queryset(self):
+        '''
+        Override default `get_queryset()` to only select the columns needed by the requested
+        fields
+        '''
+
+        queryset = super().get_queryset()
+        fields, _ = self.get_requested_fields()
+
+        if fields is not None:
+            columns = ['id', 'abm', 'schema_version'] + [
+                c for f in fields for c in self.field_columns[f]
+            ]
+
+            # Only join or prefetch the related tables the requested fields need
+            if 'item' not in fields:
+                queryset = queryset.select_related(None)
+
+            if 'link' not in fields:
+                queryset = queryset.prefetch_related(None)
+
+            queryset = queryset.only(*columns)
+
+        return queryset
+
+    def perform_create(self, serializer):
+        '''
+        Override default `perform_create()` to group commit the write with other single
+        `Instance` POSTs when `settings.GROUP_COMMIT_WINDOW_MS` is set
+        '''
+
+        if settings.GROUP_COMMIT_WINDOW_MS:
+            instance_group_commit.submit(serializer.save)
+
+        else:
+            super().perform_create(serializer)
+
+    def get_serializer(self, *args, **kwargs):
+        '''
+        Override default `get_serializer()` to only serialize the requested fields
+        '''
+
+        fields, json_keys = self.get_requested_fields()
 
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+            kwargs.setdefault('json_keys', json_keys)
 
-class MeasureViewSet(viewsets.ModelViewSet): # pylint: disable=too-many-ancestors
+        return super().get_serializer(*args, **kwargs)
+
+
+class MeasureViewSet(ConditionalGetMixin, viewsets.ModelViewSet): # pylint: disable=too-many-ancestors,line-too-long
     '''
     This viewset automatically provides `list`, `create`, `retrieve`,
     `update` and `destroy` actions for `Measure` entries
     '''
 
     model = models.Measure
-    queryset = models.Measure.objects.all()
+    etag_models = [models.DataType]
+    queryset = models.Measure.objects.select_related('value_dtype')
     serializer_class = serializers.MeasureSerializer
 
 
+class RankingClusterViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet): # pylint: disable=too-many-ancestors
+    '''
+    This viewset automatically provides `list` and `retrieve` actions for `RankingCluster`
+    entries, plus an `instances` action returning the ranked `Instance` data of an entry
+
+    `instances` can be exported with `?format=ndjson` or `?format=csv`
+    '''
+
+    model = models.RankingCluster
+    etag_models = [models.Item]
+    queryset = models.RankingCluster.objects.select_related('master_item')
+    serializer_class = serializers.RankingClusterSerializer
+
+    @action(detail=True, renderer_classes=INSTANCE_RENDERER_CLASSES)
+    def instances(self, request, pk=None): # pylint: disable=invalid-name,unused-argument
+        '''
+        Return the serialized `Instance` data saved in the `instances_ranking` field
+        '''
+
+        rows = self.get_object().instances_ranking or []
+
+        if request.accepted_renderer.format == 'csv':
+            keys = renderers.attribute_keys(row.get('attribute', '') for row in rows)
+
+            return StreamingHttpResponse(
+                renderers.stream_csv(rows, keys), content_type=request.accepted_renderer.media_type
+            )
+
+        if request.accepted_renderer.format == 'ndjson':
+            return StreamingHttpResponse(
+                renderers.stream_ndjson(rows), content_type=request.accepted_renderer.media_type
+            )
+
+        return Response(rows)
+
+
 class RetrieveDataView(ContextMixin, View):
     '''
     View to return data based on an incoming request
@@ -90,38 +613,162 @@ class RetrieveDataView(ContextMixin, View):
     def post(self, request):
         '''
         Handles post data and returns any related data
+
+        Posting with `?explain=1` (or `true`) returns the compiled plan, sql statements with
+        their query plans and per-stage timings instead of the data. Only staff users can explain
+        requests, unless `settings.DEBUG` or `settings.DATA_REQUEST_EXPLAIN` is set
         '''
 
         form = self.form_class(request.POST)
 
-        # If data entered is valid, retrieve `Instance` entries
-        if form.is_valid():
+        # In explain mode, return the plan and profile of the request instead of the data
+        if request.GET.get('explain', '').lower() in ['1', 'true']:
+            if not (settings.DEBUG or settings.DATA_REQUEST_EXPLAIN or request.user.is_staff):
+                return JsonResponse(
+                    {'detail': 'You do not have permission to explain data requests.'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
 
-            instances_qs = form.retrieve_instances()
+            report = helpers.explain_data_request(form)
 
-            if instances_qs.exists():
-                # Serialize queryset and return
-                serializer = serializers.InstanceSerializer(instances_qs, many=True)
+            return JsonResponse(
+                report,
+                status=status.HTTP_200_OK if report['valid'] else status.HTTP_400_BAD_REQUEST
+            )
 
-                return_data = serializer.data
-                status_code = status.HTTP_200_OK
+        # If data entered is valid, retrieve `Instance` entries, sharing the result with any
+        # identical request already in flight
+        if form.is_valid():
 
-            else:
-                # If no valid `Instance` queryset, return nothing
-                return_data = []
-                status_code = status.HTTP_204_NO_CONTENT
+            return_data, status_code = single_flight.do(
+                'retrieve-data:{!r}'.format(form.retrieval_key), lambda: self.retrieve(form)
+            )
 
-            response = JsonResponse(return_data, status_code=status_code)
+            response = JsonResponse(return_data, safe=False, status=status_code)
 
         else:
-            # If not valid, return the form with associated errors
+            # If not valid, return the form with associated errors and 400
             # Build context ready to pass to render
             context = self.get_context_data(form=form)
 
-            response = render(request, self.template_name, context)
+            response = render(
+                request, self.template_name, context, status=status.HTTP_400_BAD_REQUEST
+            )
 
         return response
 
+    @staticmethod
+    def retrieve(form):
+        '''
+        Return the serialized `Instance` entries for the input valid `form` and the status code
+        to return them with
+        '''
+
+        instances_qs = form.retrieve_instances()
+
+        if not instances_qs.exists():
+            # If no valid `Instance` queryset, return nothing
+            return [], status.HTTP_204_NO_CONTENT
+
+        # Serialize queryset, keeping only the requested json keys
+        serializer = serializers.InstanceSerializer(
+            instances_qs, many=True, json_keys=form.json_keys
+        )
+
+        return list(serializer.data), status.HTTP_200_OK
+
+
+class RetrieveDataBatchView(APIView):
+    '''
+    View to return data for a list of `data_request`s in one request
+
+    Requests for the same UOA and link path share a single retrieval, and results are returned
+    in the same order as the input list
+    '''
+
+    def post(self, request):
+        '''
+        Handles a json list of `data_request`s and returns a list of related data for each
+        '''
+
+        if not isinstance(request.data, list):
+            return Response(
+                {'data_requests': ['Expected a list of data_request objects.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Look up the UOA `Item` of every `data_request` together in the schema snapshot
+        uoas = {
+            data_request['UOA'] for data_request in request.data
+            if isinstance(data_request, dict) and isinstance(data_request.get('UOA', None), str)
+        }
+        snapshot = schema.schema_snapshot.get_containing('item_ids', uoas)
+        item_ids = {uoa: snapshot.item_ids.get(uoa, None) for uoa in uoas}
+
+        # Validate every `data_request` with the same form used by `RetrieveDataView`
+        data_request_forms = [
+            forms.RetrieveDataForm({'data_request': json.dumps(data_request)}, item_ids=item_ids)
+            for data_request in request.data
+        ]
+
+        errors = {
+            index: form.errors for index, form in enumerate(data_request_forms)
+            if not form.is_valid()
+        }
+
+        if errors:
+            # If any are not valid, return the errors keyed by list position
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # Share the result with any identical batch already in flight
+        key = 'retrieve-data-batch:{!r}'.format([form.retrieval_key for form in data_request_forms])
+
+        return Response(single_flight.do(
+            key, lambda: helpers.retrieve_data_requests(data_request_forms)
+        ))
+
+
+class SummaryView(APIView):
+    '''
+    View to return the number of `Instance` entries per `Item` and per `AbstractModel`, and the
+    number of `Instance` links per `Relationship`
+
+    Counts are read from counter tables kept up to date by writes, rather than counted per request
+    '''
+
+    def get(self, request): # pylint: disable=unused-argument
+        '''
+        Returns the instance counts
+        '''
+
+        return Response(helpers.get_instance_summary())
+
+
+class InferCsvSchemaView(APIView):
+    '''
+    View to propose an `AbstractModel` and column mapping for a csv before it is uploaded
+    '''
+
+    def post(self, request):
+        '''
+        Handles an uploaded csv and returns the schema inferred from a sample of its rows
+        '''
+
+        form = forms.InferCsvSchemaForm(request.POST, request.FILES)
+
+        if not form.is_valid():
+            return Response(form.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        report = form.infer()
+
+        if not report['columns']:
+            return Response(
+                {'upload_file': ['"' + request.FILES['upload_file'].name + '" has no header row.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(report)
+
 
 class UploadCsvFileView(ContextMixin, View):
     '''
@@ -182,3 +829,54 @@ class UploadCsvFileView(ContextMixin, View):
             response = render(request, self.template_name, context)
 
         return response
+
+
+# Django 3.1 only supports async function based views, so the async views below wrap the class
+# based views above
+
+async def async_retrieve_data_view(request):
+    '''
+    Async version of `RetrieveDataView` for ASGI deployments
+
+    The blocking form validation, retrieval and rendering run in the bounded database thread
+    pool so a slow retrieval doesn't hold up the worker serving other requests
+    '''
+
+    return await helpers.run_in_db_pool(RetrieveDataView.as_view(), request)
+
+
+def async_read_only_view(viewset_class, action):
+    '''
+    Return an async view running the read-only `list` or `retrieve` action of the input drf
+    `viewset_class` in the bounded database thread pool
+    '''
+
+    view = viewset_class.as_view({'get': action})
+
+    def run_action(request, **kwargs):
+        '''
+        Run the viewset action and render the response, both of which are blocking
+
+        Only template responses need rendering, others such as 304 responses are returned as
+        they are. Django's ASGI handler iterates streaming responses in the event loop, where
+        database access isn't allowed, so streamed exports are read here in the pool thread
+        '''
+
+        response = view(request, **kwargs)
+
+        if isinstance(response, SimpleTemplateResponse):
+            response.render()
+
+        elif response.streaming:
+            response.streaming_content = list(response.streaming_content)
+
+        return response
+
+    async def async_view(request, **kwargs):
+        '''
+        Returns the rendered viewset action response
+        '''
+
+        return await helpers.run_in_db_pool(run_action, request, **kwargs)
+
+    return async_view
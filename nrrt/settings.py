@@ -90,6 +90,21 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# `single_flight` is shared by all local worker processes, its table is created by `migrate`
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'single_flight': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'nrrt_single_flight',
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -109,6 +124,81 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'data.pagination.IdCursorPagination',
+    'PAGE_SIZE': config('PAGE_SIZE', default=100, cast=int),
+}
+
+# Largest page size a client can request with `?page_size=`
+MAX_PAGE_SIZE = config('MAX_PAGE_SIZE', default=1000, cast=int)
+
+
+# Number of objects written per transaction by the viewset `bulk` actions
+BULK_BATCH_SIZE = config('BULK_BATCH_SIZE', default=500, cast=int)
+
+
+# Allow `?explain=1` on `retrieve-data` requests, which returns raw sql and query plans, for
+# every caller. Staff users and `DEBUG` servers can always use it
+DATA_REQUEST_EXPLAIN = config('DATA_REQUEST_EXPLAIN', default=False, cast=bool)
+
+
+# Number of rows read from the database at a time by streaming NDJSON and csv exports
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+
+# Background upgrade of `Instance` json to the current `AbstractModel` schema version, see the
+# `migrate_instance_schemas` command. Entries are rewritten `SCHEMA_MIGRATION_BATCH_SIZE` at a
+# time, pausing `SCHEMA_MIGRATION_PAUSE_MS` between batches to leave room for other writes
+SCHEMA_MIGRATION_BATCH_SIZE = config('SCHEMA_MIGRATION_BATCH_SIZE', default=500, cast=int)
+SCHEMA_MIGRATION_PAUSE_MS = config('SCHEMA_MIGRATION_PAUSE_MS', default=100, cast=int)
+
+
+# Schema inference from uploaded csvs, see `data.inference`
+# The header, `SCHEMA_INFERENCE_HEAD_ROWS` rows and a random sample of up to
+# `SCHEMA_INFERENCE_SAMPLE_ROWS` other rows are read. Files with more than
+# `SCHEMA_INFERENCE_SCAN_BYTES` after the head rows are sampled at random offsets instead of read
+# to the end, and lines are read at most `SCHEMA_INFERENCE_MAX_LINE_BYTES` at a time
+SCHEMA_INFERENCE_HEAD_ROWS = config('SCHEMA_INFERENCE_HEAD_ROWS', default=100, cast=int)
+SCHEMA_INFERENCE_SAMPLE_ROWS = config('SCHEMA_INFERENCE_SAMPLE_ROWS', default=1000, cast=int)
+SCHEMA_INFERENCE_SCAN_BYTES = config('SCHEMA_INFERENCE_SCAN_BYTES', default=8388608, cast=int)
+SCHEMA_INFERENCE_MAX_LINE_BYTES = config(
+    'SCHEMA_INFERENCE_MAX_LINE_BYTES', default=65536, cast=int
+)
+
+
+# Write-behind group commit of single `Instance` POSTs, see `data.group_commit`
+# Writes are buffered for up to `GROUP_COMMIT_WINDOW_MS` and committed together, 0 disables it
+GROUP_COMMIT_WINDOW_MS = config('GROUP_COMMIT_WINDOW_MS', default=0, cast=int)
+GROUP_COMMIT_MAX_BATCH = config('GROUP_COMMIT_MAX_BATCH', default=500, cast=int)
+
+
+# Single-flight coalescing of identical concurrent reads, see `data.coalescing`
+SINGLE_FLIGHT_CACHE = 'single_flight'
+SINGLE_FLIGHT_TIMEOUT = config('SINGLE_FLIGHT_TIMEOUT', default=30, cast=int)
+SINGLE_FLIGHT_RESULT_TIMEOUT = config('SINGLE_FLIGHT_RESULT_TIMEOUT', default=5, cast=int)
+SINGLE_FLIGHT_POLL_INTERVAL = config('SINGLE_FLIGHT_POLL_INTERVAL', default=0.05, cast=float)
+
+
+# Process-local caches, see `data.models.VersionStampedCache`
+# Seconds between checks for changes made by other processes
+LOCAL_CACHE_CHECK_INTERVAL = config('LOCAL_CACHE_CHECK_INTERVAL', default=1.0, cast=float)
+
+# Size of the name to id caches of `DataType`, `Item` and `Relationship`
+NAME_CACHE_SIZE = config('NAME_CACHE_SIZE', default=10000, cast=int)
+
+# Number of compiled `AbstractModel` codecs kept, see `data.codec`
+CODEC_CACHE_SIZE = config('CODEC_CACHE_SIZE', default=1000, cast=int)
+
+
+# Maximum number of threads async views use to run database work
+# See `data.helpers.run_in_db_pool`
+
+ASYNC_DB_WORKERS = config('ASYNC_DB_WORKERS', default=8, cast=int)
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.1/topics/i18n/
 